@@ -0,0 +1,92 @@
+"""
+对比壁纸启动时的两种取数方式，测量“首屏数据全部就绪”的耗时：
+
+    fanout    旧流程：stats / pomodoro 的 /config / loadConfigToUI 的 /config /
+              /api/memos?since=-1 / /media/status / 诊断脚本的 /config 并发发出
+    bootstrap 新流程：一次 GET /api/bootstrap
+
+    python benchmarks/bench_bootstrap.py [--memos 1000] [--rounds 50] [--concurrency 6]
+
+服务在本机端口上真实监听（与 WE 里的浏览器一致走 HTTP），客户端按浏览器
+的同源并发上限（默认 6）发请求。这里不做 DOM 渲染，测的是首屏渲染前
+最后一个响应到达（并解析完 JSON）的时间。
+"""
+import argparse
+import json
+import logging
+import statistics
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import make_server
+
+import harness
+
+FANOUT_PATHS = (
+    '/api/stats',
+    '/config',              # initPomodoro
+    '/config',              # loadConfigToUI
+    '/api/memos?since=-1',  # loadMemos
+    '/media/status',        # 媒体轮询
+    '/config',              # index.html 诊断脚本
+)
+
+
+def fetch_json(base, path):
+    with urllib.request.urlopen(base + path, timeout=10) as res:
+        body = res.read()
+    return len(body), json.loads(body)
+
+
+def run_fanout(base, pool):
+    t0 = time.perf_counter()
+    sizes = [f.result()[0] for f in [pool.submit(fetch_json, base, p) for p in FANOUT_PATHS]]
+    return time.perf_counter() - t0, len(sizes), sum(sizes)
+
+
+def run_bootstrap(base, pool):
+    t0 = time.perf_counter()
+    size, _ = pool.submit(fetch_json, base, '/api/bootstrap').result()
+    return time.perf_counter() - t0, 1, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--memos', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=6)
+    args = parser.parse_args()
+
+    server = harness.load_server(harness.make_config(args.memos))
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    httpd = make_server('127.0.0.1', 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{httpd.server_port}'
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for name, run in (('fanout', run_fanout), ('bootstrap', run_bootstrap)):
+            run(base, pool)  # 预热
+            samples = [run(base, pool) for _ in range(args.rounds)]
+            times = sorted(s[0] for s in samples)
+            results[name] = {
+                "requests": samples[0][1],
+                "bytes": samples[0][2],
+                "median_ms": statistics.median(times) * 1000,
+                "p95_ms": times[int(len(times) * 0.95) - 1] * 1000,
+            }
+    httpd.shutdown()
+
+    print(f"memos={args.memos} rounds={args.rounds} concurrency={args.concurrency}")
+    for name, r in results.items():
+        print(f"{name:9}: {r['requests']} req  {r['bytes']:9d} B  "
+              f"median {r['median_ms']:7.2f} ms  p95 {r['p95_ms']:7.2f} ms")
+    print(f"time to first complete render: "
+          f"{results['fanout']['median_ms'] / results['bootstrap']['median_ms']:.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+对比整份 POST /config 与 PATCH /config（merge patch）的请求体大小和耗时。
+
+    python benchmarks/bench_config_patch.py [--memos 1000] [--rounds 200]
+
+每轮只修改 musicPath，模拟设置面板保存。同时统计注册表写入次数，
+确认 autoStart 未变化时不会触发 set_autostart。
+"""
+import argparse
+import json
+import time
+
+import harness
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--memos', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    config = harness.make_config(args.memos)
+    server = harness.load_server(config)
+
+    autostart_calls = []
+    server.set_autostart = lambda enable: autostart_calls.append(enable)
+    client = server.app.test_client()
+
+    results = {}
+    for mode in ('post', 'patch'):
+        autostart_calls.clear()
+        sent = 0
+        t0 = time.perf_counter()
+        for n in range(args.rounds):
+            if mode == 'post':
+                config["musicPath"] = f"C:/music/{n}.exe"
+                body = json.dumps(config)
+                res = client.post('/config', data=body, content_type='application/json')
+            else:
+                body = json.dumps({"musicPath": f"C:/music/{n}.exe"})
+                res = client.patch('/config', data=body, content_type='application/merge-patch+json')
+            assert res.status_code == 200, res.data
+            sent += len(body)
+        elapsed = time.perf_counter() - t0
+        results[mode] = (sent / args.rounds, elapsed / args.rounds, len(autostart_calls))
+
+    print(f"memos={args.memos} rounds={args.rounds}")
+    for mode, (size, latency, calls) in results.items():
+        print(f"{mode:6}: {size:10.0f} B/req  {latency * 1000:8.2f} ms/req  registry writes={calls}")
+    print(f"payload ratio: {results['post'][0] / results['patch'][0]:.0f}x smaller, "
+          f"latency ratio: {results['post'][1] / results['patch'][1]:.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
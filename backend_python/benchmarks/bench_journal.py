@@ -0,0 +1,122 @@
+"""
+journal 存储引擎：单次提交（追加一条日志）的延迟，以及 10 万条记录时的恢复时间。
+
+    python benchmarks/bench_journal.py [--records 100000] [--memos 1000] [--compare 300]
+
+1. 追加：在 --memos 条备忘录上连续提交 --records 次单条修改（勾选 done，写时复制），
+   记录每次提交的耗时；不调用 maintain()，日志不压缩。
+   同样的修改在 sections 引擎上提交 --compare 次作为对照（每次重写整个 memos 分区）。
+2. 恢复：用新的 ConfigStore 打开同一个文件（读快照 + 重放全部记录），与内存状态比较。
+3. 压缩：maintain() 写新快照、清空日志，再测一次恢复时间。
+4. 损坏的尾部：在日志末尾写半条记录，重新打开后状态不变、坏的尾部被截断。
+
+结果是 JSON（stdout），进度输出到 stderr。
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import harness
+import config_journal
+from config_store import ConfigStore
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+    return {
+        "n": len(samples),
+        "median_us": round(statistics.median(samples) * 1e6, 1),
+        "p95_us": round(pick(0.95) * 1e6, 1),
+        "p99_us": round(pick(0.99) * 1e6, 1),
+        "max_us": round(samples[-1] * 1e6, 1),
+    }
+
+
+def fresh_store(config, engine):
+    path = os.path.join(tempfile.mkdtemp(), 'user_config.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    store = ConfigStore({})
+    store.open(path, engine)
+    store.migrate()
+    return store, path
+
+
+def commit_toggles(store, count, memo_count):
+    samples = []
+    for i in range(count):
+        t0 = time.perf_counter()
+        with store.transaction('memos') as txn:
+            k = i % memo_count
+            txn.value[k] = {**txn.value[k], "done": i % 2 == 0, "rev": i}
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def reopen(path):
+    t0 = time.perf_counter()
+    store = ConfigStore({})
+    store.open(path)
+    return store, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--memos', type=int, default=1000)
+    parser.add_argument('--compare', type=int, default=300, help='sections 引擎上的提交次数')
+    args = parser.parse_args()
+
+    config = harness.make_config(args.memos)
+    with contextlib.redirect_stdout(sys.stderr):
+        store, path = fresh_store(config, 'journal')
+        print(f"appending {args.records} records...", file=sys.stderr)
+        journal = commit_toggles(store, args.records, args.memos)
+        log_path = os.path.join(os.path.splitext(path)[0] + '.d', 'journal.log')
+        log_bytes = os.path.getsize(log_path)
+
+        sections_store, _ = fresh_store(config, 'sections')
+        sections = commit_toggles(sections_store, args.compare, args.memos)
+
+        recovered, replay_s = reopen(path)
+        replay_ok = recovered.load() == store.load()
+
+        config_journal.COMPACT_MIN_BYTES = 0
+        t0 = time.perf_counter()
+        compacted = store.maintain()
+        compact_s = time.perf_counter() - t0
+        recovered, snapshot_s = reopen(path)
+        snapshot_ok = recovered.load() == store.load()
+
+        commit_toggles(store, 10, args.memos)
+        with open(log_path, 'ab') as f:
+            f.write(b'00000000 {"q":')
+        recovered, _ = reopen(path)
+        torn_ok = recovered.load() == store.load() and os.path.getsize(log_path) == store._storage._log_bytes
+
+    report = {
+        "memos": args.memos,
+        "records": args.records,
+        "journal_bytes": log_bytes,
+        "append": summarize(journal),
+        "sections_commit": summarize(sections),
+        "recovery_ms": round(replay_s * 1000, 1),
+        "recovery_ok": replay_ok,
+        "compact_ms": round(compact_s * 1000, 1),
+        "compacted": compacted,
+        "recovery_after_compact_ms": round(snapshot_s * 1000, 1),
+        "recovery_after_compact_ok": snapshot_ok,
+        "torn_tail_ok": torn_ok,
+    }
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if replay_ok and snapshot_ok and torn_ok and compacted else 1)
+
+
+if __name__ == '__main__':
+    main()
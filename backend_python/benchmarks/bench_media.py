@@ -0,0 +1,104 @@
+"""
+壁纸获取媒体进度的两种方式，在同一段模拟播放下比较请求数和传输量：
+
+    poll   旧流程：每 --poll 秒 GET /media/status（带 If-None-Match）
+    watch  新流程：长轮询 GET /media/watch，快照变化时才返回，进度由客户端外推
+
+    python benchmarks/bench_media.py [--seconds 10] [--clients 3] [--poll 0.2] [--sample 0.2]
+
+模拟的媒体会话每 --sample 秒采样一次（相当于 SMTC 轮询），位置随时间前进并带少量抖动，
+每 --track 秒换一首，中间暂停一次 --pause 秒。时间整体压缩（默认 poll / sample 0.2s，
+对应实际的 2s），请求数之比与实际相同。err 是客户端外推的进度与真实进度的最大偏差（秒）。
+"""
+import argparse
+import random
+import threading
+import time
+
+import harness
+
+
+def simulate(media, seconds, sample, track, pause, stop, truth):
+    """按真实时间推进的播放器：每 track 秒换曲，播放到一半时暂停 pause 秒；truth 里是真实进度"""
+    start = last = time.monotonic()
+    paused_at = seconds / 2
+    song, pos = 0, 0.0
+    while not stop.is_set():
+        now = time.monotonic()
+        elapsed = now - start
+        playing = not (paused_at <= elapsed < paused_at + pause)
+        if playing:
+            pos += now - last
+        if pos >= track:
+            song, pos = song + 1, 0.0
+        truth['position'], last = pos, now
+        media.publish({**harness.FAKE_MEDIA, 'title': f'song {song}', 'duration': track,
+                       'state': 'playing' if playing else 'paused', 'stateCode': 4 if playing else 5,
+                       'position': round(pos + random.uniform(-0.05, 0.05), 2)}, now)
+        stop.wait(sample)
+
+
+def client(server, mode, interval, stop, truth, stats):
+    c = server.app.test_client()
+    etag, data, at = None, None, 0.0
+    requests = full = size = 0
+    worst = 0.0
+    path = '/media/status' if mode == 'poll' else '/media/watch?timeout=2.5'
+    while not stop.is_set():
+        resp = c.get(path, headers={'If-None-Match': etag} if etag else {})
+        requests += 1
+        if resp.status_code == 200:
+            full += 1
+            size += len(resp.data)
+            etag, data = resp.headers['ETag'], resp.get_json()
+            if 'error' not in data:
+                at = time.monotonic() - (float(resp.headers['X-Media-Clock']) - data['sampledAt'])
+        if data and 'error' not in data:
+            guess = data['position'] + data['playbackRate'] * (time.monotonic() - at)
+            worst = max(worst, abs(min(guess, data['duration']) - truth['position']))
+        if mode == 'poll':
+            stop.wait(interval)
+    stats.append((requests, full, size, worst))
+
+
+def run(server, mode, args):
+    stop = threading.Event()
+    truth = {'position': 0.0}
+    stats = []
+    player = threading.Thread(target=simulate, args=(server.services.media, args.seconds, args.sample,
+                                                     args.track, args.pause, stop, truth))
+    player.start()
+    time.sleep(args.sample)
+    clients = [threading.Thread(target=client, args=(server, mode, args.poll, stop, truth, stats))
+               for _ in range(args.clients)]
+    for t in clients:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    server.services.media.publish({'error': 'stopped'})      # 唤醒还在等的长轮询
+    for t in clients + [player]:
+        t.join()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--clients', type=int, default=3)
+    parser.add_argument('--poll', type=float, default=0.2)
+    parser.add_argument('--sample', type=float, default=0.2)
+    parser.add_argument('--track', type=float, default=4.0)
+    parser.add_argument('--pause', type=float, default=1.0)
+    args = parser.parse_args()
+
+    server = harness.load_server()
+    print(f"{'mode':>6} {'requests/client':>16} {'full':>6} {'bytes/client':>13} {'err s':>6}")
+    for mode in ('poll', 'watch'):
+        stats = run(server, mode, args)
+        n = len(stats)
+        print(f"{mode:>6} {sum(s[0] for s in stats) / n:>16.1f} {sum(s[1] for s in stats) / n:>6.1f} "
+              f"{sum(s[2] for s in stats) / n:>13.0f} {max(s[3] for s in stats):>6.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+对比 1000 次单条修改与 1 次批量修改的耗时。
+
+    python benchmarks/bench_memo_batch.py [--memos 200] [--ops 1000]
+
+通过 Flask test client 直接调用路由，配置文件写到临时目录，
+不会碰到真实的 user_config.json。
+"""
+import argparse
+import time
+
+import harness
+
+
+def seed(server, count):
+    memos = harness.make_memos(count)
+    harness.write_config(server, {"memos": memos, "dailyGoals": {"date": "", "items": []}})
+    return [m["id"] for m in memos]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--memos', type=int, default=200)
+    parser.add_argument('--ops', type=int, default=1000)
+    args = parser.parse_args()
+
+    server = harness.load_server()
+    client = server.app.test_client()
+
+    ids = seed(server, args.memos)
+    targets = [ids[i % len(ids)] for i in range(args.ops)]
+    t0 = time.perf_counter()
+    for n, memo_id in enumerate(targets):
+        client.patch(f'/api/memos/{memo_id}', json={"done": n % 2 == 0})
+    single = time.perf_counter() - t0
+
+    ids = seed(server, args.memos)
+    ops = [{"op": "patch", "id": memo_id, "changes": {"done": n % 2 == 0}}
+           for n, memo_id in enumerate(targets)]
+    t0 = time.perf_counter()
+    res = client.post('/api/memos/batch', json={"ops": ops})
+    batch = time.perf_counter() - t0
+    assert res.status_code == 200 and res.json["success"], res.json
+
+    print(f"memos={args.memos} ops={args.ops}")
+    print(f"single  : {single * 1000:9.1f} ms  ({single / args.ops * 1e6:8.1f} us/op)")
+    print(f"batch   : {batch * 1000:9.1f} ms  ({batch / args.ops * 1e6:8.1f} us/op)")
+    print(f"speedup : {single / batch:9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+重复提醒的触发开销随备忘录数量的变化。
+
+    python benchmarks/bench_reminders.py [--sizes 1000,10000,100000] [--fires 2000]
+                                         [--server-fires 50] [--storage sections|journal]
+
+scheduler：只测提醒队列（ReminderQueue），用虚拟时钟每次恰好到期一条：
+    弹出 -> 计算下一次（reminders.advance）-> 重新挂上。每次 O(log n)，应基本不随 n 增长。
+idle：没有到期提醒时一次提醒任务（server.scan_reminders）的耗时，不读写配置。
+fire：队列里有 n 条未到期的提醒时，通过 server 端到端触发 --server-fires 条到期提醒
+      （同一次事务 + 写盘 + 索引更新）的总耗时。事务只替换触发的几条，journal 只追加这几条，
+      分区文件只重新编码这几条（仍要写出整个文件）。测的是运行中的状态：加载后第一次写
+      memos 分区时要编码整个列表、建立 id -> 下标表，这里先做一次无关的修改预热。
+snooze：一次推迟（server.snooze_memo）的耗时：只向 reminders.log 追加一行，不随 n 增长。
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import harness
+from due_dates import normalize_due
+from reminders import ReminderQueue, advance
+
+
+def recurring_memos(count, base, step=1.0, start_id=1, interval=None):
+    """count 条每 interval 小时重复一次的备忘录，到期时间从 base 起每条相隔 step 秒"""
+    interval = interval or int(count * step // 3600) + 1
+    return [normalize_due({"id": start_id + i, "title": f"memo {i}", "content": "x" * 200,
+                           "dueDate": (base + timedelta(seconds=int(i * step))).strftime('%Y-%m-%dT%H:%M:%S'),
+                           "enableReminder": True, "done": False, "reminderShown": False,
+                           "recurrence": {"freq": "hourly", "interval": interval}, "occurrence": 1})
+            for i in range(count)]
+
+
+def bench_scheduler(count, fires):
+    base = datetime(2026, 1, 1)
+    queue = ReminderQueue()
+    queue.rebuild(recurring_memos(count, base))
+    t0 = time.perf_counter()
+    for i in range(fires):
+        now = base + timedelta(seconds=i % count)
+        for _, _, memo in queue.pop_due(now.timestamp()):
+            queue.update([{**memo, **advance(memo, now.timestamp())}])
+    return (time.perf_counter() - t0) / fires
+
+
+def bench_server(server, count, fires, storage):
+    # count 条一天后到期，另有 fires 条已经到期
+    future = datetime.now() + timedelta(days=1)
+    past = datetime.now() - timedelta(hours=1)
+    memos = recurring_memos(count, future) + recurring_memos(fires, past, start_id=count + 1, interval=24)
+    harness.write_config(server, {"memos": memos, "dailyGoals": {"date": "", "items": []}}, storage)
+    server.app.test_client().patch('/api/memos/1', json={"title": "warm up"})
+
+    t0 = time.perf_counter()
+    server.scan_reminders()            # 一次事务触发全部 fires 条
+    fire = time.perf_counter() - t0
+    assert len(server._reminders.pop_due(time.time())) == 0
+
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        server.scan_reminders()
+    idle = (time.perf_counter() - t0) / 1000
+
+    t0 = time.perf_counter()
+    for i in range(100):
+        server.snooze_memo(1 + i % count, 3600)
+    snooze = (time.perf_counter() - t0) / 100
+    return idle, fire, snooze
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--fires', type=int, default=2000)
+    parser.add_argument('--server-fires', type=int, default=50)
+    parser.add_argument('--storage', default=None, choices=('sections', 'journal'))
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',')]
+
+    server = harness.load_server()
+    server.services.notifier.notify = lambda *a, **k: None
+    print(f"{'memos':>8} {'scheduler us/fire':>18} {'idle tick us':>13} {'fire ms':>9} {'snooze ms':>10}")
+    for size in sizes:
+        per_fire = bench_scheduler(size, args.fires)
+        idle, fire, snooze = bench_server(server, size, args.server_fires, args.storage)
+        print(f"{size:>8} {per_fire * 1e6:>18.1f} {idle * 1e6:>13.1f} {fire * 1000:>9.2f} {snooze * 1000:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
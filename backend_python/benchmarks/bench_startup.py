@@ -0,0 +1,89 @@
+"""
+启动耗时：从启动 server.py 进程到 GET /config 第一次返回 200 的时间。
+壁纸在这之前一直显示“后端离线”提示，所以这是用户能感知到的启动时间。
+
+    python benchmarks/bench_startup.py [--runs 5] [--memos 1000] [--gui]
+
+每轮用新的临时配置文件和空闲端口启动一个独立进程（--platform memory，
+默认 --headless；--gui 时加载 Qt，使用 offscreen 平台），每 5 ms 请求一次
+/config，拿到 200 后结束进程。结果是 JSON（stdout），每轮耗时输出到 stderr。
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import harness
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_200(config_path, gui, timeout=30.0):
+    port = free_port()
+    cmd = [sys.executable, os.path.join(harness.BACKEND_DIR, 'server.py'),
+           '--platform', 'memory', '--port', str(port), '--config', config_path]
+    if not gui:
+        cmd.append('--headless')
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=harness.BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - t0 < timeout:
+            if proc.poll() is not None:
+                raise SystemExit(f'server exited with code {proc.returncode}')
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/config', timeout=1) as res:
+                    if res.status == 200:
+                        res.read()
+                        return time.perf_counter() - t0
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.005)
+        raise SystemExit(f'no 200 from /config within {timeout}s')
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--memos', type=int, default=1000)
+    parser.add_argument('--gui', action='store_true', help='同时初始化 Qt（默认 --headless）')
+    args = parser.parse_args()
+
+    config_path = os.path.join(tempfile.mkdtemp(), 'user_config.json')
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(harness.make_config(args.memos), f)
+
+    samples = []
+    for i in range(args.runs):
+        elapsed = time_to_first_200(config_path, args.gui)
+        samples.append(elapsed * 1000)
+        print(f"run {i + 1}: {samples[-1]:8.1f} ms", file=sys.stderr)
+
+    print(json.dumps({
+        "mode": "gui" if args.gui else "headless",
+        "memos": args.memos,
+        "runs": args.runs,
+        "median_ms": round(statistics.median(samples), 1),
+        "min_ms": round(min(samples), 1),
+        "max_ms": round(max(samples), 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
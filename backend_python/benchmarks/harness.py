@@ -0,0 +1,70 @@
+"""
+基准测试公共部分：导入 server，配置写到临时目录。
+
+    import harness
+    server = harness.load_server(harness.make_config(1000))
+    client = server.app.test_client()
+
+server 导入时使用内存平台服务（platform_services.in_memory()），不写注册表、
+不弹 MessageBox、不加载 Qt，也不启动后台线程（SMTC 轮询和提醒线程只在 __main__
+中启动）。媒体数据由 load_server(media=True) 发布到内存媒体会话。
+"""
+import contextlib
+import json
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# 假的媒体快照，load_server(media=True) 时发布到内存媒体会话
+FAKE_MEDIA = {
+    'title': 'Fake Song', 'artist': 'Roselia', 'albumTitle': 'Bench',
+    'thumbnail': 'data:image/jpeg;base64,' + 'A' * 40000,
+    'state': 'playing', 'stateCode': 4, 'position': 12.5, 'duration': 240.0,
+}
+
+
+def make_memos(count, due=None):
+    return [{"id": i + 1, "title": f"memo {i}", "content": "x" * 200, "dueDate": due,
+             "enableReminder": due is not None, "done": False, "reminderShown": False}
+            for i in range(count)]
+
+
+def make_config(memo_count, due=None):
+    return {
+        "apps": [{"name": f"app {i}", "path": f"C:/apps/{i}.exe", "icon": ""} for i in range(8)],
+        "memos": make_memos(memo_count, due),
+        "dailyGoals": {"date": "2026-01-01", "items": [{"text": "goal", "done": False}] * 5},
+        "musicPath": "",
+        "autoStart": True,
+        "debug": False,
+    }
+
+
+def load_server(config=None, media=False):
+    """导入（或复用）server 模块，并让它使用新的临时配置文件"""
+    # 导入时的提示信息打到 stderr，stdout 留给 JSON 结果
+    with contextlib.redirect_stdout(sys.stderr):
+        import server
+
+    server.CONFIG_FILE = os.path.join(tempfile.mkdtemp(), 'user_config.json')
+    if config is not None:
+        write_config(server, config)
+    else:
+        server.config_store.open(server.CONFIG_FILE)
+    if media:
+        server.services.media.publish(FAKE_MEDIA)
+    return server
+
+
+def write_config(server, config, engine=None):
+    """替换配置文件并让 server 重新加载（不依赖 mtime 精度）；engine 选择存储引擎（默认 sections）"""
+    with open(server.CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    server.config_store.open(server.CONFIG_FILE, engine)
+    # 与正式启动一样先迁移成分区文件，不计入后续写入的耗时；提示信息打到 stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        server.config_store.migrate()
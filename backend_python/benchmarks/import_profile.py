@@ -0,0 +1,86 @@
+"""
+导入耗时报告：在子进程里用 python -X importtime 导入指定模块，汇总最慢的导入。
+
+    python benchmarks/import_profile.py [--module server] [--top 15] [--output profile.json]
+
+-X importtime 的原始输出每行是 "self [us] | cumulative [us] | 模块名"，
+模块名前的缩进表示嵌套层级。这里按累计耗时列出直接依赖（第一层），
+按自身耗时列出所有模块中最慢的几个，并检查应当延迟加载的重型依赖
+（PyQt6 / winsdk / psutil / 编辑窗口模块）是否在导入阶段被加载了。
+结果是 JSON（默认输出到 stdout），表格输出到 stderr。
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+import harness
+
+# 启动路径上不应该出现的模块：由 --headless / 首次使用 / 空闲预热按需加载
+LAZY_MODULES = ('PyQt6', 'winsdk', 'psutil', 'memo_gui', 'goals_gui', 'pomo_gui')
+
+
+def profile(module):
+    """返回 [(层级, 自身微秒, 累计微秒, 模块名)]，顺序与 -X importtime 输出一致"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=harness.BACKEND_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f'import {module} failed:\n{proc.stderr[-2000:]}')
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((depth, int(self_us), int(cumulative_us), name.strip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--module', default='server')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    rows = profile(args.module)
+    target = next((r for r in rows if r[3] == args.module), None)
+    total_us = target[2] if target else sum(r[1] for r in rows)
+    # 目标模块的直接依赖（缩进比目标多一层）
+    base_depth = target[0] if target else 0
+    direct = sorted((r for r in rows if r[0] == base_depth + 1), key=lambda r: -r[2])[:args.top]
+    slowest = sorted(rows, key=lambda r: -r[1])[:args.top]
+    loaded = {r[3] for r in rows}
+    lazy = {m: any(n == m or n.startswith(m + '.') for n in loaded) for m in LAZY_MODULES}
+
+    report = {
+        "module": args.module,
+        "python": sys.version.split()[0],
+        "total_ms": round(total_us / 1000, 2),
+        "modules": len(rows),
+        "direct": [{"module": r[3], "cumulative_ms": round(r[2] / 1000, 2)} for r in direct],
+        "slowest_self": [{"module": r[3], "self_ms": round(r[1] / 1000, 2)} for r in slowest],
+        "lazy_modules_loaded": lazy,
+    }
+
+    print(f"import {args.module}: {report['total_ms']:.1f} ms, {len(rows)} modules", file=sys.stderr)
+    print("\ndirect imports by cumulative time:", file=sys.stderr)
+    for r in direct:
+        print(f"  {r[3]:40} {r[2] / 1000:9.2f} ms", file=sys.stderr)
+    print("\nslowest modules by self time:", file=sys.stderr)
+    for r in slowest:
+        print(f"  {r[3]:40} {r[1] / 1000:9.2f} ms", file=sys.stderr)
+    print("\nlazy modules loaded at import:", file=sys.stderr)
+    for m, was_loaded in lazy.items():
+        print(f"  {m:40} {'LOADED' if was_loaded else 'no'}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
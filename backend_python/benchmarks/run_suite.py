@@ -0,0 +1,254 @@
+"""
+后端热点路径基准套件，通过 Flask test client 调用路由，平台服务已替换（见 harness.py）。
+
+    python benchmarks/run_suite.py [--sizes 10,1000,100000] [--filter memos]
+                                   [--budget 2.0] [--output result.json]
+                                   [--baseline old.json] [--threshold 1.2]
+
+结果是 JSON（默认输出到 stdout，--output 写文件），人类可读的表格输出到 stderr。
+指定 --baseline 时按中位数与基线比较，慢于 threshold 倍的用例标记为回归，
+此时退出码为 1，方便在 review 里直接看出性能退化。
+
+带 [size] 的用例在每个备忘录规模下各跑一次；每个用例先预热，然后重复执行
+直到用完时间预算（至少 3 次，最多 --max-iterations 次）。
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import harness
+
+CASES = []
+
+
+def case(name, sized=True):
+    def register(fn):
+        CASES.append((name, fn, sized))
+        return fn
+    return register
+
+
+def _client(config=None, media=False):
+    server = harness.load_server(config, media=media)
+    return server, server.app.test_client()
+
+
+def _ok(res):
+    assert res.status_code == 200, (res.status_code, res.data[:200])
+
+
+# ── 用例：每个函数做好准备工作，返回 op(i) ──────────────────────
+@case('config_get')
+def config_get(size):
+    _, client = _client(harness.make_config(size))
+    return lambda i: _ok(client.get('/config'))
+
+
+@case('config_post')
+def config_post(size):
+    _, client = _client(harness.make_config(size))
+    body = json.dumps(harness.make_config(size))
+    return lambda i: _ok(client.post('/config', data=body, content_type='application/json'))
+
+
+@case('memos_list')
+def memos_list(size):
+    _, client = _client(harness.make_config(size))
+    return lambda i: _ok(client.get('/api/memos'))
+
+
+@case('memos_page')
+def memos_page(size):
+    _, client = _client(harness.make_config(size))
+    return lambda i: _ok(client.get('/api/memos?status=open&sort=dueDate&limit=50'))
+
+
+@case('memos_page_revalidate')
+def memos_page_revalidate(size):
+    # 翻页时带着上一页的 ETag 也必须拿到新的一页；同一页重新验证才是 304
+    _, client = _client(harness.make_config(size))
+    first = client.get('/api/memos?sort=id&limit=5')
+    _ok(first)
+    cursor = first.get_json()['nextCursor']
+    pages = ['/api/memos?sort=id&limit=5', '/api/memos?sort=-id&limit=5', '/api/memos?status=done&limit=5']
+    if cursor:
+        pages.append(f'/api/memos?sort=id&limit=5&after={cursor}')
+
+    def op(i):
+        for path in pages[1:]:
+            res = client.get(path, headers={'If-None-Match': first.headers['ETag']})
+            _ok(res)
+            assert res.headers['ETag'] != first.headers['ETag'], path
+            again = client.get(path, headers={'If-None-Match': res.headers['ETag']})
+            assert again.status_code == 304, (path, again.status_code)
+    return op
+
+
+@case('memos_create')
+def memos_create(size):
+    _, client = _client(harness.make_config(size))
+    return lambda i: _ok(client.post('/api/memos', json={"title": f"new {i}", "content": "", "dueDate": ""}))
+
+
+@case('memos_patch')
+def memos_patch(size):
+    _, client = _client(harness.make_config(size))
+    return lambda i: _ok(client.patch(f'/api/memos/{i % size + 1}', json={"done": i % 2 == 0}))
+
+
+@case('memos_delete')
+def memos_delete(size):
+    _, client = _client(harness.make_config(size))
+    return lambda i: _ok(client.post('/api/memos/delete', json={"id": i + 1}))
+
+
+@case('goals_update')
+def goals_update(size):
+    # 只写 dailyGoals 分区，耗时不应随备忘录数量增长
+    _, client = _client(harness.make_config(size))
+    return lambda i: _ok(client.post('/api/goals/update_items', json={"items": [{"text": "goal", "done": i % 2 == 0}]}))
+
+
+@case('reminder_scan')
+def reminder_scan(size):
+    # 全部开启提醒但都未到期：提醒队列里没有到期条目，不应随备忘录数量增长
+    due = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M')
+    server, _ = _client(harness.make_config(size, due=due))
+    return lambda i: server.scan_reminders()
+
+
+@case('reminder_fire')
+def reminder_fire(size):
+    # 队列里有 size 条未到期的提醒，另一条每次改成过去的时间（一次单条 PATCH）再触发：
+    # 触发的事务只替换这一条，写盘（分区文件只重新编码这一条）和索引更新都不应随 size 明显增长
+    due = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M')
+    config = harness.make_config(size, due=due)
+    memo_id = size + 1
+    config['memos'].append({**harness.make_memos(1, due)[0], "id": memo_id})
+    server, client = _client(config)
+    server.services.notifier.notify = lambda *a, **k: None
+    past = [(datetime.now() - timedelta(hours=h)).strftime('%Y-%m-%dT%H:%M') for h in (1, 2)]
+
+    def op(i):
+        _ok(client.patch(f'/api/memos/{memo_id}', json={"dueDate": past[i % 2]}))
+        server.scan_reminders()
+        assert server.get_memo_index().get(memo_id)['reminderShown'] is True
+    return op
+
+
+@case('media_status', sized=False)
+def media_status(size):
+    _, client = _client(harness.make_config(10), media=True)
+    return lambda i: _ok(client.get('/media/status', headers={'Accept-Encoding': 'gzip'}))
+
+
+@case('stats', sized=False)
+def stats(size):
+    _, client = _client(harness.make_config(10))
+    return lambda i: _ok(client.get('/api/stats'))
+
+
+# ── 执行与比较 ─────────────────────────────────────────
+def measure(op, budget, max_iterations, warmup=1):
+    for i in range(warmup):
+        op(-1 - i)
+    samples = []
+    deadline = time.perf_counter() + budget
+    while len(samples) < max_iterations and (len(samples) < 3 or time.perf_counter() < deadline):
+        t0 = time.perf_counter()
+        op(len(samples))
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    ms = [s * 1000 for s in samples]
+    return {
+        "samples": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "median_ms": round(statistics.median(ms), 4),
+        "p95_ms": round(ms[max(0, int(len(ms) * 0.95) - 1)], 4),
+        "min_ms": round(ms[0], 4),
+    }
+
+
+def compare(results, baseline, threshold):
+    """返回 [(key, 当前中位数, 基线中位数, 比值, 是否回归)]"""
+    rows = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if not base:
+            rows.append((key, r['median_ms'], None, None, False))
+            continue
+        ratio = r['median_ms'] / base['median_ms'] if base['median_ms'] else float('inf')
+        rows.append((key, r['median_ms'], base['median_ms'], ratio, ratio > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10,1000,100000')
+    parser.add_argument('--filter', default='', help='只运行名字包含该字符串的用例')
+    parser.add_argument('--budget', type=float, default=2.0, help='每个用例的计时预算（秒）')
+    parser.add_argument('--max-iterations', type=int, default=200)
+    parser.add_argument('--output')
+    parser.add_argument('--baseline')
+    parser.add_argument('--threshold', type=float, default=1.2)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    results = {}
+    for name, factory, sized in CASES:
+        if args.filter not in name:
+            continue
+        for size in (sizes if sized else [None]):
+            key = f'{name}[{size}]' if sized else name
+            op = factory(size)
+            results[key] = measure(op, args.budget, args.max_iterations)
+            print(f"{key:28} median {results[key]['median_ms']:10.3f} ms  "
+                  f"p95 {results[key]['p95_ms']:10.3f} ms  n={results[key]['samples']}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "budget": args.budget,
+        },
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+        rows = compare(results, baseline, args.threshold)
+        report["comparison"] = {
+            "baseline": args.baseline,
+            "threshold": args.threshold,
+            "cases": {key: {"median_ms": cur, "baseline_median_ms": base,
+                            "ratio": round(ratio, 3) if ratio is not None else None, "regression": bad}
+                      for key, cur, base, ratio, bad in rows},
+        }
+        print(f"\ncompared with {args.baseline} (threshold {args.threshold}x):", file=sys.stderr)
+        for key, cur, base, ratio, bad in rows:
+            if base is None:
+                print(f"{key:28} {cur:10.3f} ms  (new)", file=sys.stderr)
+            else:
+                print(f"{key:28} {cur:10.3f} ms  vs {base:10.3f} ms  {ratio:6.2f}x"
+                      f"{'  REGRESSION' if bad else ''}", file=sys.stderr)
+        regressions = [row[0] for row in rows if row[4]]
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+配置并发写入压力测试：所有写入路径同时运行，检查没有丢失的更新。
+
+    python benchmarks/stress_config.py [--rounds 200] [--threads 4] [--storage journal]
+
+并发的写入方：
+  - POST /api/memos（新建）、PATCH /api/memos/<id>（勾选 done）、POST /api/memos/delete
+  - PATCH /config（每个线程写自己的设置键）、POST /api/goals/update_items
+  - 编辑窗口的保存回调（GuiManager.update_memo / update_pomodoro_internal，需要 PyQt6）
+  - 提醒扫描 scan_reminders（标记 reminderShown）
+
+结束后分别检查内存中的配置和从磁盘重新读取的配置：每一次写入的效果都必须存在，
+每条到期提醒只弹出一次。有丢失的更新时退出码为 1。
+"""
+import argparse
+import contextlib
+import json
+import sys
+import threading
+import time
+
+import harness
+from config_store import ConfigStore
+
+REMINDERS = 40          # 通知历史最多保留 100 条
+
+
+def seed(server, rounds, threads, storage):
+    memos = harness.make_memos(rounds * threads * 2)          # 前一半勾选，后一半删除
+    due = harness.make_memos(REMINDERS, due='2000-01-01T00:00')
+    for i, m in enumerate(due):
+        m['id'] = 900000 + i
+    harness.write_config(server, {
+        "memos": memos + due,
+        "dailyGoals": {"date": "2026-01-01", "items": []},
+        "pomodoroConfig": {"work": 25, "rest": 5, "presets": []},
+        "debug": False,
+    }, storage)
+    return [m['id'] for m in memos]
+
+
+def editor_manager(server):
+    try:
+        from gui_manager import GuiManager
+    except ImportError:
+        print("PyQt6 not installed, skipping editor writers", file=sys.stderr)
+        return None
+    return GuiManager(server.config_store)
+
+
+def run(server, rounds, threads, storage=None):
+    client = server.app.test_client()
+    ids = seed(server, rounds, threads, storage)
+    half = len(ids) // 2
+    manager = editor_manager(server)
+    errors = []
+    goals_posted = []
+    pomodoro_posted = []
+    stop = threading.Event()
+
+    def guard(fn):
+        def wrapper(*args):
+            try:
+                fn(*args)
+            except Exception as e:
+                errors.append(f'{fn.__name__}{args}: {type(e).__name__}: {e}')
+        return wrapper
+
+    @guard
+    def creator(t):
+        for i in range(rounds):
+            res = client.post('/api/memos', json={"id": 100000 * (t + 1) + i, "title": f"new {t}.{i}"})
+            assert res.status_code == 200, res.status_code
+
+    @guard
+    def patcher(t):
+        for memo_id in ids[t:half:threads]:
+            res = client.patch(f'/api/memos/{memo_id}', json={"done": True})
+            assert res.status_code == 200, res.status_code
+
+    @guard
+    def deleter(t):
+        for memo_id in ids[half + t::threads]:
+            res = client.post('/api/memos/delete', json={"id": memo_id})
+            assert res.status_code == 200, res.status_code
+
+    @guard
+    def settings(t):
+        for i in range(rounds):
+            res = client.patch('/config', json={f"stress{t}": i},
+                               headers={"Content-Type": "application/merge-patch+json"})
+            assert res.status_code == 200, res.status_code
+
+    @guard
+    def goals():
+        for i in range(rounds):
+            items = [{"text": f"goal {i}.{k}", "done": False} for k in range(3)]
+            res = client.post('/api/goals/update_items', json={"items": items})
+            assert res.status_code == 200, res.status_code
+            goals_posted.append(items)
+
+    @guard
+    def editor(t):
+        for i in range(rounds):
+            manager.update_memo({"id": 500000 * (t + 1) + i, "title": f"editor {t}.{i}"})
+            if t == 0:
+                cfg = {"work": 25 + i % 30, "rest": 5, "presets": [], "rev": i}
+                manager.update_pomodoro_internal(cfg)
+                pomodoro_posted.append(cfg)
+
+    @guard
+    def reminders():
+        while not stop.is_set():
+            server.scan_reminders()
+
+    workers = [threading.Thread(target=goals)]
+    for t in range(threads):
+        workers += [threading.Thread(target=fn, args=(t,)) for fn in (creator, patcher, deleter, settings)]
+        if manager is not None:
+            workers.append(threading.Thread(target=editor, args=(t,)))
+    scanner = threading.Thread(target=reminders)
+
+    t0 = time.perf_counter()
+    scanner.start()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    stop.set()
+    scanner.join()
+    server.scan_reminders()
+    elapsed = time.perf_counter() - t0
+
+    def check(config, where):
+        memos = {m['id']: m for m in config.get('memos', [])}
+        for t in range(threads):
+            for i in range(rounds):
+                if 100000 * (t + 1) + i not in memos:
+                    errors.append(f'{where}: created memo {t}.{i} lost')
+                if manager is not None and 500000 * (t + 1) + i not in memos:
+                    errors.append(f'{where}: editor memo {t}.{i} lost')
+            if config.get(f'stress{t}') != rounds - 1:
+                errors.append(f'{where}: stress{t} = {config.get(f"stress{t}")}, expected {rounds - 1}')
+        for memo_id in ids[:half]:
+            if not memos.get(memo_id, {}).get('done'):
+                errors.append(f'{where}: done on memo {memo_id} lost')
+        for memo_id in ids[half:]:
+            if memo_id in memos:
+                errors.append(f'{where}: deleted memo {memo_id} came back')
+        for i in range(REMINDERS):
+            if not memos.get(900000 + i, {}).get('reminderShown'):
+                errors.append(f'{where}: reminderShown on memo {900000 + i} lost')
+        if config.get('dailyGoals', {}).get('items') != goals_posted[-1]:
+            errors.append(f'{where}: dailyGoals is not the last posted list')
+        if pomodoro_posted and config.get('pomodoroConfig') != pomodoro_posted[-1]:
+            errors.append(f'{where}: pomodoroConfig is not the last saved value')
+
+    check(server.load_config(), 'memory')
+    disk = ConfigStore({})
+    disk.open(server.CONFIG_FILE)
+    check(disk.load(), 'disk')
+    fired = sum(1 for title, _ in server.services.notifier.history if title == "Wallpaper Engine Memo")
+    if fired != REMINDERS:
+        errors.append(f'{fired} reminders fired, expected {REMINDERS}')
+
+    writes = len(workers) * rounds
+    return {
+        "storage": server.config_store.engine,
+        "threads": len(workers) + 1,
+        "writes": writes,
+        "elapsed_s": round(elapsed, 3),
+        "writes_per_s": round(writes / elapsed, 1),
+        "editors": manager is not None,
+        "errors": errors[:50],
+        "errorCount": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--storage', choices=('sections', 'journal'))
+    args = parser.parse_args()
+
+    server = harness.load_server()
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(server, args.rounds, args.threads, args.storage)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    sys.exit(1 if report["errorCount"] else 0)
+
+
+if __name__ == '__main__':
+    main()
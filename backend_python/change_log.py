@@ -0,0 +1,80 @@
+"""
+有界变更日志：为 memos / dailyGoals 的每次修改分配单调递增的版本号，
+客户端用 ?since=<version> 只拉取之后的增量。
+
+日志只保留最近 maxlen 条记录；客户端落后太多（所需记录已被淘汰）
+或服务端重启过（epoch 不同）时返回 None，由调用方回退到全量快照。
+
+wait() 阻塞到有新版本（或超时、close()），供 /api/changes 长轮询使用。
+"""
+import threading
+import uuid
+from collections import deque
+from typing import Iterable, Optional, Set, Tuple
+
+
+class ChangeLog:
+    def __init__(self, maxlen: int = 1024):
+        # 每次进程启动生成新的 epoch，旧版本号在新进程中没有意义
+        self.epoch = uuid.uuid4().hex[:12]
+        self.version = 0
+        self._entries = deque(maxlen=maxlen)   # (version, section, upserts, deletes)
+        self._floor = 0                        # 已被淘汰的最大版本号
+        self._section_versions = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._closed = False
+
+    def record(self, section: str, upserts: Iterable = (), deletes: Iterable = ()) -> int:
+        upserts, deletes = tuple(upserts), tuple(deletes)
+        with self._lock:
+            self.version += 1
+            if len(self._entries) == self._entries.maxlen:
+                self._floor = self._entries[0][0]
+            self._entries.append((self.version, section, upserts, deletes))
+            self._section_versions[section] = self.version
+            self._changed.notify_all()
+            return self.version
+
+    def section_version(self, section: str) -> int:
+        return self._section_versions.get(section, 0)
+
+    def since(self, version: int, section: str, epoch: Optional[str] = None) -> Optional[Tuple[Set, Set]]:
+        """
+        返回 version 之后 section 中 (被新增/修改的 id, 被删除的 id)。
+        无法从日志还原时返回 None。
+        """
+        with self._lock:
+            if (epoch is not None and epoch != self.epoch) or version < self._floor or version > self.version:
+                return None
+            upserted, deleted = set(), set()
+            for v, sec, ups, dels in self._entries:
+                if v <= version or sec != section:
+                    continue
+                for i in ups:
+                    upserted.add(i)
+                    deleted.discard(i)
+                for i in dels:
+                    deleted.add(i)
+                    upserted.discard(i)
+            return upserted, deleted
+
+    def sections_since(self, version: int, epoch: Optional[str] = None) -> Optional[Set[str]]:
+        """version 之后变化过的分区；无法从日志还原时返回 None"""
+        with self._lock:
+            if (epoch is not None and epoch != self.epoch) or version < self._floor or version > self.version:
+                return None
+            return {sec for v, sec, _, _ in self._entries if v > version}
+
+    def wait(self, version: int, epoch: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """等到有比 version 新的记录（epoch 不同视为已有变化），返回是否有变化"""
+        with self._lock:
+            return self._changed.wait_for(
+                lambda: self._closed or self.version > version or (epoch is not None and epoch != self.epoch),
+                timeout) and not self._closed
+
+    def close(self) -> None:
+        """唤醒所有等待中的 wait()（退出时让长轮询立即返回）"""
+        with self._lock:
+            self._closed = True
+            self._changed.notify_all()
@@ -0,0 +1,114 @@
+"""
+响应压缩：按 Accept-Encoding 协商 br（安装了 brotli 包时）/ gzip / deflate。
+小于 MIN_SIZE 的响应、流式响应和非文本类型不压缩。
+
+    compression.init_app(app, cached_routes=('/config', '/media/status', '/media/watch'))
+
+cached_routes 中的接口响应体由 ETag（内存状态的版本号）唯一确定，
+每个 (路由, 编码) 缓存最近一个 ETag 的压缩结果，同一版本的重复请求不再压缩。
+压缩后的响应换成该编码自己的强 ETag（"<tag>-gzip"），不同的字节不共用一个校验器；
+条件请求按版本比较，任意编码的 ETag 都能得到 304（见 http_cache.matching_etag）。
+"""
+import gzip
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, Tuple
+
+from flask import Flask, request
+
+import metrics
+from http_cache import encoded_etag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = 1024
+
+_COMPRESSORS = {
+    'gzip': lambda data: gzip.compress(data, compresslevel=6, mtime=0),
+    'deflate': lambda data: zlib.compress(data, 6),
+}
+if brotli is not None:
+    _COMPRESSORS['br'] = lambda data: brotli.compress(data, quality=5)
+
+# 服务端偏好顺序，客户端 q 值相同时取靠前的
+ENCODINGS = tuple(e for e in ('br', 'gzip', 'deflate') if e in _COMPRESSORS)
+
+RESPONSES = metrics.counter('http_compressed_responses_total', 'Responses sent with a Content-Encoding')
+BYTES_IN = metrics.counter('http_compression_bytes_in_total', 'Response bytes before compression')
+BYTES_OUT = metrics.counter('http_compression_bytes_out_total', 'Response bytes after compression')
+CPU_SECONDS = metrics.counter('http_compression_cpu_seconds_total', 'Thread CPU time spent compressing')
+CACHE_HITS = metrics.counter('http_compression_cache_hits_total',
+                             'Compressed bodies served from the per-ETag cache')
+
+# (route, encoding) -> (etag, compressed bytes)
+_cache: Dict[Tuple[str, str], Tuple[str, bytes]] = {}
+_cache_lock = threading.Lock()
+
+
+def _ratio_samples() -> Iterable[Tuple[dict, float]]:
+    totals_out = {labels['encoding']: v for labels, v in BYTES_OUT.samples()}
+    for labels, total_in in BYTES_IN.samples():
+        out = totals_out.get(labels['encoding'])
+        if out:
+            yield {"encoding": labels['encoding']}, round(total_in / out, 3)
+
+
+metrics.gauge('http_compression_ratio', 'Uncompressed / compressed bytes per encoding', _ratio_samples)
+
+
+def _compressible(mimetype: str) -> bool:
+    return mimetype == 'application/json' or mimetype.startswith('text/')
+
+
+def compress(route: str, etag, encoding: str, data: bytes, cacheable: bool) -> bytes:
+    if cacheable:
+        with _cache_lock:
+            hit = _cache.get((route, encoding))
+        if hit and hit[0] == etag:
+            CACHE_HITS.inc(route=route)
+            return hit[1]
+
+    t0 = time.thread_time()
+    body = _COMPRESSORS[encoding](data)
+    CPU_SECONDS.inc(time.thread_time() - t0, encoding=encoding)
+
+    if cacheable:
+        with _cache_lock:
+            _cache[(route, encoding)] = (etag, body)
+    return body
+
+
+def init_app(app: Flask, cached_routes: Iterable[str] = ()) -> None:
+    cached = frozenset(cached_routes)
+
+    @app.after_request
+    def compress_response(resp):
+        if (resp.direct_passthrough or resp.is_streamed
+                or not 200 <= resp.status_code < 300 or resp.status_code == 204
+                or 'Content-Encoding' in resp.headers or not _compressible(resp.mimetype)):
+            return resp
+        resp.vary.add('Accept-Encoding')
+
+        encoding = request.accept_encodings.best_match(ENCODINGS)
+        if not encoding:
+            return resp
+        data = resp.get_data()
+        if len(data) < MIN_SIZE:
+            return resp
+
+        route = request.url_rule.rule if request.url_rule else request.path
+        etag, weak = resp.get_etag()
+        body = compress(route, etag, encoding, data, cacheable=route in cached and etag is not None)
+
+        resp.set_data(body)
+        resp.headers['Content-Encoding'] = encoding
+        if etag is not None:
+            resp.set_etag(encoded_etag(etag, encoding), weak=weak)
+        RESPONSES.inc(route=route, encoding=encoding)
+        BYTES_IN.inc(len(data), encoding=encoding)
+        BYTES_OUT.inc(len(body), encoding=encoding)
+        return resp
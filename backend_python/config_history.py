@@ -0,0 +1,221 @@
+"""
+撤销 / 重做历史：记录分区修改的反向操作（不是整个配置的副本），按字节预算淘汰最早的记录。
+
+    history = History(budget=1 << 20)
+    history.record('memos', 'delete memo 3', before, after)   # 事务提交时调用（ConfigStore 负责）
+    entry = history.pop_undo('memos')                         # 最近一条；section 为 None 时跨分区
+    value = apply_patch(current, entry.inverse_patch())       # 在当前值上应用反向操作
+
+补丁只描述变化的部分，按备忘录 id（而不是位置）定位，撤销时在当前值上应用：
+之后的其他修改（另一条备忘录被勾选、列表重新排序）不影响撤销结果。
+
+    {"t": "ids", "del": [id, ...], "set": [[id, {键: 值}, [删除的键]], ...], "ins": [[位置, 元素], ...]}
+        元素都有唯一 id 的列表（memos）：删除、修改字段、在原位置插入
+    {"t": "keys", "k": {键: 值}, "x": [删除的键]}     dict 分区（dailyGoals）：只记录变化的键
+    {"t": "value", "v": 值} / {"t": "missing"}         其他情况整体替换 / 删除分区
+
+补丁编码成紧凑 JSON 保存：占用的内存就是记录的字节数，不会引用缓存中的对象，
+所以历史占用的内存只取决于预算，与备忘录数量和大小无关。全部分区共用一个预算，
+超出时从最早的记录开始淘汰（撤销栈和重做栈都算）。新的修改清空该分区的重做栈。
+"""
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from config_store import MISSING
+from merge_patch import list_delta
+
+HISTORY_BUDGET = 1 << 20
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _field_delta(old: dict, new: dict):
+    """把 old 改成 new 所需的 ({键: 新值}, [删除的键])"""
+    return ({k: v for k, v in new.items() if k not in old or (old[k] is not v and old[k] != v)},
+            [k for k in old if k not in new])
+
+
+def _has_id(item) -> bool:
+    return isinstance(item, dict) and item.get('id') is not None
+
+
+def _list_patches(old: list, new: list):
+    """
+    (正向补丁, 反向补丁)。变化的位置用 merge_patch.list_delta 按对象身份找出，
+    只看变化的元素（删除一条备忘录不必逐条比较上万条）；有变化的元素没有 id 时返回 None。
+    """
+    replaced, deleted, appended = list_delta(old, new)
+    touched = [new[int(i)] for i in replaced] + [old[i] for i in deleted] + appended
+    if not all(map(_has_id, touched)):
+        return None
+    forward = {"t": "ids", "del": [], "set": [], "ins": []}
+    inverse = {"t": "ids", "del": [], "set": [], "ins": []}
+    for pos, item in replaced.items():
+        before = old[int(pos)]
+        forward["set"].append([item['id'], *_field_delta(before, item)])
+        inverse["set"].append([item['id'], *_field_delta(item, before)])
+    for i in deleted:
+        forward["del"].append(old[i]['id'])
+        inverse["ins"].append([i, old[i]])
+    for j, item in enumerate(appended, start=len(new) - len(appended)):
+        forward["ins"].append([j, item])
+        inverse["del"].append(item['id'])
+    return forward, inverse
+
+
+def make_patches(old: Any, new: Any):
+    """分区从 old 变成 new 的 (正向补丁, 反向补丁)"""
+    if isinstance(old, list) and isinstance(new, list):
+        patches = _list_patches(old, new)
+        if patches is not None:
+            return patches
+    elif isinstance(old, dict) and isinstance(new, dict):
+        k, x = _field_delta(old, new)
+        k_inv, x_inv = _field_delta(new, old)
+        return {"t": "keys", "k": k, "x": x}, {"t": "keys", "k": k_inv, "x": x_inv}
+    value = lambda v: {"t": "missing"} if v is MISSING else {"t": "value", "v": v}
+    return value(new), value(old)
+
+
+def apply_patch(value: Any, patch: Dict[str, Any]) -> Any:
+    """在当前值上应用补丁，返回新值（写时复制，不修改 value 和其中的元素）"""
+    kind = patch["t"]
+    if kind == "missing":
+        return MISSING
+    if kind == "value":
+        return patch["v"]
+    if kind == "keys":
+        result = dict(value) if isinstance(value, dict) else {}
+        result.update(patch["k"])
+        for key in patch["x"]:
+            result.pop(key, None)
+        return result
+    items = list(value) if isinstance(value, list) else []
+    if patch["del"]:
+        deleted = set(patch["del"])
+        items = [m for m in items if not (isinstance(m, dict) and m.get('id') in deleted)]
+    if patch["set"]:
+        changes = {key: (k, x) for key, k, x in patch["set"]}
+        for i, m in enumerate(items):
+            if isinstance(m, dict) and m.get('id') in changes:
+                k, x = changes[m['id']]
+                m = {**m, **k}
+                for key in x:
+                    m.pop(key, None)
+                items[i] = m
+    present = {m.get('id') for m in items if isinstance(m, dict)}
+    for pos, item in sorted(patch["ins"], key=lambda p: p[0]):
+        if item.get('id') not in present:        # 已经存在（例如被重新创建）时不重复插入
+            items.insert(min(pos, len(items)), item)
+    return items
+
+
+class Entry:
+    __slots__ = ('section', 'label', 'time', 'forward', 'inverse', 'size')
+
+    def __init__(self, section: str, label: str, forward: bytes, inverse: bytes):
+        self.section = section
+        self.label = label
+        self.time = time.time()
+        self.forward = forward
+        self.inverse = inverse
+        self.size = len(forward) + len(inverse) + len(label)
+
+    def forward_patch(self) -> Dict[str, Any]:
+        return json.loads(self.forward)
+
+    def inverse_patch(self) -> Dict[str, Any]:
+        return json.loads(self.inverse)
+
+    def info(self) -> Dict[str, Any]:
+        return {"section": self.section, "label": self.label, "time": round(self.time, 3), "bytes": self.size}
+
+
+class History:
+    def __init__(self, budget: int = HISTORY_BUDGET):
+        self.budget = budget
+        self._undo: Dict[str, List[Entry]] = {}
+        self._redo: Dict[str, List[Entry]] = {}
+        self._order: deque = deque()          # 全部记录（撤销栈和重做栈），最早的在左边
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def _add(self, entry: Entry) -> None:
+        self._order.append(entry)
+        self.bytes += entry.size
+        while self.bytes > self.budget and self._order:
+            oldest = self._order.popleft()
+            self.bytes -= oldest.size
+            for stacks in (self._undo, self._redo):
+                stack = stacks.get(oldest.section, [])
+                if oldest in stack:
+                    stack.remove(oldest)
+
+    def _drop(self, entries: List[Entry]) -> None:
+        for entry in entries:
+            self._order.remove(entry)
+            self.bytes -= entry.size
+        entries.clear()
+
+    def record(self, section: str, label: str, old: Any, new: Any) -> Optional[Entry]:
+        """记录一次修改（清空该分区的重做栈），返回记录；超过预算的单条修改不记录"""
+        forward, inverse = make_patches(old, new)
+        entry = Entry(section, label, _dumps(forward), _dumps(inverse))
+        with self._lock:
+            self._drop(self._redo.setdefault(section, []))
+            if entry.size > self.budget:
+                return None
+            self._undo.setdefault(section, []).append(entry)
+            self._add(entry)
+        return entry
+
+    def _pop(self, stacks: Dict[str, List[Entry]], section: Optional[str]) -> Optional[Entry]:
+        with self._lock:
+            if section is None:
+                candidates = [s[-1] for s in stacks.values() if s]
+                if not candidates:
+                    return None
+                section = max(candidates, key=lambda e: e.time).section
+            stack = stacks.get(section)
+            if not stack:
+                return None
+            entry = stack.pop()
+            self._order.remove(entry)
+            self.bytes -= entry.size
+            return entry
+
+    def pop_undo(self, section: Optional[str] = None) -> Optional[Entry]:
+        """取出 section（None 时为全部分区中最近的）的最近一条撤销记录"""
+        return self._pop(self._undo, section)
+
+    def pop_redo(self, section: Optional[str] = None) -> Optional[Entry]:
+        return self._pop(self._redo, section)
+
+    def restore(self, entry: Entry, undo: bool) -> None:
+        """取出的记录没能应用（事务失败）时放回原来的栈顶（undo=True 为撤销栈），时间不变"""
+        with self._lock:
+            (self._undo if undo else self._redo).setdefault(entry.section, []).append(entry)
+            self._add(entry)
+
+    def push(self, entry: Entry, redo: bool) -> None:
+        """撤销后把记录放进重做栈（redo=True），重做后放回撤销栈"""
+        entry.time = time.time()
+        with self._lock:
+            (self._redo if redo else self._undo).setdefault(entry.section, []).append(entry)
+            self._add(entry)
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            sections = set(self._undo) | set(self._redo)
+            return {
+                "bytes": self.bytes,
+                "budget": self.budget,
+                "sections": {s: {"undo": [e.info() for e in reversed(self._undo.get(s, []))],
+                                 "redo": [e.info() for e in reversed(self._redo.get(s, []))]}
+                             for s in sorted(sections)},
+            }
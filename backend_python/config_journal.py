@@ -0,0 +1,309 @@
+"""
+journal 存储引擎：快照 + 只追加的变更日志（可选，server.py --storage journal）。
+
+    user_config.json             清单 {"format": ..., "engine": "journal", "dir": "user_config.d",
+                                       "snapshot": "snapshot.json", "journal": "journal.log"}
+    user_config.d/snapshot.json  {"seq": N, "sections": {...}}（缺失的分区不出现）
+    user_config.d/journal.log    每行一条记录：<CRC32，8 位十六进制> <json>
+
+每次提交只追加一行，内容是变化分区的增量，而不是整个分区：
+
+    {"q": 序号, "c": [{"s": "memos", "r": {"位置": 新元素}, "d": [删除的位置], "a": [追加的元素]}]}
+    {"q": 序号, "c": [{"s": "settings", "k": {键: 新值}, "x": [删除的键]}]}
+    {"q": 序号, "c": [{"s": "apps", "v": 整个值}]}       整体替换；{"s": ..., "m": 1} 表示删除分区
+
+列表增量按位置记录（先按原位置替换，再删除，最后追加），重放结果与提交时完全一致，
+不依赖备忘录 id 是否唯一。分区元素按写时复制修改，没变的元素与提交前是同一个对象，
+所以找出增量只需按身份比较；增量比整个值的一半还多时写整体替换。
+
+启动时读取快照，跳过序号不大于快照序号的记录，逐行校验 CRC 后重放；遇到校验失败
+或不完整的行（写到一半时崩溃）停止重放，并把日志截断到最后一条完整记录。
+
+压缩：日志超过 max(COMPACT_MIN_BYTES, 快照大小) 后，maintain()（server 中由调度器定期
+调用）在锁内记下当前序号和日志长度，在锁外把新快照序列化到临时文件，再回到锁内
+替换快照，并把这期间追加的记录复制到新日志。快照先于日志替换：两步之间崩溃时，
+旧日志里已包含在快照中的记录按序号跳过。
+
+每条记录写入后 flush 到操作系统（进程崩溃不丢数据）；sync=True 时每条记录再 fsync
+（断电也不丢，代价是每次提交都要等磁盘）。flush() 和退出时总会 fsync。
+"""
+import json
+import os
+import shutil
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+import metrics
+from config_store import CONFIG_IO_BYTES, CONFIG_IO_SECONDS, INVALID, MISSING, SECTIONS, Storage, file_stamp
+from merge_patch import list_delta
+
+COMPACT_MIN_BYTES = 1 << 20
+
+JOURNAL_RECORDS = metrics.counter('config_journal_records_total', 'Records appended to the config journal')
+
+_UNKNOWN = object()   # 提交前的值未知（重试失败的写入时），写整体替换
+
+
+def make_change(name: str, old: Any, new: Any) -> Dict[str, Any]:
+    """一个分区从 old 变成 new 的日志条目"""
+    if new is MISSING:
+        return {"s": name, "m": 1}
+    if isinstance(old, list) and isinstance(new, list):
+        replaced, deleted, appended = list_delta(old, new)
+        if len(replaced) + len(deleted) + len(appended) <= max(1, len(new) // 2):
+            change = {"s": name}
+            if replaced:
+                change["r"] = replaced
+            if deleted:
+                change["d"] = deleted
+            if appended:
+                change["a"] = appended
+            return change
+    elif isinstance(old, dict) and isinstance(new, dict):
+        change = {"s": name, "k": {k: v for k, v in new.items()
+                                   if k not in old or (old[k] is not v and old[k] != v)}}
+        removed = [k for k in old if k not in new]
+        if removed:
+            change["x"] = removed
+        return change
+    return {"s": name, "v": new}
+
+
+def apply_change(sections: Dict[str, Any], change: Dict[str, Any], owned: set) -> None:
+    """
+    把日志条目应用到 sections（重放时调用）。owned 记录已复制过的分区：
+    每个分区只复制一次，之后原地修改，重放 10 万条记录不必每条都复制整个列表。
+    """
+    name = change["s"]
+    if "m" in change:
+        sections[name] = MISSING
+        owned.discard(name)
+        return
+    if "v" in change:
+        sections[name] = change["v"]
+        owned.add(name)
+        return
+    value = sections.get(name, MISSING)
+    if "k" in change or "x" in change:
+        if name not in owned or not isinstance(value, dict):
+            value = dict(value) if isinstance(value, dict) else {}
+        value.update(change.get("k", {}))
+        for key in change.get("x", ()):
+            value.pop(key, None)
+    else:
+        if name not in owned or not isinstance(value, list):
+            value = list(value) if isinstance(value, list) else []
+        for pos, item in change.get("r", {}).items():
+            value[int(pos)] = item
+        if change.get("d"):
+            deleted = set(change["d"])
+            value[:] = [item for i, item in enumerate(value) if i not in deleted]
+        value.extend(change.get("a", ()))
+    sections[name] = value
+    owned.add(name)
+
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    data = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return b'%08x ' % zlib.crc32(data) + data + b'\n'
+
+
+def decode_record(line: bytes) -> Optional[Dict[str, Any]]:
+    """校验失败或不完整时返回 None"""
+    if not line.endswith(b'\n'):
+        return None
+    crc, _, data = line[:-1].partition(b' ')
+    try:
+        if int(crc, 16) != zlib.crc32(data):
+            return None
+        record = json.loads(data)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) and isinstance(record.get('q'), int) else None
+
+
+class JournalStorage(Storage):
+    ENGINE = 'journal'
+
+    def __init__(self, path: str, default: Dict[str, Any], sync: bool = False):
+        super().__init__(path, default)
+        self.sync_each = sync
+        self._files = {"snapshot": "snapshot.json", "journal": "journal.log"}
+        self._seq = 0
+        self._log = None                  # 追加用的文件对象，第一次写入时打开
+        self._log_bytes = 0
+        self._snapshot_bytes = 0
+
+    @property
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.dir, self._files["snapshot"])
+
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self.dir, self._files["journal"])
+
+    def _stamp_files(self) -> None:
+        self._stamps['snapshot'] = file_stamp(self._snapshot_path)
+        self._stamps['journal'] = file_stamp(self._log_path)
+        self._snapshot_bytes = self._stamps['snapshot'][1] if self._stamps['snapshot'] else 0
+        self._log_bytes = self._stamps['journal'][1] if self._stamps['journal'] else 0
+
+    # ── 读取 ─────────────────────────────────────────
+    def _read_snapshot(self) -> Dict[str, Any]:
+        try:
+            with CONFIG_IO_SECONDS.time(op='load', section='snapshot'), \
+                    open(self._snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            stored = snapshot['sections']
+            self._seq = int(snapshot.get('seq', 0))
+            return {name: stored.get(name, MISSING) for name in SECTIONS}
+        except Exception as e:
+            print(f"Error loading config snapshot: {e}")
+            self._seq = 0
+            return {name: INVALID for name in SECTIONS}
+
+    def _replay(self, sections: Dict[str, Any]) -> None:
+        """按顺序重放日志中快照之后的记录；坏的尾部截断"""
+        good = applied = 0
+        owned = set(sections)             # 快照刚从文件读出，没有被其他地方引用
+        try:
+            with CONFIG_IO_SECONDS.time(op='replay', section='journal'), open(self._log_path, 'rb') as f:
+                for line in f:
+                    record = decode_record(line)
+                    if record is None:
+                        break
+                    good += len(line)
+                    if record['q'] <= self._seq:
+                        continue
+                    for change in record.get('c', ()):
+                        if change.get('s') in sections:
+                            apply_change(sections, change, owned)
+                    self._seq = record['q']
+                    applied += 1
+                size = os.fstat(f.fileno()).st_size
+        except FileNotFoundError:
+            return
+        if good < size:
+            print(f"[CONFIG] journal damaged after {applied} records, dropping {size - good} bytes")
+            os.truncate(self._log_path, good)
+
+    def _read_own(self, doc):
+        self._close_log()
+        self._files.update({k: v for k, v in doc.items() if k in self._files and isinstance(v, str)})
+        sections = self._read_snapshot()
+        if INVALID not in sections.values():
+            self._replay(sections)
+        self._stamp_files()
+        return sections
+
+    def _poll_own(self):
+        if (file_stamp(self._snapshot_path) != self._stamps.get('snapshot')
+                or file_stamp(self._log_path) != self._stamps.get('journal')):
+            return self.read()
+        return {}
+
+    def _own_files(self):
+        return [self._snapshot_path, self._log_path]
+
+    # ── 写入 ─────────────────────────────────────────
+    def _write_snapshot(self, path: str, sections: Dict[str, Any], seq: int) -> None:
+        data = {"seq": seq, "sections": {k: v for k, v in sections.items() if v is not MISSING}}
+        with CONFIG_IO_SECONDS.time(op='save', section='snapshot'), open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _migrate_data(self, sections):
+        self._close_log()
+        tmp = self._snapshot_path + '.tmp'
+        self._write_snapshot(tmp, sections, 0)
+        os.replace(tmp, self._snapshot_path)
+        open(self._log_path, 'wb').close()
+        self._seq = 0
+        self._stamp_files()
+        return dict(self._files)
+
+    def _open_log(self):
+        if self._log is None:
+            self._log = open(self._log_path, 'ab')
+        return self._log
+
+    def _close_log(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _write_changes(self, sections, names, before):
+        before = before or {}
+        changes = [make_change(name, before.get(name, _UNKNOWN), sections[name]) for name in names]
+        line = encode_record({"q": self._seq + 1, "c": changes})
+        try:
+            with CONFIG_IO_SECONDS.time(op='append', section='journal'):
+                log = self._open_log()
+                log.write(line)
+                log.flush()
+                if self.sync_each:
+                    os.fsync(log.fileno())
+        except Exception as e:
+            print(f"Error appending to config journal: {e}")
+            # 去掉可能写了一半的行，否则之后追加的记录在重放时都会被丢弃
+            self._close_log()
+            try:
+                os.truncate(self._log_path, self._log_bytes)
+            except OSError:
+                pass
+            return set(names)
+        self._seq += 1
+        self._log_bytes += len(line)
+        self._stamps['journal'] = file_stamp(self._log_path)
+        JOURNAL_RECORDS.inc()
+        if metrics.enabled():
+            CONFIG_IO_BYTES.observe(len(line), op='append', section='journal')
+        return set()
+
+    def sync(self) -> None:
+        if self._log is not None:
+            self._log.flush()
+            os.fsync(self._log.fileno())
+
+    def close(self) -> None:
+        self._close_log()
+
+    # ── 压缩 ─────────────────────────────────────────
+    def needs_compaction(self) -> bool:
+        return self.migrated and self._log_bytes > max(COMPACT_MIN_BYTES, self._snapshot_bytes)
+
+    def maintain(self, current, lock) -> bool:
+        with lock:
+            if not self.needs_compaction():
+                return False
+            sections, seq, offset = current(), self._seq, self._log_bytes
+        t0 = time.perf_counter()
+        tmp = self._snapshot_path + '.tmp'
+        try:
+            self._write_snapshot(tmp, sections, seq)
+        except Exception as e:
+            print(f"Error compacting config journal: {e}")
+            return False
+        with lock:
+            if self._seq < seq or not self.migrated:   # 期间重新加载或转换了引擎
+                return False
+            try:
+                os.replace(tmp, self._snapshot_path)
+                self._close_log()
+                log_tmp = self._log_path + '.tmp'
+                with open(self._log_path, 'rb') as src, open(log_tmp, 'wb') as dst:
+                    src.seek(offset)
+                    shutil.copyfileobj(src, dst)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.replace(log_tmp, self._log_path)
+            except Exception as e:
+                print(f"Error compacting config journal: {e}")
+                return False
+            finally:
+                self._stamp_files()
+        CONFIG_IO_SECONDS.observe(time.perf_counter() - t0, op='compact', section='journal')
+        return True
+
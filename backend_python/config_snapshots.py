@@ -0,0 +1,266 @@
+"""
+配置快照：按分区内容寻址、去重的定时快照，用于回滚。
+
+    snapshots = SnapshotStore('user_config.d/snapshots')
+    snapshots.submit(sections, 'POST /config')     # 只保存引用，不做 I/O
+    snapshots.step(lambda: store.sections())        # 后台任务：定时快照 + 写出排队的快照 + 清理
+    snapshots.list()                                # 新的在前
+    snapshots.load(snapshot_id, ['memos'])          # {分区: 值}
+
+磁盘布局：
+
+    snapshots/objects/ab/abcdef….json    分区值（紧凑 JSON），文件名是内容哈希
+    snapshots/20261019T122422.123Z-3f2a9c.json
+                                         {"id", "time", "reason", "sections": {"memos": "<hash>", ...}}
+
+快照 id 是毫秒精度的 UTC 时间加内容哈希前缀，按字符串排序即按时间排序。id 里的时间
+严格递增（与最新快照同一毫秒或更早时顺延 1 毫秒），同一秒内 A→B→A 也不会重复；
+清单里的 "time" 仍是实际时间。旧的秒精度 id 视为该秒的最后一毫秒。
+
+没有变化的分区哈希相同，只存一份；与最近一个快照完全相同时不生成新快照。
+分区值按写时复制处理（见 config_store），submit() 保存的引用之后不会被修改，
+序列化和写盘都在后台任务线程上完成，请求路径只付出一次追加到队列的代价。
+
+保留策略（settings 的 "snapshots" 键）：最近 keep 个全部保留；其余的在最近 hourly
+小时内每小时保留最新的一个、最近 daily 天内每天保留最新的一个，其他删除，
+不再被引用的分区文件随之删除。
+"""
+import calendar
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+from config_store import MISSING, SECTIONS, content_hash
+
+CONFIG_SNAPSHOTS = metrics.counter('config_snapshots_total', 'Config snapshots by outcome')
+
+# 默认保留策略；interval 为定时快照的间隔（秒），pending 为排队等待写出的上限
+SNAPSHOT_DEFAULTS = {
+    "interval": 300,
+    "keep": 10,
+    "hourly": 24,
+    "daily": 14,
+    "pending": 16,
+}
+
+
+def _id_millis(snapshot_id: str) -> int:
+    """快照 id 中的时间（UTC 毫秒）；旧的秒精度 id 视为该秒最后一毫秒"""
+    seconds = calendar.timegm(time.strptime(snapshot_id[:15], '%Y%m%dT%H%M%S'))
+    if snapshot_id[15:16] == '.':
+        return seconds * 1000 + int(snapshot_id[16:19])
+    return seconds * 1000 + 999
+
+
+def _snapshot_id(millis: int, digest: str) -> str:
+    seconds, ms = divmod(millis, 1000)
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(seconds))}.{ms:03d}Z-{digest}"
+
+
+class SnapshotStore:
+    def __init__(self, root: str, options: Optional[Dict[str, Any]] = None):
+        self.root = root
+        self.options = dict(SNAPSHOT_DEFAULTS)
+        self._lock = threading.Lock()
+        self._index: Optional[List[Dict[str, Any]]] = None   # 新的在前，第一次使用时读取
+        self._pending: deque = deque()
+        self._known: Dict[str, Tuple[Any, str]] = {}          # 分区 -> (上次序列化的对象, 哈希)
+        self._last_periodic = 0.0
+        self.configure(options)
+
+    def configure(self, options: Optional[Dict[str, Any]]) -> None:
+        """合并 settings 中的 "snapshots" 选项，无效的值忽略"""
+        for key, value in (options or {}).items():
+            if key in SNAPSHOT_DEFAULTS and isinstance(value, (int, float)) and not isinstance(value, bool) \
+                    and value >= 0:
+                self.options[key] = value
+
+    @property
+    def _objects(self) -> str:
+        return os.path.join(self.root, 'objects')
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self._objects, digest[:2], digest + '.json')
+
+    # ── 索引 ─────────────────────────────────────────
+    def _load_index(self) -> List[Dict[str, Any]]:
+        if self._index is None:
+            index = []
+            try:
+                names = os.listdir(self.root)
+            except FileNotFoundError:
+                names = []
+            for name in names:
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(self.root, name), 'r', encoding='utf-8') as f:
+                        manifest = json.load(f)
+                    if isinstance(manifest.get('sections'), dict) and isinstance(manifest.get('time'), (int, float)):
+                        index.append(manifest)
+                except (OSError, ValueError, AttributeError) as e:
+                    print(f"Error loading config snapshot {name}: {e}")
+            index.sort(key=lambda m: m['id'], reverse=True)
+            self._index = index
+        return self._index
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(m) for m in self._load_index()]
+
+    def get(self, snapshot_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((dict(m) for m in self._load_index() if m['id'] == snapshot_id), None)
+
+    # ── 读取 ─────────────────────────────────────────
+    def _read_object(self, digest: str) -> Any:
+        with open(self._object_path(digest), 'rb') as f:
+            data = f.read()
+        if content_hash(data) != digest:
+            raise ValueError(f'snapshot object {digest} is damaged')
+        return json.loads(data.decode('utf-8'))
+
+    def load(self, snapshot_id: str, names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        快照中的分区值（新对象，调用方可以直接放进缓存）；names 为 None 时为全部分区，
+        快照里没有的分区为 MISSING。快照不存在时抛出 KeyError，分区文件损坏时抛出 ValueError / OSError。
+        """
+        manifest = self.get(snapshot_id)
+        if manifest is None:
+            raise KeyError(snapshot_id)
+        stored = manifest['sections']
+        return {name: self._read_object(stored[name]) if name in stored else MISSING
+                for name in (SECTIONS if names is None else names)}
+
+    def latest(self, name: str) -> Optional[Tuple[str, Any]]:
+        """包含 name 分区且可读的最新快照：(id, 值)；没有时返回 None"""
+        for manifest in self.list():
+            digest = manifest['sections'].get(name)
+            if digest is None:
+                continue
+            try:
+                return manifest['id'], self._read_object(digest)
+            except (OSError, ValueError) as e:
+                print(f"Error loading config snapshot {manifest['id']}: {e}")
+        return None
+
+    # ── 写入 ─────────────────────────────────────────
+    def submit(self, sections: Dict[str, Any], reason: str) -> None:
+        """排队一个快照（只保存分区值的引用）；队列满时丢弃最早的"""
+        with self._lock:
+            if len(self._pending) >= max(1, int(self.options['pending'])):
+                self._pending.popleft()
+                CONFIG_SNAPSHOTS.inc(outcome='dropped')
+            self._pending.append((time.time(), dict(sections), reason))
+
+    def _store(self, name: str, value: Any) -> str:
+        known = self._known.get(name)
+        if known is not None and known[0] is value:
+            return known[1]
+        data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        digest = content_hash(data)
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        self._known[name] = (value, digest)
+        return digest
+
+    def take(self, sections: Dict[str, Any], reason: str, when: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """写出一个快照，返回清单；与最近一个快照相同时返回 None"""
+        when = time.time() if when is None else when
+        stored = {name: self._store(name, value) for name, value in sections.items() if value is not MISSING}
+        with self._lock:
+            index = self._load_index()
+            if index and index[0]['sections'] == stored:
+                CONFIG_SNAPSHOTS.inc(outcome='unchanged')
+                return None
+            digest = content_hash(json.dumps(stored, sort_keys=True).encode('utf-8'))[:6]
+            millis = int(when * 1000)
+            if index:
+                millis = max(millis, _id_millis(index[0]['id']) + 1)
+            snapshot_id = _snapshot_id(millis, digest)
+            manifest = {"id": snapshot_id, "time": round(when, 3), "reason": reason, "sections": stored}
+            path = os.path.join(self.root, snapshot_id + '.json')
+            tmp = path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            os.replace(tmp, path)
+            index.insert(0, manifest)
+            index.sort(key=lambda m: m['id'], reverse=True)
+        CONFIG_SNAPSHOTS.inc(outcome='taken')
+        return manifest
+
+    def run_pending(self) -> int:
+        """写出排队的快照，返回写出的个数"""
+        taken = 0
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return taken
+                when, sections, reason = self._pending.popleft()
+            try:
+                if self.take(sections, reason, when) is not None:
+                    taken += 1
+            except Exception as e:
+                CONFIG_SNAPSHOTS.inc(outcome='error')
+                print(f"Error writing config snapshot: {e}")
+
+    def step(self, current: Callable[[], Dict[str, Any]]) -> None:
+        """后台任务：到了间隔就排队一个定时快照，写出排队的快照，有新快照时按保留策略清理"""
+        now = time.monotonic()
+        interval = self.options['interval']
+        if interval and now - self._last_periodic >= interval:
+            self._last_periodic = now
+            self.submit(current(), 'periodic')
+        if self.run_pending():
+            self.prune()
+
+    # ── 清理 ─────────────────────────────────────────
+    def _retained(self, index: List[Dict[str, Any]], now: float) -> set:
+        keep, hourly, daily = (int(self.options[k]) for k in ('keep', 'hourly', 'daily'))
+        retained = {m['id'] for m in index[:keep]}
+        hours, days = set(), set()
+        for m in index:                          # 新的在前：每个时间段第一个见到的是最新的
+            age = now - m['time']
+            hour = int(m['time'] // 3600)
+            if age <= hourly * 3600 and hour not in hours:
+                hours.add(hour)
+                retained.add(m['id'])
+            day = time.localtime(m['time'])[:3]
+            if age <= daily * 86400 and day not in days:
+                days.add(day)
+                retained.add(m['id'])
+        return retained
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """按保留策略删除快照和不再被引用的分区文件，返回删除的快照个数"""
+        now = time.time() if now is None else now
+        with self._lock:
+            index = self._load_index()
+            retained = self._retained(index, now)
+            removed = [m for m in index if m['id'] not in retained]
+            if not removed:
+                return 0
+            self._index = [m for m in index if m['id'] in retained]
+            live = {d for m in self._index for d in m['sections'].values()}
+            for m in removed:
+                try:
+                    os.remove(os.path.join(self.root, m['id'] + '.json'))
+                except OSError as e:
+                    print(f"Error removing config snapshot {m['id']}: {e}")
+            self._known = {k: v for k, v in self._known.items() if v[1] in live}
+        for digest in {d for m in removed for d in m['sections'].values()} - live:
+            try:
+                os.remove(self._object_path(digest))
+            except OSError:
+                pass
+        CONFIG_SNAPSHOTS.inc(len(removed), outcome='pruned')
+        return len(removed)
@@ -0,0 +1,704 @@
+"""
+配置存储：按分区缓存配置，每个分区单独存成一个文件，提供分区级事务。
+
+    store = ConfigStore(DEFAULT_CONFIG, listener=on_change)
+    store.open('user_config.json')
+
+    with store.transaction('memos') as txn:        # 只锁 memos 分区
+        batch = MemoBatch(txn.value)
+        batch.upsert(data)
+        txn.value = batch.memos()
+
+    with store.transaction() as txn:               # 整个配置（锁全部分区），txn.value 是合并后的 dict
+        txn.value['autoStart'] = True
+
+分区：memos / dailyGoals / pomodoroConfig / apps / settings（其余所有顶层键）。
+每个分区一把锁，同一分区的读-改-写串行执行，不同分区的写入互不等待。
+提交时先更新缓存，再在 _io_lock 内只把变化的分区写盘（临时文件 + os.replace），
+所以勾选一个目标不会重写整个备忘录列表，并发提交的不同分区也不会互相覆盖。
+列表分区（memos / apps）按元素缓存编码结果，改一条备忘录只重新编码这一条。
+
+磁盘布局（SectionFiles）：
+
+    user_config.json            清单 {"format": "liquid-wallpaper-config", "version": 1,
+                                      "dir": "user_config.d", "sections": {"memos": "memos.json", ...}}
+    user_config.d/memos.json    各分区的值；文件不存在表示配置里没有这个键
+    user_config.json.legacy     迁移前的整份配置（备份）
+
+user_config.json 还是旧的整份配置时照常读取，第一次写入时迁移：先写出全部
+分区文件，再用清单替换 user_config.json。只读不写（例如基准测试导入 server）
+不会改动旧文件；server 正式启动时调用 migrate() 立即迁移。迁移后又被外部
+程序写回整份配置时，按旧格式重新读取并再次迁移。
+
+存储引擎由清单里的 "engine" 决定，open(path, engine) 指定另一种引擎时在第一次写入
+（或 migrate()）时转换；可选的 journal 引擎（快照 + 只追加的变更日志）见 config_journal.py。
+
+txn.value 是分区当前值的顶层浅拷贝（list / dict 复制一层）。分区内的元素
+（单条备忘录、单个 app……）按写时复制处理：修改时换成新对象，不要原地修改，
+缓存中的旧对象可能正被其他线程读取。事务内抛出异常或调用 txn.abort() 时不提交；
+值没有变化时不写盘。
+
+整体替换、导入、恢复快照之前的状态由 config_snapshots.py 在后台保存为快照；
+第一次加载时分区文件无法解析（原文件另存为 .corrupt），用最近的快照恢复该分区，
+不会默默换成默认值再被下一次写入覆盖。
+
+listener(changed) 在提交或重新加载后调用，changed 是 {分区: 新值}（缺失的分区为 MISSING）。
+外部程序修改清单或分区文件时按 (mtime, size) 检测，refresh() 时只重新加载变化的分区。
+"""
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import metrics
+from merge_patch import list_delta
+
+SECTIONS = ('memos', 'dailyGoals', 'pomodoroConfig', 'apps', 'settings')
+SECTION_KEYS = SECTIONS[:-1]   # 以顶层键存放的分区；settings 是其余所有键
+
+MANIFEST_FORMAT = 'liquid-wallpaper-config'
+MANIFEST_VERSION = 1
+
+CONFIG_IO_SECONDS = metrics.histogram('config_io_duration_seconds', 'Config file load / save time by section')
+CONFIG_IO_BYTES = metrics.histogram('config_io_bytes', 'Config file size on load / save by section', metrics.SIZE_BUCKETS)
+
+
+class _Missing:
+    def __repr__(self):
+        return 'MISSING'
+
+
+MISSING = _Missing()   # 配置里没有这个键（与值为 null 区分）
+
+
+class _Invalid:
+    def __repr__(self):
+        return 'INVALID'
+
+
+INVALID = _Invalid()   # 文件存在但无法解析，由 ConfigStore 决定沿用当前值还是默认值
+
+_SECTION_TYPES = {'memos': list, 'apps': list, 'dailyGoals': dict, 'pomodoroConfig': dict, 'settings': dict}
+
+
+def validate_section(name: str, value: Any) -> Optional[str]:
+    """分区值的基本结构检查，返回错误说明，正常时返回 None"""
+    if value is MISSING:
+        return None
+    if value is INVALID:
+        return 'unreadable'
+    expected = _SECTION_TYPES[name]
+    if not isinstance(value, expected):
+        return f'expected {expected.__name__}, got {type(value).__name__}'
+    if expected is list and not all(isinstance(item, dict) for item in value):
+        return 'list items must be objects'
+    return None
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def split_sections(config: Dict[str, Any]) -> Dict[str, Any]:
+    sections = {key: config.get(key, MISSING) for key in SECTION_KEYS}
+    sections['settings'] = {k: v for k, v in config.items() if k not in SECTION_KEYS}
+    return sections
+
+
+def merge_sections(sections: Dict[str, Any]) -> Dict[str, Any]:
+    config = dict(sections.get('settings') or {})
+    for key in SECTION_KEYS:
+        value = sections.get(key, MISSING)
+        if value is not MISSING:
+            config[key] = value
+    return config
+
+
+def _shallow_copy(value):
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+def file_stamp(path: str):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def _encode_item(item: Any) -> bytes:
+    # 字符串里的换行已转义，这里的换行都是缩进，整体右移一层
+    return json.dumps(item, ensure_ascii=False, indent=4).replace('\n', '\n    ').encode('utf-8')
+
+
+def _encode_list(value: list, previous: Optional[Tuple[list, List[bytes]]]) -> Tuple[bytes, List[bytes]]:
+    """
+    与 json.dumps(value, ensure_ascii=False, indent=4) 相同的字节，以及每个元素的编码。
+    previous 是上次写出的 (列表, 各元素编码)：元素按写时复制修改，用 list_delta 按身份
+    找出变化的几条，只重新编码这几条，其余沿用上次的结果。
+    """
+    if previous is None:
+        texts = [_encode_item(item) for item in value]
+    else:
+        before, texts = previous
+        replaced, deleted, appended = list_delta(before, value)
+        texts = list(texts)
+        for i, item in replaced.items():
+            texts[int(i)] = _encode_item(item)
+        for i in reversed(deleted):
+            del texts[i]
+        texts.extend(map(_encode_item, appended))
+    if not texts:
+        return b'[]', texts
+    return b''.join((b'[\n    ', b',\n    '.join(texts), b'\n]')), texts
+
+
+def _dump(path: str, value: Any, fsync: bool = False, data: Optional[bytes] = None, **options) -> str:
+    """写临时文件再 os.replace，读者不会看到写了一半的文件；返回内容哈希。data 为已编码的内容"""
+    options.setdefault('indent', 4)
+    if data is None:
+        data = json.dumps(value, ensure_ascii=False, **options).encode('utf-8')
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return content_hash(data)
+
+
+def _load(path: str, section: str):
+    """(内容哈希, 解析后的值)；文件不存在时为 (None, MISSING)，无法解析时值为 INVALID"""
+    try:
+        with CONFIG_IO_SECONDS.time(op='load', section=section), open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None, MISSING
+    except OSError as e:
+        print(f"Error loading config {section}: {e}")
+        return None, INVALID
+    if metrics.enabled():
+        CONFIG_IO_BYTES.observe(len(data), op='load', section=section)
+    try:
+        return content_hash(data), json.loads(data.decode('utf-8-sig'))
+    except ValueError as e:
+        print(f"Error loading config {section}: {e}")
+        # 保留一份无法解析的原文件：之后写入这个分区时原文件会被覆盖
+        with contextlib.suppress(OSError), open(path + '.corrupt', 'wb') as f:
+            f.write(data)
+        return content_hash(data), INVALID
+
+
+def storage_class(engine: str):
+    """存储引擎名 → 类；journal 引擎在用到时才导入"""
+    if engine == 'journal':
+        from config_journal import JournalStorage
+        return JournalStorage
+    if engine == 'sections':
+        return SectionFiles
+    raise ValueError(f"unknown config storage engine {engine!r}")
+
+
+def manifest_engine(path: str) -> Optional[str]:
+    """path 是清单时返回其中的存储引擎，旧格式或不存在时返回 None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read(1) != '{':
+                return None
+            f.seek(0)
+            head = f.read(4096)
+        if MANIFEST_FORMAT not in head:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            doc = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if isinstance(doc, dict) and doc.get('format') == MANIFEST_FORMAT:
+        return doc.get('engine', 'sections')
+    return None
+
+
+class Storage:
+    """
+    存储引擎的公共部分：path 处的清单、旧格式的读取和迁移。
+    子类实现 _read_own / _poll_own / _migrate_data / _write_changes。
+    migrated 为 False 时 path 是旧的整份配置、其他引擎的清单或不存在，
+    第一次写入时把全部分区交给 _migrate_data，再写清单完成迁移。
+    """
+    ENGINE = ''
+
+    def __init__(self, path: str, default: Dict[str, Any]):
+        self.path = path
+        self.dir = os.path.splitext(path)[0] + '.d'
+        self.migrated = False
+        self._default = default
+        self._stamps: Dict[str, Any] = {}
+        self._hashes: Dict[str, Optional[str]] = {}   # 上次读写时的内容哈希，用来忽略自己的写入
+        self._legacy = False              # path 是旧的整份配置（迁移时备份）
+
+    def _default_sections(self) -> Dict[str, Any]:
+        return split_sections(json.loads(json.dumps(self._default)))
+
+    def _unchanged(self, key: str, path: str, stamp) -> bool:
+        """stamp 变了但内容哈希与上次读写时相同（自己的写入、同步工具原样覆盖）：只更新 stamp"""
+        if stamp is None or self._hashes.get(key) is None:
+            return False
+        try:
+            with open(path, 'rb') as f:
+                same = content_hash(f.read()) == self._hashes[key]
+        except OSError:
+            return False
+        if same:
+            self._stamps[key] = stamp
+        return same
+
+    def read(self) -> Dict[str, Any]:
+        """读取全部分区；无法解析的分区值为 INVALID"""
+        self._stamps = {'manifest': file_stamp(self.path)}
+        self._hashes = {}
+        self._legacy = False
+        self.migrated = False
+        if self._stamps['manifest'] is None:
+            return self._default_sections()
+        self._hashes['manifest'], doc = _load(self.path, 'manifest')
+        if doc is MISSING or doc is INVALID:
+            self._legacy = doc is INVALID
+            return {name: doc for name in SECTIONS} if doc is INVALID else self._default_sections()
+
+        if isinstance(doc, dict) and doc.get('format') == MANIFEST_FORMAT:
+            engine = doc.get('engine', 'sections')
+            self.dir = os.path.join(os.path.dirname(self.path), doc.get('dir') or os.path.basename(self.dir))
+            if engine == self.ENGINE:
+                self.migrated = True
+                return self._read_own(doc)
+            # 其他引擎写的清单：用那个引擎读取，第一次写入时转换过来
+            return storage_class(engine)(self.path, self._default).read()
+
+        # 旧格式：整份配置
+        self._legacy = True
+        if not isinstance(doc, dict):
+            print("Error loading config: top level is not an object")
+            return {name: INVALID for name in SECTIONS}
+        return split_sections(doc)
+
+    def poll(self) -> Dict[str, Any]:
+        """返回上次读写之后被外部修改的分区；清单本身变化时重新读取全部分区"""
+        stamp = file_stamp(self.path)
+        if stamp != self._stamps.get('manifest') and not self._unchanged('manifest', self.path, stamp):
+            return self.read()
+        if not self.migrated:
+            return {}
+        return self._poll_own()
+
+    def watched_files(self) -> List[str]:
+        """文件监视需要关注的文件（清单和引擎自己的数据文件）"""
+        return [self.path] + (self._own_files() if self.migrated else [])
+
+    def _migrate(self, sections: Dict[str, Any]) -> bool:
+        """写出全部分区，再用清单替换 path（清单是提交点，中途失败时下次仍按原格式读取）"""
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            extra = self._migrate_data(sections)
+        except Exception as e:
+            print(f"Error saving config: {e}")
+            return False
+        if extra is None:
+            return False
+        manifest = {
+            "format": MANIFEST_FORMAT,
+            "version": MANIFEST_VERSION,
+            "engine": self.ENGINE,
+            "dir": os.path.basename(self.dir),
+            **extra,
+        }
+        try:
+            if self._legacy:
+                shutil.copy2(self.path, self.path + '.legacy')
+            self._hashes['manifest'] = _dump(self.path, manifest)
+        except Exception as e:
+            print(f"Error saving config: {e}")
+            return False
+        self._stamps['manifest'] = file_stamp(self.path)
+        self._legacy = False
+        self.migrated = True
+        print(f"[CONFIG] migrated {self.path} to {self.ENGINE} storage in {self.dir}")
+        return True
+
+    def write(self, sections: Dict[str, Any], names: Iterable[str],
+              before: Optional[Dict[str, Any]] = None) -> Set[str]:
+        """
+        把 names 中的分区写盘，返回写入失败的分区；还是旧格式时先迁移。
+        before 是这些分区提交前的值（引擎可以据此只写增量），未知时为 None。
+        """
+        if not self.migrated:
+            return set() if self._migrate(sections) else set(SECTIONS)
+        return self._write_changes(sections, names, before)
+
+    def sync(self) -> None:
+        """把已写入的数据刷到磁盘（退出前调用）"""
+
+    def maintain(self, current: Callable[[], Dict[str, Any]], lock) -> bool:
+        """
+        后台维护，返回是否做了维护。current() 返回缓存中的分区，
+        只能在持有 lock（ConfigStore 的 _io_lock）时调用；耗时的部分应在锁外执行。
+        """
+        return False
+
+    def close(self) -> None:
+        """释放打开的文件"""
+
+    # ── 子类实现 ───────────────────────────────────────
+    def _read_own(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def _poll_own(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def _own_files(self) -> List[str]:
+        raise NotImplementedError
+
+    def _migrate_data(self, sections: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """写出全部分区的数据，返回要合并进清单的键；失败时返回 None"""
+        raise NotImplementedError
+
+    def _write_changes(self, sections: Dict[str, Any], names: Iterable[str],
+                       before: Optional[Dict[str, Any]]) -> Set[str]:
+        raise NotImplementedError
+
+
+class SectionFiles(Storage):
+    """清单 + 每个分区一个文件（格式见模块说明）"""
+    ENGINE = 'sections'
+
+    def __init__(self, path: str, default: Dict[str, Any]):
+        super().__init__(path, default)
+        self._files = {name: name + '.json' for name in SECTIONS}
+        self._encoded: Dict[str, Tuple[list, List[bytes]]] = {}   # 列表分区 -> 上次写出的 (列表, 各元素编码)
+
+    def _section_path(self, name: str) -> str:
+        return os.path.join(self.dir, self._files[name])
+
+    def _read_section(self, name: str) -> Any:
+        path = self._section_path(name)
+        self._stamps[name] = file_stamp(path)
+        self._hashes[name], value = _load(path, name)
+        return value
+
+    def _read_own(self, doc):
+        self._files.update({k: v for k, v in (doc.get('sections') or {}).items() if k in self._files})
+        return {name: self._read_section(name) for name in SECTIONS}
+
+    def _poll_own(self):
+        changed = {}
+        for name in SECTIONS:
+            path = self._section_path(name)
+            stamp = file_stamp(path)
+            if stamp != self._stamps.get(name) and not self._unchanged(name, path, stamp):
+                changed[name] = self._read_section(name)
+        return changed
+
+    def _own_files(self):
+        return [self._section_path(name) for name in SECTIONS]
+
+    def _write_section(self, name: str, value: Any) -> bool:
+        path = self._section_path(name)
+        try:
+            if value is MISSING:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+                self._hashes[name] = None
+                self._encoded.pop(name, None)
+            elif isinstance(value, list):
+                with CONFIG_IO_SECONDS.time(op='save', section=name):
+                    data, texts = _encode_list(value, self._encoded.pop(name, None))
+                    self._hashes[name] = _dump(path, value, data=data)
+                self._encoded[name] = (value, texts)
+            else:
+                with CONFIG_IO_SECONDS.time(op='save', section=name):
+                    self._hashes[name] = _dump(path, value)
+        except Exception as e:
+            print(f"Error saving config section {name}: {e}")
+            return False
+        self._stamps[name] = file_stamp(path)
+        if metrics.enabled() and self._stamps[name] is not None:
+            CONFIG_IO_BYTES.observe(self._stamps[name][1], op='save', section=name)
+        return True
+
+    def _migrate_data(self, sections):
+        if not all([self._write_section(name, sections[name]) for name in SECTIONS]):
+            return None
+        return {"sections": dict(self._files)}
+
+    def _write_changes(self, sections, names, before):
+        return {name for name in names if not self._write_section(name, sections[name])}
+
+
+class Transaction:
+    def __init__(self, value):
+        self.value = value
+        self.aborted = False
+
+    def abort(self) -> None:
+        self.aborted = True
+
+
+class ConfigStore:
+    def __init__(self, default: Dict[str, Any],
+                 listener: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self._default = default
+        self._listener = listener
+        self._locks = {name: threading.RLock() for name in SECTIONS}
+        self._io_lock = threading.RLock()
+        self._sections: Dict[str, Any] = split_sections(json.loads(json.dumps(default)))
+        self._storage: Optional[Storage] = None
+        self.snapshots = None             # SnapshotStore（config_snapshots.py），open() 时创建
+        from config_history import History
+        self.history = History()          # 撤销 / 重做（config_history.py），带 undo 标签的事务记录
+        self._loaded = False
+        self._dirty: Set[str] = set()   # 上次写盘失败的分区，缓存比文件新
+        # 由文件监视（config_watcher）负责发现外部修改时为 True：
+        # 请求路径上不再 stat 文件，改由监视线程调用 reload()
+        self.watching = False
+
+    # ── 文件 ─────────────────────────────────────────
+    @property
+    def path(self) -> Optional[str]:
+        return self._storage.path if self._storage is not None else None
+
+    @property
+    def dir(self) -> Optional[str]:
+        """分区文件所在目录，快照等附属文件也放在这里"""
+        return self._storage.dir if self._storage is not None else None
+
+    @property
+    def engine(self) -> Optional[str]:
+        return self._storage.ENGINE if self._storage is not None else None
+
+    def open(self, path: str, engine: Optional[str] = None) -> None:
+        """
+        切换到 path 并重新加载。engine 为 None 时沿用清单里的存储引擎
+        （旧格式默认 sections）；与清单不同时在第一次写入（或 migrate()）时转换。
+        """
+        from config_snapshots import SnapshotStore
+        cls = storage_class(engine or manifest_engine(path) or 'sections')
+        with self._io_lock:
+            if self._storage is not None:
+                self._storage.close()
+            self._storage = cls(path, self._default)
+            options = self.snapshots.options if self.snapshots is not None else None
+            self.snapshots = SnapshotStore(os.path.join(self._storage.dir, 'snapshots'), options)
+            self._loaded = False
+        self.refresh()
+
+    def watched_files(self) -> List[str]:
+        with self._io_lock:
+            return self._storage.watched_files() if self._storage is not None else []
+
+    def refresh(self) -> bool:
+        """文件被外部修改（或从未加载）时重新加载变化的分区，返回是否重新加载了"""
+        if self._loaded and self.watching:
+            return False
+        return bool(self._refresh())
+
+    def reload(self) -> Set[str]:
+        """
+        文件监视发现变化后调用：锁住全部分区（等进行中的事务提交完），
+        读取变化的分区、校验，再一次性替换缓存。返回实际变化的分区。
+        """
+        with contextlib.ExitStack() as stack:
+            for name in SECTIONS:
+                stack.enter_context(self._locks[name])
+            return set(self._refresh())
+
+    def _refresh(self) -> Dict[str, Any]:
+        with self._io_lock:
+            if self._storage is None:
+                return {}
+            first = not self._loaded
+            if first:
+                raw = self._storage.read()
+                self._loaded = True
+            else:
+                raw = self._storage.poll()
+            changed = self._resolve(raw, first)
+            if not changed:
+                return {}
+            self._sections = {**self._sections, **changed}
+        self._notify(changed)
+        return changed
+
+    def _resolve(self, raw: Dict[str, Any], first: bool) -> Dict[str, Any]:
+        """
+        校验读到的分区。不合法的分区：已加载过时保留当前值（例如手改到一半的文件），
+        第一次加载时用默认值；与缓存相同的值丢掉（第一次加载时全部保留）。
+        """
+        changed = {}
+        for name, value in raw.items():
+            error = validate_section(name, value)
+            if error is not None:
+                print(f"[CONFIG] ignoring invalid section {name}: {error}")
+                if not first:
+                    continue
+                value = self._recover(name)
+            else:
+                self._dirty.discard(name)
+            current = self._sections[name]
+            if first or (current is not value and current != value):
+                changed[name] = value
+        return changed
+
+    def _default_section(self, name: str) -> Any:
+        return split_sections(json.loads(json.dumps(self._default)))[name]
+
+    def _recover(self, name: str) -> Any:
+        """第一次加载时分区文件损坏：用最近的快照恢复，没有快照时才用默认值"""
+        found = self.snapshots.latest(name) if self.snapshots is not None else None
+        if found is None:
+            print(f"[CONFIG] no snapshot of {name}, using defaults")
+            return self._default_section(name)
+        snapshot_id, value = found
+        if validate_section(name, value) is not None:
+            return self._default_section(name)
+        print(f"[CONFIG] recovered {name} from snapshot {snapshot_id}")
+        self._dirty.add(name)             # 下一次写入时把恢复的值写回文件
+        return value
+
+    def _write(self, names: Iterable[str], before: Optional[Dict[str, Any]] = None) -> bool:
+        with self._io_lock:
+            if self._storage is None:
+                return False
+            self._dirty = self._storage.write(self._sections, self._dirty | set(names), before)
+            return not self._dirty
+
+    def _notify(self, changed: Dict[str, Any]) -> None:
+        if self._listener is not None and changed:
+            self._listener(changed)
+
+    # ── 读取 ─────────────────────────────────────────
+    def sections(self) -> Dict[str, Any]:
+        """全部分区的当前值（新的 dict，各分区的值是共享对象，只读）"""
+        self.refresh()
+        return dict(self._sections)
+
+    def section(self, name: str, default: Any = None) -> Any:
+        """分区当前值（共享对象，只读）"""
+        self.refresh()
+        value = self._sections[name]
+        return default if value is MISSING else value
+
+    def load(self) -> Dict[str, Any]:
+        """合并后的配置；顶层 dict 是新的，各分区的值是共享对象（只读）"""
+        self.refresh()
+        return merge_sections(self._sections)
+
+    # ── 写入 ─────────────────────────────────────────
+    @contextlib.contextmanager
+    def transaction(self, section: Optional[str] = None, snapshot: Optional[str] = None,
+                    undo: Optional[str] = None) -> Iterator[Transaction]:
+        """
+        section 为 None 时锁住全部分区，txn.value 是合并后的配置。
+        snapshot 不为空时，提交了修改的事务把修改前的状态排队保存为快照（原因为 snapshot）；
+        undo 不为空时，每个变化的分区在撤销历史中记录一条（标签为 undo）。
+        """
+        names = SECTIONS if section is None else (section,)
+        if section is not None and section not in self._locks:
+            raise KeyError(section)
+        # 先检查外部修改再加锁：refresh 不在分区锁内执行，避免与整体事务互相等待
+        self.refresh()
+        with contextlib.ExitStack() as stack:
+            for name in names:               # 固定顺序加锁，整体事务与分区事务不会死锁
+                stack.enter_context(self._locks[name])
+            if section is None:
+                before = dict(self._sections)
+                txn = Transaction({k: _shallow_copy(v) for k, v in merge_sections(before).items()})
+            else:
+                before = {section: self._sections[section]}
+                value = before[section]
+                txn = Transaction(None if value is MISSING else _shallow_copy(value))
+            yield txn
+            if txn.aborted:
+                return
+            if section is None:
+                after = split_sections(txn.value)
+            else:
+                after = {section: MISSING if txn.value is None and before[section] is MISSING else txn.value}
+            changed = {k: v for k, v in after.items() if before[k] is not v and before[k] != v}
+            if not changed:
+                return
+            if snapshot and self.snapshots is not None:
+                self.snapshots.submit({**self._sections, **before}, snapshot)
+            if undo:
+                for name, value in changed.items():
+                    self.history.record(name, undo, before[name], value)
+            with self._io_lock:
+                self._sections = {**self._sections, **changed}
+                self._write(changed, before)
+            self._notify(changed)
+
+    def replace(self, config: Dict[str, Any]) -> None:
+        """整体替换（POST /config）"""
+        with self.transaction() as txn:
+            txn.value = config
+
+    def undo(self, section: Optional[str] = None):
+        """撤销 section（None 时为全部分区中最近）的最近一次修改，返回撤销的记录，没有时返回 None"""
+        return self._step_history(self.history.pop_undo(section), redo=True)
+
+    def redo(self, section: Optional[str] = None):
+        return self._step_history(self.history.pop_redo(section), redo=False)
+
+    def _step_history(self, entry, redo: bool):
+        if entry is None:
+            return None
+        from config_history import apply_patch
+        patch = entry.inverse_patch() if redo else entry.forward_patch()
+        try:
+            with self.transaction(entry.section) as txn:
+                value = apply_patch(MISSING if txn.value is None else txn.value, patch)
+                txn.value = None if value is MISSING else value
+        except BaseException:
+            # 校验或写盘失败：记录放回原来的栈，可以再次撤销 / 重做
+            self.history.restore(entry, undo=redo)
+            raise
+        self.history.push(entry, redo)
+        return entry
+
+    def migrate(self) -> bool:
+        """还是旧格式（或其他引擎）时立即迁移（否则在第一次写入时迁移），返回是否已迁移"""
+        with contextlib.ExitStack() as stack:
+            for name in SECTIONS:
+                stack.enter_context(self._locks[name])
+            self.refresh()
+            with self._io_lock:
+                if self._storage is None:
+                    return False
+                if not self._storage.migrated:
+                    self._write(SECTIONS)
+                return self._storage.migrated
+
+    def flush(self) -> bool:
+        """等待进行中的事务提交完成；上次写盘失败的分区重试，返回文件是否与缓存一致"""
+        with contextlib.ExitStack() as stack:
+            for name in SECTIONS:
+                stack.enter_context(self._locks[name])
+            with self._io_lock:
+                ok = self._write(()) if self._dirty else True
+                if self._storage is not None:
+                    self._storage.sync()
+                return ok
+
+    def maintain(self) -> bool:
+        """后台维护（例如 journal 引擎的日志压缩），由调度器定期调用；返回是否做了维护"""
+        with self._io_lock:
+            storage = self._storage
+        if storage is None:
+            return False
+        return storage.maintain(lambda: self._sections, self._io_lock)
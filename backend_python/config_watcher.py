@@ -0,0 +1,340 @@
+"""
+配置文件监视：文件被外部修改（手改、同步工具、另一个进程）时自动重新加载。
+
+    watcher = ConfigWatcher(config_store, backend='auto')
+    scheduler.every('config-watch', 0.05, watcher.step, jitter=0.0,
+                    setup=watcher.setup, teardown=watcher.teardown)
+
+后端按平台选择：Linux 用 inotify，Windows 用 ReadDirectoryChangesW，
+其他平台（或初始化失败时）退回按 mtime 轮询。监视的是配置文件所在的目录
+（os.replace 会换掉文件本身），只关心 store.watched_files() 里的文件名。
+目录还不存在或被删掉时后端置 needs_rewatch，每轮重新 watch() 直到目录出现。
+
+一次编辑往往触发多个事件（写临时文件、替换、编辑器的备份），收到事件后
+等到 debounce 秒内没有新事件（最多 max_delay 秒）再调用 store.reload()。
+自己写入的文件内容哈希与上次写入时相同，reload() 不会把它当成变化；
+不合法的文件不会替换当前值。重新加载在监视线程上完成，请求路径不再检查文件。
+"""
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+import metrics
+
+CONFIG_RELOADS = metrics.counter('config_watch_reloads_total', 'Config file change events by outcome')
+
+BACKENDS = ('auto', 'inotify', 'windows', 'poll')
+
+
+def _dirs(paths: Iterable[str]) -> Dict[str, Set[str]]:
+    """目录 -> 该目录下需要关注的文件名"""
+    dirs: Dict[str, Set[str]] = {}
+    for path in paths:
+        path = os.path.abspath(path)
+        dirs.setdefault(os.path.dirname(path), set()).add(os.path.basename(path))
+    return dirs
+
+
+class PollingBackend:
+    """按 (mtime, size) 轮询，任何平台都可用"""
+    name = 'poll'
+    needs_rewatch = False       # 直接 stat 文件，不依赖目录句柄
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self._stamps: Dict[str, Optional[tuple]] = {}
+        self._closed = threading.Event()
+
+    @staticmethod
+    def _stamp(path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def watch(self, paths: List[str]) -> None:
+        old = self._stamps
+        self._stamps = {p: old[p] if p in old else self._stamp(p) for p in map(os.path.abspath, paths)}
+
+    def wait(self, timeout: float) -> Set[str]:
+        self._closed.wait(min(timeout, self.interval))
+        changed = set()
+        for path, stamp in self._stamps.items():
+            current = self._stamp(path)
+            if current != stamp:
+                self._stamps[path] = current
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        self._closed.set()
+
+
+class InotifyBackend:
+    """Linux inotify（通过 ctypes 调用 libc）"""
+    name = 'inotify'
+
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_IGNORED = 0x8000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    _EVENT = struct.Struct('iIII')         # wd, mask, cookie, len（后跟 len 字节的文件名）
+
+    def __init__(self):
+        import ctypes
+        self._ctypes = ctypes
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._wds: Dict[int, str] = {}          # watch descriptor -> 目录
+        self._names: Dict[str, Set[str]] = {}   # 目录 -> 关注的文件名
+        self.needs_rewatch = False              # 有目录没监视上（不存在或被删），下次 watch 再补
+
+    def watch(self, paths: List[str]) -> None:
+        self._names = _dirs(paths)
+        for wd, d in list(self._wds.items()):
+            if d not in self._names:
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._wds[wd]
+        watched = set(self._wds.values())
+        for d in self._names:
+            if d in watched or not os.path.isdir(d):   # 目录还不存在（尚未迁移）时下次 watch 再加
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(d), self.MASK)
+            if wd < 0:
+                raise OSError(self._ctypes.get_errno(), f'inotify_add_watch failed: {d}')
+            self._wds[wd] = d
+        self.needs_rewatch = len(self._wds) < len(self._names)
+
+    def wait(self, timeout: float) -> Set[str]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset + self._EVENT.size <= len(data):
+            wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            d = self._wds.get(wd)
+            if d is None:
+                continue
+            if mask & (self.IN_IGNORED | self.IN_DELETE_SELF):   # 目录被删：下次 watch 重新添加
+                del self._wds[wd]
+                self.needs_rewatch = True
+                changed.update(os.path.join(d, n) for n in self._names.get(d, ()))
+            elif name in self._names.get(d, ()):
+                changed.add(os.path.join(d, name))
+        return changed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+            self._wds.clear()
+
+
+class WindowsBackend:
+    """Windows ReadDirectoryChangesW（重叠 I/O，每个目录一个事件对象）"""
+    name = 'windows'
+
+    FILE_LIST_DIRECTORY = 0x0001
+    FILE_SHARE_ALL = 0x00000007
+    OPEN_EXISTING = 3
+    FILE_FLAG_BACKUP_SEMANTICS = 0x02000000
+    FILE_FLAG_OVERLAPPED = 0x40000000
+    NOTIFY_FILTER = 0x00000001 | 0x00000008 | 0x00000010   # FILE_NAME | SIZE | LAST_WRITE
+    WAIT_TIMEOUT = 0x102
+    BUFFER_SIZE = 16 * 1024
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        self._ctypes = ctypes
+
+        class OVERLAPPED(ctypes.Structure):
+            _fields_ = [('Internal', ctypes.c_void_p), ('InternalHigh', ctypes.c_void_p),
+                        ('Offset', wintypes.DWORD), ('OffsetHigh', wintypes.DWORD),
+                        ('hEvent', wintypes.HANDLE)]
+
+        self._OVERLAPPED = OVERLAPPED
+        k = self._kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        k.CreateFileW.restype = wintypes.HANDLE
+        k.CreateFileW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, ctypes.c_void_p,
+                                  wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE]
+        k.CreateEventW.restype = wintypes.HANDLE
+        k.CreateEventW.argtypes = [ctypes.c_void_p, wintypes.BOOL, wintypes.BOOL, wintypes.LPCWSTR]
+        k.ReadDirectoryChangesW.argtypes = [wintypes.HANDLE, ctypes.c_void_p, wintypes.DWORD, wintypes.BOOL,
+                                            wintypes.DWORD, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p]
+        k.GetOverlappedResult.argtypes = [wintypes.HANDLE, ctypes.c_void_p, ctypes.POINTER(wintypes.DWORD),
+                                          wintypes.BOOL]
+        k.WaitForMultipleObjects.argtypes = [wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE),
+                                             wintypes.BOOL, wintypes.DWORD]
+        k.WaitForMultipleObjects.restype = wintypes.DWORD
+        k.CancelIoEx.argtypes = [wintypes.HANDLE, ctypes.c_void_p]
+        k.CloseHandle.argtypes = [wintypes.HANDLE]
+        k.ResetEvent.argtypes = [wintypes.HANDLE]
+        self._invalid = wintypes.HANDLE(-1).value
+        self._watches: Dict[str, dict] = {}     # 目录 -> {handle, event, overlapped, buffer}
+        self._names: Dict[str, Set[str]] = {}
+        self.needs_rewatch = False
+
+    def _issue(self, w: dict) -> None:
+        ok = self._kernel32.ReadDirectoryChangesW(
+            w['handle'], w['buffer'], self.BUFFER_SIZE, False, self.NOTIFY_FILTER,
+            None, self._ctypes.byref(w['overlapped']), None)
+        if not ok:
+            raise self._ctypes.WinError(self._ctypes.get_last_error())
+
+    def _open(self, d: str) -> dict:
+        k = self._kernel32
+        handle = k.CreateFileW(d, self.FILE_LIST_DIRECTORY, self.FILE_SHARE_ALL, None, self.OPEN_EXISTING,
+                               self.FILE_FLAG_BACKUP_SEMANTICS | self.FILE_FLAG_OVERLAPPED, None)
+        if handle == self._invalid:
+            raise self._ctypes.WinError(self._ctypes.get_last_error())
+        event = k.CreateEventW(None, True, False, None)
+        overlapped = self._OVERLAPPED()
+        overlapped.hEvent = event
+        w = {'handle': handle, 'event': event, 'overlapped': overlapped,
+             'buffer': self._ctypes.create_string_buffer(self.BUFFER_SIZE)}
+        try:
+            self._issue(w)
+        except OSError:
+            self._release(w)
+            raise
+        return w
+
+    def _release(self, w: dict) -> None:
+        self._kernel32.CancelIoEx(w['handle'], None)
+        self._kernel32.CloseHandle(w['handle'])
+        self._kernel32.CloseHandle(w['event'])
+
+    def watch(self, paths: List[str]) -> None:
+        self._names = _dirs(paths)
+        for d in [d for d in self._watches if d not in self._names]:
+            self._release(self._watches.pop(d))
+        for d in self._names:
+            if d not in self._watches and os.path.isdir(d):
+                self._watches[d] = self._open(d)
+        self.needs_rewatch = len(self._watches) < len(self._names)
+
+    def _parse(self, d: str, data: bytes) -> Set[str]:
+        """FILE_NOTIFY_INFORMATION 链表：NextEntryOffset, Action, FileNameLength, FileName[]"""
+        changed = set()
+        offset = 0
+        while True:
+            next_offset, _, length = struct.unpack_from('III', data, offset)
+            name = data[offset + 12:offset + 12 + length].decode('utf-16-le')
+            if name in self._names.get(d, ()):
+                changed.add(os.path.join(d, name))
+            if not next_offset:
+                return changed
+            offset += next_offset
+
+    def wait(self, timeout: float) -> Set[str]:
+        from ctypes import wintypes
+        if not self._watches:
+            time.sleep(timeout)
+            return set()
+        dirs = list(self._watches)
+        events = (wintypes.HANDLE * len(dirs))(*(self._watches[d]['event'] for d in dirs))
+        result = self._kernel32.WaitForMultipleObjects(len(dirs), events, False, int(timeout * 1000))
+        if result == self.WAIT_TIMEOUT or result >= len(dirs):
+            return set()
+        d = dirs[result]
+        w = self._watches[d]
+        transferred = wintypes.DWORD()
+        ok = self._kernel32.GetOverlappedResult(w['handle'], self._ctypes.byref(w['overlapped']),
+                                                self._ctypes.byref(transferred), False)
+        self._kernel32.ResetEvent(w['event'])
+        if not ok or transferred.value == 0:
+            # 缓冲区溢出（或目录被删）：无法知道具体文件，按全部变化处理
+            changed = {os.path.join(d, n) for n in self._names.get(d, ())}
+        else:
+            changed = self._parse(d, w['buffer'].raw[:transferred.value])
+        try:
+            self._issue(w)
+        except OSError:
+            self._release(self._watches.pop(d))   # 下次 watch 重新打开
+            self.needs_rewatch = True
+        return changed
+
+    def close(self) -> None:
+        for w in self._watches.values():
+            self._release(w)
+        self._watches.clear()
+
+
+def create_backend(kind: str = 'auto'):
+    """按平台创建监视后端；原生后端不可用时退回轮询"""
+    if kind not in BACKENDS:
+        raise ValueError(f'unknown watch backend: {kind}')
+    if kind == 'auto':
+        kind = 'windows' if sys.platform == 'win32' else 'inotify' if sys.platform.startswith('linux') else 'poll'
+    if kind != 'poll':
+        try:
+            return WindowsBackend() if kind == 'windows' else InotifyBackend()
+        except (OSError, AttributeError) as e:
+            print(f"[CONFIG] {kind} file watching unavailable ({e}), polling instead")
+    return PollingBackend()
+
+
+class ConfigWatcher:
+    def __init__(self, store, backend: str = 'auto', debounce: float = 0.25, max_delay: float = 2.0):
+        self.store = store
+        self.kind = backend
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.backend = None
+        self._files: List[str] = []
+
+    def _rewatch(self) -> None:
+        files = self.store.watched_files()
+        if files != self._files or self.backend.needs_rewatch:
+            self.backend.watch(files)
+            self._files = files
+
+    def setup(self) -> None:
+        self.backend = create_backend(self.kind)
+        self._rewatch()
+        self.store.watching = True
+        self.store.reload()       # 加载之后、开始监视之前的修改
+
+    def step(self) -> None:
+        """等待最多 0.5 秒的文件事件；有事件时去抖后重新加载"""
+        changed = self.backend.wait(0.5)
+        if changed:
+            deadline = time.monotonic() + self.max_delay
+            while time.monotonic() < deadline:
+                more = self.backend.wait(self.debounce)
+                if not more:
+                    break
+                changed |= more
+            sections = self.store.reload()
+            CONFIG_RELOADS.inc(outcome='reloaded' if sections else 'ignored')
+            if sections:
+                print(f"[CONFIG] reloaded {', '.join(sorted(sections))} after external change")
+        self._rewatch()           # 迁移或切换引擎后文件列表会变；目录被删后重建时要重新监视
+
+    def teardown(self) -> None:
+        self.store.watching = False
+        if self.backend is not None:
+            self.backend.close()
@@ -0,0 +1,149 @@
+"""
+截止时间的规范化：保存时把 dueDate 换算成 UTC epoch，之后调度、排序、范围查询只比较整数。
+
+    memo = {"dueDate": "2026-01-20T16:45", "dueZone": "Europe/Berlin"}
+    normalize_due(memo)       # memo["dueAt"] == 1768923900（int 秒）
+    due_epoch(memo)           # 1768923900；没有截止时间时为 None
+
+字段：
+    dueDate   编辑和显示用的墙上时间（datetime-local 格式，也可以带偏移 "+08:00" / "Z"）
+    dueZone   dueDate 所在的时区：IANA 名称（编辑器从系统读取，或服务端从 TZ / /etc/localtime
+              识别），或 dueDate 自带的偏移；不知道时不写，表示本机时区
+    dueAt     dueDate 对应的 UTC epoch 秒（int），只在保存时（MemoBatch、导入、整体替换配置）
+              和启动时的一次性迁移中计算
+
+时区名称解析不了（例如 Windows 上没有安装 tzdata）时按本机时区换算，
+与 dueDate 本来的含义（用户在本机输入的时间）一致。重复提醒在 dueZone 的墙上时间上
+推进（每天 9:00 跨过夏令时仍是 9:00），再换算成新的 dueAt。
+"""
+import os
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:         # Python < 3.9
+    ZoneInfo = None
+    ZoneInfoNotFoundError = KeyError
+
+
+def _offset_name(offset: timedelta) -> str:
+    minutes = int(offset.total_seconds() // 60)
+    sign = '-' if minutes < 0 else '+'
+    return f"{sign}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+
+
+@lru_cache(maxsize=64)
+def resolve_zone(zone: Optional[str]) -> Optional[tzinfo]:
+    """时区名称（IANA 或 "+08:00" / "Z"）对应的 tzinfo；解析不了时为 None（按本机时区）"""
+    if not zone or not isinstance(zone, str):
+        return None
+    if zone in ('Z', 'UTC'):
+        return timezone.utc
+    if zone[0] in '+-' and len(zone) == 6 and zone[3] == ':':
+        try:
+            hours, minutes = int(zone[1:3]), int(zone[4:6])
+        except ValueError:
+            return None
+        offset = timedelta(hours=hours, minutes=minutes)
+        return timezone(-offset if zone[0] == '-' else offset)
+    if ZoneInfo is None:
+        return None
+    try:
+        return ZoneInfo(zone)
+    except (ZoneInfoNotFoundError, ValueError, OSError):
+        return None
+
+
+@lru_cache(maxsize=1)
+def local_zone() -> Optional[str]:
+    """本机时区的 IANA 名称（TZ 环境变量或 /etc/localtime 链接）；识别不了时为 None"""
+    candidates = [os.environ.get('TZ', '').lstrip(':')]
+    try:
+        candidates.append(os.path.realpath('/etc/localtime').split('zoneinfo/', 1)[1])
+    except (IndexError, OSError):
+        pass
+    for name in candidates:
+        if name and '/' in name and resolve_zone(name) is not None:
+            return name
+    return None
+
+
+def to_epoch(due_date: str, zone: Optional[str] = None) -> Tuple[int, Optional[str]]:
+    """
+    dueDate 在 zone 中的 UTC epoch 秒，以及应该记录的时区：(dueAt, dueZone)。
+    dueDate 自带偏移时以偏移为准；格式不对时抛出 ValueError。
+    """
+    dt = datetime.fromisoformat(due_date)
+    if dt.tzinfo is not None:
+        if resolve_zone(zone) is None:
+            zone = _offset_name(dt.utcoffset())
+        return int(dt.timestamp()), zone
+    zone = zone or local_zone()
+    tz = resolve_zone(zone)
+    if tz is not None:
+        dt = dt.replace(tzinfo=tz)
+    return int(dt.timestamp()), zone        # 没有 tzinfo 时 timestamp() 按本机时区换算
+
+
+def normalize_due(memo: Dict[str, Any]) -> Dict[str, Any]:
+    """按 dueDate / dueZone 重新计算 dueAt（原地修改）；没有或无法解析截止时间时去掉 dueAt"""
+    due_date = memo.get('dueDate')
+    if not due_date or not isinstance(due_date, str):
+        memo.pop('dueAt', None)
+        memo.pop('dueZone', None)
+        return memo
+    try:
+        due_at, zone = to_epoch(due_date, memo.get('dueZone'))
+    except ValueError:
+        memo.pop('dueAt', None)
+        return memo
+    memo['dueAt'] = due_at
+    if zone:
+        memo['dueZone'] = zone
+    else:
+        memo.pop('dueZone', None)
+    return memo
+
+
+def normalize_memos(memos: Any) -> Any:
+    """
+    整体替换的备忘录列表（POST /config、迁移）：dueAt 缺失或与 dueDate 不一致的条目
+    换成补全后的新 dict（写时复制），返回新列表；不是列表时原样返回。
+    """
+    if not isinstance(memos, list):
+        return memos
+    result: List[Any] = []
+    for m in memos:
+        if isinstance(m, dict) and (m.get('dueDate') or 'dueAt' in m):
+            fixed = normalize_due(dict(m))
+            if fixed.get('dueAt') != m.get('dueAt') or fixed.get('dueZone') != m.get('dueZone'):
+                m = fixed
+        result.append(m)
+    return result
+
+
+def due_epoch(memo: Dict[str, Any]) -> Optional[int]:
+    """备忘录截止时间的 epoch 秒；没有 dueAt 的旧数据现场换算（迁移之后不会走到）"""
+    due_at = memo.get('dueAt')
+    if isinstance(due_at, int) and not isinstance(due_at, bool):
+        return due_at
+    due_date = memo.get('dueDate')
+    if not due_date or not isinstance(due_date, str):
+        return None
+    try:
+        return to_epoch(due_date, memo.get('dueZone'))[0]
+    except ValueError:
+        return None
+
+
+def parse_bound(value: str) -> int:
+    """查询参数里的时间（epoch 秒或本机时区的 ISO 时间）换算成 epoch 秒，格式不对时抛出 ValueError"""
+    value = value.strip()
+    if value.lstrip('-').isdigit():
+        return int(value)
+    try:
+        return to_epoch(value)[0]
+    except ValueError:
+        raise ValueError(f'expected epoch seconds or an ISO date-time, got {value!r}')
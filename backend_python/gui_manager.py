@@ -0,0 +1,278 @@
+"""
+Qt 界面桥接：HTTP 线程通过信号请求主线程打开编辑窗口 / 文件对话框。
+
+    gui_manager = GuiManager(config_store)
+    services.file_picker = QtFilePicker(gui_manager)
+
+只有非 --headless 启动时才导入本模块，headless 模式完全不加载 PyQt。
+三个编辑窗口模块（样式表构建较重）在第一次打开时才导入，
+启动后由 preload_editors() 在 Qt 事件循环空闲时提前导入。
+编辑窗口保存时通过构造时传入的 ConfigStore 按分区事务写入，与 HTTP 写入互不覆盖。
+退出时 close_editors() 让每个打开的窗口走自己的保存路径再关闭，quit() 结束事件循环。
+"""
+import threading
+from datetime import datetime
+from typing import Optional
+
+from PyQt6.QtWidgets import QApplication, QFileDialog, QInputDialog, QMessageBox
+from PyQt6.QtCore import QObject, Qt, pyqtSignal, pyqtSlot
+
+from config_store import ConfigStore
+from memo_ops import MemoBatch
+from platform_services import SNOOZE_PRESETS, FilePicker, Notifier, snooze_label
+
+
+class GuiManager(QObject):
+    # Signals to Main Thread
+    open_editor_signal = pyqtSignal(dict)
+    pick_file_signal = pyqtSignal()
+    open_goals_signal = pyqtSignal(list)
+    open_pomodoro_signal = pyqtSignal(dict)
+    close_editors_signal = pyqtSignal()
+    notify_signal = pyqtSignal(str, str, object)
+    quit_signal = pyqtSignal()
+
+    def __init__(self, config_store: ConfigStore):
+        super().__init__()
+        self._store = config_store
+        self.active_window = None
+        self.goals_window = None
+        self.pomodoro_window = None
+        # State tracking: keys 'memo', 'goals', 'pomodoro' -> value: boolean (is_open)
+        self.status = {'memo': False, 'goals': False, 'pomodoro': False}
+        self.file_picker_result = None
+        self.file_picker_event = threading.Event()
+        self.editors_closed_event = threading.Event()
+        self.notifications = []     # 打开中的提醒对话框（保持引用，关闭时移除）
+        
+        # Connect signals
+        self.open_editor_signal.connect(self.show_editor_slot)
+        self.pick_file_signal.connect(self.show_file_picker_slot)
+        self.open_goals_signal.connect(self.show_goals_editor_slot)
+        self.open_pomodoro_signal.connect(self.show_pomodoro_slot)
+        self.close_editors_signal.connect(self.close_editors_slot)
+        self.notify_signal.connect(self.show_notification_slot)
+        self.quit_signal.connect(QApplication.quit)
+
+    @pyqtSlot(dict)
+    def show_editor_slot(self, data):
+        self.status['memo'] = True
+        
+        def on_save(memo_data):
+            self.update_memo(memo_data)
+        def on_delete(memo_id):
+            self.delete_memo_internal(memo_id)
+
+        if self.active_window:
+            self.active_window.close()
+            
+        from memo_gui import MemoWindow
+        self.active_window = MemoWindow(data, on_save, on_delete)
+        
+        # Detect Close
+        original_close = self.active_window.closeEvent
+        def wrapped_close(event):
+            self.status['memo'] = False # Mark closed
+            if original_close: original_close(event)
+            else: event.accept()
+        self.active_window.closeEvent = wrapped_close
+        
+        self.active_window.show()
+        self.active_window.activateWindow()
+        self.active_window.raise_()
+
+    @pyqtSlot(list)
+    def show_goals_editor_slot(self, items):
+        self.status['goals'] = True
+        
+        def on_save(new_items):
+             print(f"Goals Saved: {len(new_items)}")
+             self.update_goals_internal(new_items)
+
+        if self.goals_window:
+            self.goals_window.close()
+            
+        from goals_gui import GoalsWindow
+        self.goals_window = GoalsWindow(items, on_save)
+        
+        # Monkey patch
+        original_close = self.goals_window.closeEvent
+        def wrapped_close(event):
+            print("Goals Window Closing...")
+            # Auto-save
+            if hasattr(self.goals_window, 'items'):
+                on_save(self.goals_window.items)
+            
+            self.status['goals'] = False # Mark closed
+            
+            if original_close: original_close(event)
+            else: event.accept()
+        self.goals_window.closeEvent = wrapped_close
+        
+        self.goals_window.show()
+        self.goals_window.activateWindow()
+        self.goals_window.raise_()
+
+    @pyqtSlot(dict)
+    def show_pomodoro_slot(self, config_data):
+        self.status['pomodoro'] = True
+        
+        def on_save(new_config):
+            self.update_pomodoro_internal(new_config)
+
+        if self.pomodoro_window:
+            self.pomodoro_window.close()
+            
+        from pomo_gui import PomodoroSettingsWindow
+        self.pomodoro_window = PomodoroSettingsWindow(config_data, on_save)
+        
+        # Monkey patch close event
+        original_close = self.pomodoro_window.closeEvent
+        def wrapped_close(event):
+            self.status['pomodoro'] = False
+            if original_close: original_close(event)
+            else: event.accept()
+        self.pomodoro_window.closeEvent = wrapped_close
+        
+        self.pomodoro_window.show()
+        self.pomodoro_window.activateWindow()
+        self.pomodoro_window.raise_()
+
+    @pyqtSlot()
+    def preload_editors(self):
+        """导入编辑窗口模块，让第一次打开编辑器不用再等导入"""
+        import memo_gui, goals_gui, pomo_gui  # noqa: F401
+
+    @pyqtSlot()
+    def close_editors_slot(self):
+        """
+        关闭所有编辑窗口，各自走保存路径：备忘录 save()（空白的新备忘录直接关闭），
+        目标窗口的 closeEvent 自动保存，番茄钟 save_and_close()。
+        打开中的文件对话框按取消处理，提醒对话框直接关闭。
+        """
+        modal = QApplication.activeModalWidget()
+        if modal is not None:
+            modal.reject()
+
+        memo = self.active_window
+        if self.status['memo'] and memo is not None:
+            draft = memo._collect_form_data()
+            if draft.get('id') or draft.get('title') or draft.get('content'):
+                memo.save()
+            else:
+                memo.close()
+        if self.status['goals'] and self.goals_window is not None:
+            self.goals_window.close()
+        if self.status['pomodoro'] and self.pomodoro_window is not None:
+            self.pomodoro_window.save_and_close()
+        for box in list(self.notifications):
+            box.close()
+        self.editors_closed_event.set()
+
+    def close_editors(self, timeout: float) -> bool:
+        """从其他线程请求主线程关闭编辑窗口，等待完成"""
+        self.editors_closed_event.clear()
+        self.close_editors_signal.emit()
+        return self.editors_closed_event.wait(timeout)
+
+    def quit(self) -> None:
+        self.quit_signal.emit()
+
+    @pyqtSlot(str, str, object)
+    def show_notification_slot(self, title, text, on_snooze):
+        """非模态的提醒对话框；有 on_snooze 时提供推迟按钮（预设时长和自定义）"""
+        box = QMessageBox(QMessageBox.Icon.Information, title, text)
+        box.setWindowFlag(Qt.WindowType.WindowStaysOnTopHint)
+        presets = {}
+        custom = None
+        if on_snooze is not None:
+            for minutes in SNOOZE_PRESETS:
+                button = box.addButton(f"Snooze {snooze_label(minutes)}", QMessageBox.ButtonRole.ActionRole)
+                presets[button] = minutes
+            custom = box.addButton("Snooze...", QMessageBox.ButtonRole.ActionRole)
+        box.addButton("Dismiss", QMessageBox.ButtonRole.RejectRole)
+
+        def clicked(button):
+            if button in presets:
+                on_snooze(presets[button])
+            elif button is custom:
+                minutes, ok = QInputDialog.getInt(None, "Snooze", "Remind me again in (minutes):", 15, 1, 366 * 24 * 60)
+                if ok:
+                    on_snooze(minutes)
+
+        def finished(_):
+            if box in self.notifications:
+                self.notifications.remove(box)
+
+        box.buttonClicked.connect(clicked)
+        box.finished.connect(finished)
+        self.notifications.append(box)
+        box.show()
+        box.activateWindow()
+
+    @pyqtSlot()
+    def show_file_picker_slot(self):
+        filename, _ = QFileDialog.getOpenFileName(None, "Select File", "", "All Files (*)")
+        self.file_picker_result = filename
+        self.file_picker_event.set()
+
+    # --- Logic Helpers ---
+    def update_memo(self, data):
+        with self._store.transaction('memos', undo=f'edit memo {data.get("id") or "(new)"}') as txn:
+            # 与 POST /api/memos 相同：沿用提醒状态，校验重复规则
+            batch = MemoBatch(txn.value or [])
+            try:
+                data = batch.upsert(data)
+            except ValueError as e:
+                txn.abort()
+                print(f"Memo not saved: {e}")
+                return
+            txn.value = batch.memos()
+        print(f"Memo saved: {data.get('id')}")
+
+    def delete_memo_internal(self, memo_id):
+        with self._store.transaction('memos', undo=f'delete memo {memo_id}') as txn:
+            txn.value = [m for m in txn.value or [] if m.get("id") != memo_id]
+        print(f"Memo deleted: {memo_id}")
+
+    def update_goals_internal(self, items):
+        with self._store.transaction('dailyGoals', undo='edit goals') as txn:
+            if not isinstance(txn.value, dict):
+                # Initialize with today's date to prevent frontend wipe
+                txn.value = {"date": datetime.now().strftime("%Y-%m-%d"), "items": []}
+
+            # Ensure we don't save a broken structure that frontend wipes
+            if not txn.value.get("date"):
+                txn.value["date"] = datetime.now().strftime("%Y-%m-%d")
+
+            print(f"DEBUG: Saving {len(items)} items to config.")
+            txn.value["items"] = items
+
+    def update_pomodoro_internal(self, new_config):
+        with self._store.transaction('pomodoroConfig') as txn:
+            txn.value = new_config
+        print("Pomodoro settings saved")
+
+class QtFilePicker(FilePicker):
+    """在 Qt 主线程弹出文件对话框，调用线程阻塞等待结果"""
+    available = True
+
+    def __init__(self, manager: GuiManager):
+        self._manager = manager
+
+    def pick_file(self) -> Optional[str]:
+        self._manager.file_picker_event.clear()
+        self._manager.pick_file_signal.emit()  # Signal main thread
+        self._manager.file_picker_event.wait()
+        return self._manager.file_picker_result
+
+class QtNotifier(Notifier):
+    """Qt 对话框通知：不阻塞提醒任务，推迟选项里有自定义时长"""
+
+    def __init__(self, manager: GuiManager):
+        super().__init__()
+        self._manager = manager
+
+    def notify(self, title: str, text: str, on_snooze=None) -> None:
+        self.history.append((title, text))
+        self._manager.notify_signal.emit(title, text, on_snooze)
@@ -0,0 +1,70 @@
+"""
+基于版本号的条件请求：ETag 由调用方根据内存状态的版本号给出，
+不需要序列化响应体再做哈希。If-None-Match 命中时直接返回 304，
+连响应体都不会构建。
+
+压缩后的响应带自己的 ETag（"<tag>-gzip" 等，见 compression.py），不同的字节不共用一个强校验器；
+比较 If-None-Match / If-Match 时同一版本的各个编码都算命中（解码后的内容相同）。
+"""
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import Response, make_response, request
+
+import metrics
+
+NOT_MODIFIED = metrics.counter('http_not_modified_total', 'Requests answered with 304 Not Modified')
+BYTES_SAVED = metrics.counter('http_not_modified_bytes_saved_total',
+                              'Response body bytes not sent thanks to 304 Not Modified')
+
+# 压缩编码的 ETag 后缀（与 compression.ENCODINGS 对应）
+ENCODING_SUFFIXES = ('br', 'gzip', 'deflate')
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    return f'{etag}-{encoding}'
+
+
+def version_tag(etag: str) -> str:
+    """去掉编码后缀，得到版本号本身的 ETag"""
+    base, _, suffix = etag.rpartition('-')
+    return base if base and suffix in ENCODING_SUFFIXES else etag
+
+
+def matching_etag(etags, etag: str) -> Optional[str]:
+    """etags（请求里的 If-None-Match / If-Match）中与 etag 同一版本的那个（任意编码）；没有时为 None"""
+    if not etags:
+        return None
+    if etags.star_tag or etags.contains(etag):
+        return etag
+    return next((tag for tag in etags if version_tag(tag) == etag), None)
+
+
+# route -> (etag, body size)，用于估算 304 节省的字节数
+_last_sizes: Dict[str, Tuple[str, int]] = {}
+_sizes_lock = threading.Lock()
+
+
+def conditional(route: str, etag: str, build: Callable[[], Any]) -> Response:
+    """
+    客户端已持有 etag 对应的版本时返回 304，否则调用 build() 构建完整响应
+    （build 可以返回 Flask 视图函数允许的任何返回值）。
+    所有响应都带 Cache-Control: no-cache，让浏览器每次都来验证。
+    """
+    matched = matching_etag(request.if_none_match, etag)
+    if matched is not None:
+        with _sizes_lock:
+            last = _last_sizes.get(route)
+        NOT_MODIFIED.inc(route=route)
+        if last and last[0] == etag:
+            BYTES_SAVED.inc(last[1], route=route)
+        resp = Response(status=304)
+        etag = matched                    # 304 带客户端持有的那个表示的 ETag
+    else:
+        resp = make_response(build())
+        if resp.status_code == 200 and not resp.is_streamed:
+            with _sizes_lock:
+                _last_sizes[route] = (etag, resp.calculate_content_length() or 0)
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
@@ -1,21 +1,24 @@
 import sys
 import json
 from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional, Callable, Dict, Any
 
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
     QTextEdit, QLineEdit, QPushButton, QLabel, QCheckBox,
     QGraphicsDropShadowEffect, QFrame, QDateEdit,
-    QGraphicsOpacityEffect, QSpinBox
+    QGraphicsOpacityEffect, QSpinBox, QComboBox
 )
 from PyQt6.QtCore import (
-    Qt, QPoint, QDateTime, QDate, QTime, QSize
+    Qt, QPoint, QDateTime, QDate, QTime, QSize, QTimeZone
 )
 from PyQt6.QtGui import (
     QColor, QFont, QPalette, QBrush, QAction, QIcon, QPainter, QLinearGradient
 )
 
+from due_dates import resolve_zone
+
 # ================== 配置常量（使用dataclass管理，更清晰） ==================
 @dataclass(frozen=True)  # 不可变配置，符合Pythonic
 class AppStyle:
@@ -70,7 +73,7 @@ QTextEdit {{
 }}
 
 /* Single Line Inputs */
-QLineEdit, QDateEdit, QSpinBox {{
+QLineEdit, QDateEdit, QSpinBox, QComboBox {{
     background-color: {config.input_bg};
     border: 1px solid {config.input_border};
     border-radius: 8px;
@@ -82,13 +85,13 @@ QLineEdit, QDateEdit, QSpinBox {{
 }}
 
 /* DISABLED STATE - VISUAL FEEDBACK */
-QLineEdit:disabled, QDateEdit:disabled, QSpinBox:disabled {{
+QLineEdit:disabled, QDateEdit:disabled, QSpinBox:disabled, QComboBox:disabled {{
     background-color: rgba(0, 0, 0, 0.4);
     color: rgba(255, 255, 255, 0.2);
     border: 1px dashed rgba(255, 255, 255, 0.1);
 }}
 
-QTextEdit:focus, QLineEdit:focus, QDateEdit:focus, QSpinBox:focus {{
+QTextEdit:focus, QLineEdit:focus, QDateEdit:focus, QSpinBox:focus, QComboBox:focus {{
     background-color: rgba(255, 255, 255, 0.1);
     border: 1px solid {config.accent_color};
 }}
@@ -128,6 +131,18 @@ QPushButton#CloseBtn:hover {{
     color: #ff7675;
 }}
 
+/* Weekday toggles (recurrence) */
+QPushButton#DayBtn {{
+    padding: 4px 0px;
+    min-width: 30px;
+    border-radius: 14px;
+}}
+QPushButton#DayBtn:checked {{
+    background-color: {config.accent_color};
+    border: 1px solid {config.accent_glow};
+    color: white;
+}}
+QPushButton#DayBtn:disabled {{ color: rgba(255, 255, 255, 0.2); }}
 QPushButton#DeleteBtn {{
     background-color: rgba(255, 80, 80, 0.1);
     border: 1px solid rgba(255, 80, 80, 0.3);
@@ -183,6 +198,27 @@ QDateEdit::down-arrow {{
 }}
 QDateEdit::up-button, QDateEdit::down-button {{ width: 0px; }}
 
+/* --- ComboBox (recurrence) --- */
+QComboBox::drop-down {{
+    subcontrol-origin: padding;
+    subcontrol-position: center right;
+    width: 25px;
+    border-left: 1px solid rgba(255, 255, 255, 0.1);
+    background: rgba(0,0,0,0.1);
+}}
+QComboBox::down-arrow {{
+    width: 12px; height: 12px;
+    image: none;
+    border-left: 5px solid transparent;
+    border-right: 5px solid transparent;
+    border-top: 6px solid {config.accent_color};
+}}
+QComboBox QAbstractItemView {{
+    background-color: #2d3436;
+    color: white;
+    selection-background-color: {config.accent_color};
+}}
+
 /* --- SpinBox (for Time) Specifics --- */
 QSpinBox {{
     padding-right: 25px; /* Make room for wider buttons */
@@ -287,6 +323,17 @@ class DraggableTitleBar(QWidget):
         """鼠标释放事件 - 清空位置记录"""
         self._parent.old_pos = None
 
+# 重复规则选项：(显示文本, freq, 间隔单位)
+REPEAT_CHOICES = (
+    ("Never", None, ""),
+    ("Every N hours", "hourly", " h"),
+    ("Daily", "daily", " d"),
+    ("Weekly", "weekly", " w"),
+    ("Monthly", "monthly", " mo"),
+)
+END_CHOICES = ("Never", "On date", "After")
+WEEKDAY_LABELS = ("M", "T", "W", "T", "F", "S", "S")
+
 # ================== 主备忘录窗口 ==================
 class MemoWindow(QWidget):
     """备忘录编辑窗口"""
@@ -312,7 +359,7 @@ class MemoWindow(QWidget):
         """初始化窗口属性"""
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.Window)
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
-        self.resize(420, 560)
+        self.resize(420, 710)
 
     def _init_layout(self) -> None:
         """初始化布局结构"""
@@ -378,6 +425,12 @@ class MemoWindow(QWidget):
         self.reminder_check.setChecked(self.memo_data.get('enableReminder', False))
         content_container.addWidget(self.reminder_check)
 
+        # 催办：提醒后按递增的间隔反复提醒，直到完成
+        self.escalate_check = QCheckBox("Keep reminding until done")
+        self.escalate_check.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.escalate_check.setChecked(self.memo_data.get('escalate', False))
+        content_container.addWidget(self.escalate_check)
+
         # 底部按钮区
         self._setup_bottom_buttons(content_container)
 
@@ -423,22 +476,122 @@ class MemoWindow(QWidget):
         self.min_spin.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.min_spin.setCursor(Qt.CursorShape.PointingHandCursor)
 
-        # 初始化日期时间数据
-        self._init_datetime_values()
-
         # 添加到布局
         dt_layout.addWidget(self.date_edit, 5)
         dt_layout.addWidget(self.hour_spin, 2)
         dt_layout.addWidget(self.min_spin, 2)
         parent_layout.addLayout(dt_layout)
 
+        self._setup_recurrence_rows(parent_layout)
+
+        # 初始化日期时间数据和重复规则
+        self._init_datetime_values()
+        self._init_recurrence_values()
+        self.toggle_date_inputs(self.enable_date_chk.isChecked())
+
+    def _setup_recurrence_rows(self, parent_layout: QVBoxLayout) -> None:
+        """设置重复规则：频率 + 间隔、每周的星期、结束条件（日期或次数）"""
+        # 频率 + 间隔
+        repeat_layout = QHBoxLayout()
+        repeat_layout.setSpacing(20)
+        repeat_layout.addWidget(QLabel("REPEAT"), 2)
+        self.repeat_combo = QComboBox()
+        for text, freq, _ in REPEAT_CHOICES:
+            self.repeat_combo.addItem(text, freq)
+        self.repeat_combo.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.repeat_combo.currentIndexChanged.connect(self._update_recurrence_inputs)
+        self.interval_spin = QSpinBox()
+        self.interval_spin.setRange(1, 999)
+        self.interval_spin.setPrefix(" every ")
+        self.interval_spin.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        repeat_layout.addWidget(self.repeat_combo, 4)
+        repeat_layout.addWidget(self.interval_spin, 3)
+        parent_layout.addLayout(repeat_layout)
+
+        # 每周的星期（周一为 0，与后端一致）
+        days_layout = QHBoxLayout()
+        days_layout.setSpacing(6)
+        self.day_buttons = []
+        for label in WEEKDAY_LABELS:
+            btn = QPushButton(label)
+            btn.setObjectName("DayBtn")
+            btn.setCheckable(True)
+            btn.setCursor(Qt.CursorShape.PointingHandCursor)
+            days_layout.addWidget(btn)
+            self.day_buttons.append(btn)
+        self.days_row = QWidget()
+        self.days_row.setLayout(days_layout)
+        days_layout.setContentsMargins(0, 0, 0, 0)
+        parent_layout.addWidget(self.days_row)
+
+        # 结束条件
+        end_layout = QHBoxLayout()
+        end_layout.setSpacing(20)
+        end_layout.addWidget(QLabel("ENDS"), 2)
+        self.end_combo = QComboBox()
+        self.end_combo.addItems(END_CHOICES)
+        self.end_combo.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.end_combo.currentIndexChanged.connect(self._update_recurrence_inputs)
+        self.until_edit = QDateEdit()
+        self.until_edit.setCalendarPopup(True)
+        self.until_edit.setDisplayFormat("yyyy-MM-dd")
+        self.count_spin = QSpinBox()
+        self.count_spin.setRange(1, 9999)
+        self.count_spin.setSuffix(" times")
+        self.count_spin.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        end_layout.addWidget(self.end_combo, 4)
+        end_layout.addWidget(self.until_edit, 3)
+        end_layout.addWidget(self.count_spin, 3)
+        parent_layout.addLayout(end_layout)
+
+    def _init_recurrence_values(self) -> None:
+        """用备忘录已有的重复规则初始化（没有时为 Never）"""
+        rule = self.memo_data.get('recurrence') or {}
+        freqs = [freq for _, freq, _ in REPEAT_CHOICES]
+        self.repeat_combo.setCurrentIndex(freqs.index(rule.get('freq')) if rule.get('freq') in freqs else 0)
+        self.interval_spin.setValue(rule.get('interval') or 1)
+        weekdays = rule.get('weekdays') or [self.date_edit.date().dayOfWeek() - 1]
+        for i, btn in enumerate(self.day_buttons):
+            btn.setChecked(i in weekdays)
+
+        until = QDateTime.fromString(rule.get('until') or '', Qt.DateFormat.ISODate)
+        self.until_edit.setDate(until.date() if until.isValid() else self.date_edit.date().addMonths(1))
+        self.count_spin.setValue(rule.get('count') or 10)
+        self.end_combo.setCurrentIndex(1 if until.isValid() else 2 if rule.get('count') else 0)
+        self._update_recurrence_inputs()
+
+    def _update_recurrence_inputs(self) -> None:
+        """按当前频率 / 结束条件显示对应的输入框"""
+        _, freq, unit = REPEAT_CHOICES[self.repeat_combo.currentIndex()]
+        repeating = freq is not None
+        self.interval_spin.setSuffix(unit)
+        self.interval_spin.setVisible(repeating)
+        self.days_row.setVisible(freq == 'weekly')
+        self.end_combo.setEnabled(repeating)
+        self.until_edit.setVisible(repeating and self.end_combo.currentIndex() == 1)
+        self.count_spin.setVisible(repeating and self.end_combo.currentIndex() == 2)
+
     def _init_datetime_values(self) -> None:
         """初始化日期时间值"""
         raw_date = self.memo_data.get('dueDate', '')
+        due_at = self.memo_data.get('dueAt')
+        zone = self.memo_data.get('dueZone')
         has_date = False
         default_dt = QDateTime.currentDateTime().addSecs(3600)
         
-        if raw_date:
+        if isinstance(due_at, int) and raw_date:
+            # 按保存时的时区（dueZone）显示墙上时间；时区解析不了时 dueAt 是按本机时区算的
+            tz = resolve_zone(zone)
+            if tz is not None:
+                wall = datetime.fromtimestamp(due_at, tz)
+                default_dt = QDateTime(QDate(wall.year, wall.month, wall.day), QTime(wall.hour, wall.minute))
+                if zone != bytes(QTimeZone.systemTimeZoneId()).decode():
+                    for widget in (self.date_edit, self.hour_spin, self.min_spin):
+                        widget.setToolTip(f"Time zone: {zone}")
+            else:
+                default_dt = QDateTime.fromSecsSinceEpoch(due_at)
+            has_date = True
+        elif raw_date:
             dt = QDateTime.fromString(raw_date, Qt.DateFormat.ISODate)
             if dt.isValid():
                 default_dt = dt
@@ -449,7 +602,14 @@ class MemoWindow(QWidget):
         self.min_spin.setValue(default_dt.time().minute())
         
         self.enable_date_chk.setChecked(has_date)
-        self.toggle_date_inputs(has_date)
+        # 记下原来的截止时间和显示的值：保存时没改过就原样保留 dueDate / dueZone
+        self._loaded_due = (raw_date, zone, self._form_due_date()) if has_date else None
+
+    def _form_due_date(self) -> str:
+        """输入框中的截止时间（dueDate 格式的墙上时间）"""
+        date = self.date_edit.date()
+        time = QTime(self.hour_spin.value(), self.min_spin.value())
+        return f"{date.toString('yyyy-MM-dd')}T{time.toString('HH:mm')}:00"
 
     def _setup_bottom_buttons(self, parent_layout: QVBoxLayout) -> None:
         """设置底部按钮区域"""
@@ -491,6 +651,10 @@ class MemoWindow(QWidget):
         self.date_edit.setEnabled(checked)
         self.hour_spin.setEnabled(checked)
         self.min_spin.setEnabled(checked)
+        # 重复规则以截止时间为第一次
+        for widget in (self.repeat_combo, self.interval_spin, self.days_row, self.until_edit, self.count_spin):
+            widget.setEnabled(checked)
+        self.end_combo.setEnabled(checked and self.repeat_combo.currentData() is not None)
 
     def delete_memo(self) -> None:
         """删除备忘录"""
@@ -524,12 +688,15 @@ class MemoWindow(QWidget):
         """收集表单数据并返回标准化的payload"""
         title = self.title_edit.text().strip()
         content = self.text_edit.toPlainText().strip()
-        date_str = None
+        date_str = zone = None
         
         if self.enable_date_chk.isChecked():
-            date = self.date_edit.date()
-            time = QTime(self.hour_spin.value(), self.min_spin.value())
-            date_str = f"{date.toString('yyyy-MM-dd')}T{time.toString('HH:mm')}:00"
+            date_str = self._form_due_date()
+            # 墙上时间所在的时区（IANA 名称），后端据此换算 dueAt
+            zone = bytes(QTimeZone.systemTimeZoneId()).decode()
+            if self._loaded_due is not None and date_str == self._loaded_due[2]:
+                # 没改截止时间：别的时区创建的备忘录重新保存时时刻和时区都不变
+                date_str, zone = self._loaded_due[0], self._loaded_due[1]
             
         return {
             "id": self.memo_id if self.memo_id else None,
@@ -537,9 +704,27 @@ class MemoWindow(QWidget):
             "content": content,
             "text": content,  # 兼容旧版字段
             "dueDate": date_str,
-            "enableReminder": self.reminder_check.isChecked()
+            "dueZone": zone,
+            "enableReminder": self.reminder_check.isChecked(),
+            "escalate": self.escalate_check.isChecked(),
+            "recurrence": self._collect_recurrence() if date_str else None
         }
 
+    def _collect_recurrence(self) -> Optional[Dict[str, Any]]:
+        """重复规则（格式见 reminders.py）；Never 时为 None"""
+        freq = self.repeat_combo.currentData()
+        if freq is None:
+            return None
+        rule = {"freq": freq, "interval": self.interval_spin.value()}
+        if freq == 'weekly':
+            rule["weekdays"] = [i for i, btn in enumerate(self.day_buttons) if btn.isChecked()] \
+                or [self.date_edit.date().dayOfWeek() - 1]
+        if self.end_combo.currentIndex() == 1:
+            rule["until"] = f"{self.until_edit.date().toString('yyyy-MM-dd')}T23:59:59"
+        elif self.end_combo.currentIndex() == 2:
+            rule["count"] = self.count_spin.value()
+        return rule
+
 # ================== 运行入口 ==================
 def run_editor(json_data_str: Optional[str] = None) -> None:
     """运行备忘录编辑器
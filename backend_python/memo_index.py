@@ -0,0 +1,238 @@
+"""
+备忘录内存索引：按 id / dueDate 维护有序键，分页查询只需 O(log n + page)。
+
+排序键全部是扁平元组，便于编码成游标（cursor）回传给前端：
+    id      -> (id_rank, id)
+    dueDate -> (no_date, dueAt, id_rank, id)      dueAt 为 UTC epoch 秒（见 due_dates.py）
+每种排序再按完成状态（open / done）拆成两条有序列表，
+status=all 时用 heapq.merge 惰性归并，不必扫描全表。
+
+提交后用 apply() 增量维护：备忘录按写时复制修改，没变的元素与上次是同一个对象，
+按身份找出变化的几条（merge_patch.list_delta），只移动这些条目的有序键。
+positions() 给出 id 在分区列表中的下标，提醒触发等只改几条的事务不必扫描整个列表。
+"""
+import base64
+import heapq
+import json
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from due_dates import due_epoch
+from merge_patch import list_delta
+
+SORT_FIELDS = ('id', 'dueDate')
+STATUS_VALUES = ('all', 'open', 'done')
+
+
+def _id_key(memo_id) -> Tuple[int, Any]:
+    # id 一般是毫秒时间戳（int），兼容手改成字符串的旧数据
+    if isinstance(memo_id, (int, float)) and not isinstance(memo_id, bool):
+        return (0, memo_id)
+    return (1, str(memo_id))
+
+
+def _sort_key(order: str, memo: Dict[str, Any]) -> tuple:
+    idk = _id_key(memo.get('id'))
+    if order == 'id':
+        return idk
+    due = due_epoch(memo)
+    # 没有截止日期的排在最后；按 UTC 时间排序，不受时区和夏令时影响
+    return (1, 0) + idk if due is None else (0, due) + idk
+
+
+def _due_before(memo: Dict[str, Any], bound: int) -> bool:
+    due = due_epoch(memo)
+    return due is not None and due < bound
+
+
+def encode_cursor(key: tuple) -> str:
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, order: str) -> tuple:
+    """解析游标，格式不对时抛 ValueError"""
+    try:
+        key = tuple(json.loads(base64.urlsafe_b64decode(cursor.encode('ascii'))))
+    except Exception:
+        raise ValueError('invalid cursor')
+    if len(key) != (2 if order == 'id' else 4):
+        raise ValueError('cursor does not match sort order')
+    if order == 'dueDate' and not all(isinstance(k, int) for k in key[:2]):
+        raise ValueError('cursor does not match sort order')
+    return key
+
+
+class MemoIndex:
+    """id -> memo 映射 + 每种排序的有序键列表"""
+
+    def __init__(self, memos: Optional[Iterable[Dict[str, Any]]] = None):
+        self._by_id: Dict[Any, Dict[str, Any]] = {}
+        self._orders: Dict[str, Dict[bool, List[tuple]]] = {
+            order: {False: [], True: []} for order in SORT_FIELDS
+        }
+        # 上次 rebuild / apply 的列表，apply 据此按身份找出变化；id 有重复等情况时为 None（只能重建）
+        self._source: Optional[List[Any]] = None
+        self._pos: Optional[Dict[Any, int]] = None    # id -> _source 中的下标；删除后为 None，用到时再建
+        if memos:
+            self.rebuild(memos)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def rebuild(self, memos: Iterable[Dict[str, Any]]) -> Tuple[List[Any], List[Any]]:
+        """
+        整体重建（保留原列表顺序，供无参数的 GET 使用）。
+        返回与重建前相比 (新增/修改的 id, 删除的 id)。
+        """
+        old = self._by_id
+        self._by_id = {}
+        for m in memos:
+            if isinstance(m, dict) and m.get('id') is not None:
+                self._by_id[m['id']] = dict(m)
+        for order in SORT_FIELDS:
+            buckets = {False: [], True: []}
+            for m in self._by_id.values():
+                buckets[bool(m.get('done'))].append(_sort_key(order, m))
+            for keys in buckets.values():
+                keys.sort()
+            self._orders[order] = buckets
+
+        upserted = [i for i, m in self._by_id.items() if old.get(i) != m]
+        deleted = [i for i in old if i not in self._by_id]
+        self._source = memos if isinstance(memos, list) and len(memos) == len(self._by_id) else None
+        self._pos = None if self._source is None else {m['id']: i for i, m in enumerate(self._source)}
+        return upserted, deleted
+
+    def apply(self, memos: List[Any]) -> Tuple[List[Any], List[Any]]:
+        """
+        同步提交后的列表，返回值与 rebuild() 相同。只处理变化的元素：每条 O(log n) 定位，
+        有序列表插入 / 删除是一次内存移动。变化超过一半、元素没有 id、
+        或者有条目换了位置（id 重复、重新排序）时整体重建，保证 all() 与列表顺序一致。
+        """
+        before = self._source
+        if before is None:
+            return self.rebuild(memos)
+        replaced, deleted, appended = list_delta(before, memos)
+        if len(replaced) + len(deleted) + len(appended) > max(1, len(memos) // 2):
+            return self.rebuild(memos)
+        removed = [before[i].get('id') for i in deleted]
+        fresh = {m.get('id') for m in appended if isinstance(m, dict)}
+        if (None in removed or None in fresh or len(fresh) != len(appended)
+                or any(i in self._by_id for i in fresh)):
+            return self.rebuild(memos)
+
+        upserted, gone = [], []
+        for memo_id in removed:
+            if self.remove(memo_id) is not None:
+                gone.append(memo_id)
+        for memo in [*replaced.values(), *appended]:
+            if self._by_id.get(memo['id']) != memo:
+                self.upsert(memo)
+                upserted.append(memo['id'])
+        if deleted:
+            self._pos = None                  # 删除后后面的下标都变了，用到时再建
+        elif self._pos is not None:
+            self._pos.update((m['id'], len(before) + k) for k, m in enumerate(appended))
+        self._source = memos
+        return upserted, gone
+
+    def positions(self, memos: List[Any], ids: Iterable[Any]) -> Dict[Any, int]:
+        """
+        ids 在 memos 中的下标（不在列表里的 id 不出现在结果中）。memos 是上次 apply 的列表
+        （或它的浅拷贝，例如分区事务的 txn.value）时每个 id O(1)，否则扫描一遍。
+        """
+        ids = list(ids)
+        source = self._source
+        if source is not None and len(memos) == len(source):
+            if self._pos is None:
+                self._pos = {m['id']: i for i, m in enumerate(source)}
+            found = {}
+            for memo_id in ids:
+                i = self._pos.get(memo_id)
+                if i is None:
+                    continue
+                if memos[i] is not source[i]:
+                    break                     # 不是同一个列表：退回扫描
+                found[memo_id] = i
+            else:
+                return found
+        wanted = set(ids)
+        return {m['id']: i for i, m in enumerate(memos) if isinstance(m, dict) and m.get('id') in wanted}
+
+    def get(self, memo_id) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(memo_id)
+
+    def all(self) -> List[Dict[str, Any]]:
+        return list(self._by_id.values())
+
+    def upsert(self, memo: Dict[str, Any]) -> None:
+        memo_id = memo.get('id')
+        if memo_id is None:
+            return
+        if memo_id in self._by_id:
+            self._discard_keys(self._by_id[memo_id])
+        memo = dict(memo)
+        self._by_id[memo_id] = memo
+        for order in SORT_FIELDS:
+            insort(self._orders[order][bool(memo.get('done'))], _sort_key(order, memo))
+
+    def remove(self, memo_id) -> Optional[Dict[str, Any]]:
+        memo = self._by_id.pop(memo_id, None)
+        if memo is not None:
+            self._discard_keys(memo)
+        return memo
+
+    def _discard_keys(self, memo: Dict[str, Any]) -> None:
+        for order in SORT_FIELDS:
+            keys = self._orders[order][bool(memo.get('done'))]
+            key = _sort_key(order, memo)
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+
+    # ── 查询 ──────────────────────────────────────────────
+    def _iter_bucket(self, keys: List[tuple], descending: bool,
+                     after: Optional[tuple], upper: Optional[tuple]) -> Iterator[tuple]:
+        lo, hi = 0, len(keys)
+        if upper is not None:
+            hi = bisect_left(keys, upper)
+        if descending:
+            if after is not None:
+                hi = min(hi, bisect_left(keys, after))
+            for i in range(hi - 1, lo - 1, -1):
+                yield keys[i]
+        else:
+            if after is not None:
+                lo = bisect_right(keys, after)
+            for i in range(lo, hi):
+                yield keys[i]
+
+    def query(self, status: str = 'all', sort: str = 'id', descending: bool = False,
+              due_before: Optional[int] = None, limit: int = 50,
+              after: Optional[tuple] = None) -> Tuple[List[Dict[str, Any]], Optional[tuple]]:
+        """
+        返回 (items, next_key)。next_key 为 None 表示没有下一页。
+        due_before 为 epoch 秒。sort=dueDate 时用二分截断；sort=id 时只能逐条过滤。
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f'unsupported sort field: {sort}')
+        if status not in STATUS_VALUES:
+            raise ValueError(f'unsupported status: {status}')
+
+        buckets = self._orders[sort]
+        flags = [False, True] if status == 'all' else [status == 'done']
+        upper = (0, due_before) if (due_before is not None and sort == 'dueDate') else None
+        iters = [self._iter_bucket(buckets[f], descending, after, upper) for f in flags]
+        keys: Iterable[tuple] = iters[0] if len(iters) == 1 else heapq.merge(*iters, reverse=descending)
+
+        memos = (self._by_id[k[-1]] for k in keys)
+        if due_before is not None and sort != 'dueDate':
+            memos = (m for m in memos if _due_before(m, due_before))
+
+        page = list(islice(memos, limit + 1))
+        if len(page) > limit:
+            page = page[:limit]
+            return page, _sort_key(sort, page[-1])
+        return page, None
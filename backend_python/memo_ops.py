@@ -0,0 +1,138 @@
+"""
+备忘录修改逻辑（新增 / 局部修改 / 删除），单条接口和批量接口共用。
+
+MemoBatch 在内存列表上累积任意多个操作，调用方最后只需持久化一次。
+id -> 下标的映射只建一次，每个操作 O(1)。
+新增和修改截止时间时在这里计算 dueAt / dueZone（见 due_dates.py），之后不再解析 dueDate。
+"""
+import time
+from typing import Any, Dict, List, Optional
+
+from due_dates import normalize_due
+from reminders import normalize_rule
+
+
+def merge_reminder_state(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    截止时间变化或重新开启提醒时重置 reminderShown，否则沿用旧状态。
+    new 会被原地修改。
+    """
+    if (new.get("dueDate") != old.get("dueDate")) or (new.get("enableReminder") and not old.get("enableReminder")):
+        new['reminderShown'] = False
+    else:
+        new['reminderShown'] = old.get('reminderShown', False)
+    return new
+
+
+def merge_recurrence(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    校验并补全重复规则（不合法时抛出 ValueError），规则或截止时间变化时序号从 1 重新开始。
+    new 会被原地修改。
+    """
+    rule = normalize_rule(new.get('recurrence'), new.get('dueDate'))
+    if rule is None:
+        new.pop('recurrence', None)
+        new.pop('occurrence', None)
+        return new
+    new['recurrence'] = rule
+    if old is None or old.get('recurrence') != rule or old.get('dueDate') != new.get('dueDate'):
+        new['occurrence'] = 1
+    else:
+        new['occurrence'] = old.get('occurrence', 1)
+    return new
+
+
+class MemoNotFound(KeyError):
+    pass
+
+
+class MemoBatch:
+    def __init__(self, memos: List[Dict[str, Any]]):
+        self._memos: List[Optional[Dict[str, Any]]] = list(memos)
+        self._pos = {m.get("id"): i for i, m in enumerate(self._memos) if isinstance(m, dict)}
+        self.changed = False
+
+    def _new_id(self) -> int:
+        # 同一毫秒内批量新增时顺延，保证 id 唯一
+        new_id = int(time.time() * 1000)
+        while new_id in self._pos:
+            new_id += 1
+        return new_id
+
+    def upsert(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """与 POST /api/memos 相同的规则：无 id 视为新建。重复规则不合法时抛出 ValueError"""
+        memo_id = data.get("id")
+        merge_recurrence(self._memos[self._pos[memo_id]] if memo_id in self._pos else None, data)
+        normalize_due(data)
+        if not memo_id:
+            data['id'] = self._new_id()
+            data['reminderShown'] = False
+        elif memo_id in self._pos:
+            merge_reminder_state(self._memos[self._pos[memo_id]], data)
+            self._memos[self._pos[memo_id]] = data
+            self.changed = True
+            return data
+        else:
+            data['reminderShown'] = False
+        self._pos[data['id']] = len(self._memos)
+        self._memos.append(data)
+        self.changed = True
+        return data
+
+    def patch(self, memo_id, changes: Dict[str, Any]) -> Dict[str, Any]:
+        if memo_id not in self._pos:
+            raise MemoNotFound(memo_id)
+        old = self._memos[self._pos[memo_id]]
+        changes = {k: v for k, v in changes.items() if k != "id"}
+        updated = merge_reminder_state(old, {**old, **changes})
+        if 'recurrence' in changes or 'dueDate' in changes:
+            merge_recurrence(old, updated)
+        if 'dueDate' in changes or 'dueZone' in changes or 'dueAt' in changes:
+            normalize_due(updated)
+        self._memos[self._pos[memo_id]] = updated
+        self.changed = True
+        return updated
+
+    def delete(self, memo_id) -> bool:
+        i = self._pos.pop(memo_id, None)
+        if i is None:
+            return False
+        self._memos[i] = None   # 最后统一压缩，避免每次删除都移动列表
+        self.changed = True
+        return True
+
+    def memos(self) -> List[Dict[str, Any]]:
+        return [m for m in self._memos if m is not None]
+
+    def apply(self, op: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        执行单个批量操作，返回结果（不抛异常）：
+            {"op": "upsert", "memo": {...}}
+            {"op": "patch",  "id": 1, "changes": {...}}
+            {"op": "delete", "id": 1}
+        """
+        if not isinstance(op, dict):
+            return {"ok": False, "error": "operation must be an object"}
+        kind = op.get("op")
+        try:
+            if kind == "upsert":
+                memo = op.get("memo")
+                if not isinstance(memo, dict):
+                    return {"ok": False, "error": "upsert requires a memo object"}
+                memo = self.upsert(dict(memo))
+                return {"ok": True, "id": memo["id"]}
+            if kind == "patch":
+                changes = op.get("changes")
+                if not isinstance(changes, dict):
+                    return {"ok": False, "error": "patch requires a changes object"}
+                self.patch(op.get("id"), changes)
+                return {"ok": True, "id": op.get("id")}
+            if kind == "delete":
+                if not self.delete(op.get("id")):
+                    return {"ok": False, "id": op.get("id"), "error": "memo not found"}
+                return {"ok": True, "id": op.get("id")}
+        except MemoNotFound:
+            return {"ok": False, "id": op.get("id"), "error": "memo not found"}
+        except ValueError as e:
+            return {"ok": False, "id": op.get("id"), "error": str(e)}
+        return {"ok": False, "error": f"unknown op: {kind}"}
@@ -0,0 +1,67 @@
+"""
+RFC 7386 JSON Merge Patch，以及找出配置变化部分的辅助函数。
+
+    patch 中的对象递归合并，null 表示删除该键，其他值（包括数组）整体替换。
+
+list_delta 按对象身份比较两个列表（分区元素按写时复制修改，没变的元素是同一个对象），
+journal 存储引擎（config_journal）、撤销历史（config_history）和备忘录索引共用。
+"""
+import copy
+from itertools import compress
+from operator import is_, is_not
+from typing import Any
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """返回应用 patch 后的新对象，不修改 target"""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def changed_keys(before: dict, after: dict) -> set:
+    """顶层键中值发生变化的键（含新增与删除）"""
+    return {k for k in before.keys() | after.keys() if before.get(k, ...) != after.get(k, ...)}
+
+
+def _same_id(a, b) -> bool:
+    return isinstance(a, dict) and isinstance(b, dict) and a.get('id') is not None and a.get('id') == b.get('id')
+
+
+def list_delta(before: list, after: list):
+    """
+    (替换 {位置: 元素}, 删除的位置, 追加的元素)；元素按身份比较，同 id 的 dict 视为替换。
+    常见情况（原位替换、末尾追加、删除连续的一段）用 map / compress 在 C 里比较，
+    不必在 Python 里逐个遍历上千条备忘录。
+    """
+    n = min(len(before), len(after))
+    mismatched = list(compress(range(n), map(is_not, before, after)))
+    if len(after) >= len(before) and all(_same_id(after[i], before[i]) for i in mismatched):
+        return {str(i): after[i] for i in mismatched}, [], after[len(before):]
+    if len(after) < len(before) and mismatched:
+        k, d = mismatched[0], len(before) - len(after)
+        if all(map(is_, before[k + d:], after[k:])):
+            return {}, list(range(k, k + d)), []
+    elif len(after) < len(before) and not mismatched:
+        return {}, list(range(len(after), len(before))), []
+
+    replaced, deleted = {}, []
+    j, n = 0, len(after)
+    for i, b in enumerate(before):
+        if j < n:
+            a = after[j]
+            if a is b:
+                j += 1
+                continue
+            if _same_id(a, b):
+                replaced[str(i)] = a
+                j += 1
+                continue
+        deleted.append(i)
+    return replaced, deleted, after[j:]
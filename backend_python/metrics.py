@@ -0,0 +1,189 @@
+"""
+进程内指标注册表。计数器按标签分组，线程安全，开销只有一次加锁加法。
+
+    BYTES_SAVED = metrics.counter('http_not_modified_bytes_saved_total', '...')
+    BYTES_SAVED.inc(1024, route='/config')
+
+派生值（比率、当前线程数等）用 gauge 注册一个函数，导出时才计算：
+
+    metrics.gauge('http_compression_ratio', '...', lambda: [({"encoding": "gzip"}, 4.2)])
+
+耗时 / 大小用固定桶的直方图，每次记录只是一次二分查找加一次加法：
+
+    LOAD_SECONDS = metrics.histogram('config_load_seconds', '...')
+    with LOAD_SECONDS.time():
+        ...
+
+直方图由 set_enabled() 开关（服务端跟随配置里的 debug 键），关闭时 observe 直接返回；
+计数器和 gauge 始终开启。render_prometheus() 输出 Prometheus 文本格式。
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+
+# 秒
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# 字节
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_registry: Dict[str, Union['Counter', 'Gauge', 'Histogram']] = {}
+_registry_lock = threading.Lock()
+_enabled = False
+
+
+def set_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(dict(k), v) for k, v in self._values.items()]
+
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], Iterable[Tuple[dict, float]]]):
+        self.name = name
+        self.help = help_text
+        self._fn = fn
+
+    def samples(self):
+        return list(self._fn())
+
+
+class _Timer:
+    __slots__ = ('_hist', '_labels', '_t0')
+
+    def __init__(self, hist: 'Histogram', labels: dict):
+        self._hist = hist
+        self._labels = labels
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe(time.perf_counter() - self._t0, **self._labels)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [每个桶的计数（最后一个是 +Inf）, sum]
+        self._series: Dict[Tuple[Tuple[str, str], ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        if not _enabled:
+            return
+        i = bisect_left(self.buckets, value)
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def time(self, **labels) -> _Timer:
+        return _Timer(self, labels)
+
+    def samples(self):
+        """[(labels, {"count", "sum", "buckets": [(上界, 累计计数), ...]})]"""
+        with self._lock:
+            items = [(dict(k), list(s[0]), s[1]) for k, s in self._series.items()]
+        result = []
+        for labels, counts, total in items:
+            cumulative, running = [], 0
+            for bound, n in zip(self.buckets + ('+Inf',), counts):
+                running += n
+                cumulative.append((bound, running))
+            result.append((labels, {"count": running, "sum": total, "buckets": cumulative}))
+        return result
+
+
+def counter(name: str, help_text: str = '') -> Counter:
+    """按名字取计数器，不存在时创建（模块重复导入也安全）"""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Counter(name, help_text)
+        return _registry[name]
+
+
+def histogram(name: str, help_text: str = '', buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Histogram(name, help_text, buckets)
+        return _registry[name]
+
+
+def gauge(name: str, help_text: str, fn: Callable[[], Iterable[Tuple[dict, float]]]) -> Gauge:
+    """注册（或替换）一个按需计算的指标，fn 返回 [(labels, value), ...]"""
+    with _registry_lock:
+        _registry[name] = Gauge(name, help_text, fn)
+        return _registry[name]
+
+
+def snapshot() -> Dict[str, list]:
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return {m.name: [{"labels": labels, "value": value} for labels, value in m.samples()]
+            for m in metrics}
+
+
+# ── Prometheus 文本格式 ─────────────────────────────────
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + '}'
+
+
+def _number(value) -> str:
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_prometheus() -> str:
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+    lines: List[str] = []
+    for m in metrics:
+        lines.append(f'# HELP {m.name} {_escape(m.help)}')
+        lines.append(f'# TYPE {m.name} {m.kind}')
+        for labels, value in m.samples():
+            if m.kind != 'histogram':
+                lines.append(f'{m.name}{_labels(labels)} {_number(value)}')
+                continue
+            for bound, count in value['buckets']:
+                lines.append(f'{m.name}_bucket{_labels({**labels, "le": _number(bound)})} {count}')
+            lines.append(f'{m.name}_sum{_labels(labels)} {_number(value["sum"])}')
+            lines.append(f'{m.name}_count{_labels(labels)} {value["count"]}')
+    return '\n'.join(lines) + '\n'
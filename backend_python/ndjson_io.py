@@ -0,0 +1,152 @@
+"""
+NDJSON 导入 / 导出：每行一条记录，便于流式处理大数据量。
+
+记录格式（type 字段区分）：
+    {"type": "meta",     "format": "roselia-backup", "version": 1, "exportedAt": "..."}
+    {"type": "setting",  "key": "musicPath", "value": "..."}
+    {"type": "app",      "data": {"name": ..., "path": ..., "icon": ...}}
+    {"type": "memo",     "data": {...}}
+    {"type": "goal",     "date": "2026-02-19", "data": {"text": ..., "done": ...}}
+    {"type": "pomodoro", "data": {"work": 25, "rest": 5}}
+    {"type": "preset",   "data": {"name": ..., "work": ..., "rest": ...}}
+"""
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterator, Tuple
+
+from memo_ops import MemoBatch
+
+FORMAT_NAME = 'roselia-backup'
+FORMAT_VERSION = 1
+
+# 这些键按记录逐条导出，其余顶层键作为 setting 导出
+SECTION_KEYS = ('apps', 'memos', 'dailyGoals', 'pomodoroConfig')
+
+
+def _line(record: Dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def iter_export_lines(config: Dict[str, Any]) -> Iterator[str]:
+    """逐行生成导出内容，不在内存中拼出完整文档"""
+    yield _line({"type": "meta", "format": FORMAT_NAME, "version": FORMAT_VERSION,
+                 "exportedAt": datetime.now().isoformat(timespec='seconds')})
+    for key, value in config.items():
+        if key not in SECTION_KEYS:
+            yield _line({"type": "setting", "key": key, "value": value})
+    for app in config.get('apps', []):
+        yield _line({"type": "app", "data": app})
+    for memo in config.get('memos', []):
+        yield _line({"type": "memo", "data": memo})
+    goals = config.get('dailyGoals') or {}
+    for item in goals.get('items', []):
+        yield _line({"type": "goal", "date": goals.get('date', ''), "data": item})
+    pomo = config.get('pomodoroConfig')
+    if isinstance(pomo, dict):
+        yield _line({"type": "pomodoro", "data": {k: v for k, v in pomo.items() if k != 'presets'}})
+        for preset in pomo.get('presets', []):
+            yield _line({"type": "preset", "data": preset})
+
+
+def _require(cond: bool, msg: str) -> None:
+    if not cond:
+        raise ValueError(msg)
+
+
+def _is_minutes(v) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool) and v > 0
+
+
+def parse_record(line: str) -> Tuple[str, Dict[str, Any]]:
+    """解析并校验一行，返回 (type, record)；不合法时抛 ValueError"""
+    try:
+        rec = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f'invalid JSON: {e.msg}')
+    _require(isinstance(rec, dict), 'record must be an object')
+    kind = rec.get('type')
+    data = rec.get('data')
+
+    if kind == 'meta':
+        _require(rec.get('format') == FORMAT_NAME, 'unknown export format')
+        _require(rec.get('version') == FORMAT_VERSION, 'unsupported export version')
+    elif kind == 'setting':
+        _require(isinstance(rec.get('key'), str) and rec['key'] not in SECTION_KEYS, 'invalid setting key')
+    elif kind == 'app':
+        _require(isinstance(data, dict) and isinstance(data.get('path'), str) and data['path'], 'app requires a path')
+    elif kind == 'memo':
+        _require(isinstance(data, dict), 'memo data must be an object')
+        _require(data.get('id') is None or isinstance(data['id'], int), 'memo id must be an integer')
+    elif kind == 'goal':
+        _require(isinstance(data, dict) and isinstance(data.get('text'), str), 'goal requires text')
+        _require(isinstance(rec.get('date', ''), str), 'goal date must be a string')
+    elif kind == 'pomodoro':
+        _require(isinstance(data, dict), 'pomodoro data must be an object')
+        _require(all(_is_minutes(data[k]) for k in ('work', 'rest') if k in data), 'work/rest must be positive numbers')
+    elif kind == 'preset':
+        _require(isinstance(data, dict) and isinstance(data.get('name'), str), 'preset requires a name')
+        _require(_is_minutes(data.get('work')) and _is_minutes(data.get('rest')), 'work/rest must be positive numbers')
+    else:
+        raise ValueError(f'unknown record type: {kind}')
+    return kind, rec
+
+
+def apply_records(config: Dict[str, Any], records) -> Dict[str, int]:
+    """
+    把一批已校验的记录合并进 config（原地修改），返回各类型计数。
+    memo 按 id 合并，app 按 path，preset 按 name；goal 只合并到
+    同一天（或更新的一天）的目标列表中，更旧的日期计为 skipped。
+    """
+    counts = {"applied": 0, "skipped": 0}
+    batch = MemoBatch(config.get('memos', []))
+    apps = config.setdefault('apps', [])
+    app_pos = {a.get('path'): i for i, a in enumerate(apps)}
+
+    for kind, rec in records:
+        data = rec.get('data')
+        if kind == 'meta':
+            continue
+        if kind == 'setting':
+            config[rec['key']] = rec.get('value')
+        elif kind == 'app':
+            if data['path'] in app_pos:
+                apps[app_pos[data['path']]] = data
+            else:
+                app_pos[data['path']] = len(apps)
+                apps.append(data)
+        elif kind == 'memo':
+            batch.upsert(dict(data))
+        elif kind == 'goal':
+            goals = config.get('dailyGoals')
+            if not isinstance(goals, dict):
+                goals = config['dailyGoals'] = {"date": "", "items": []}
+            date = rec.get('date', '')
+            if date > goals.get('date', ''):
+                goals['date'], goals['items'] = date, []
+            elif date < goals.get('date', ''):
+                counts['skipped'] += 1
+                continue
+            items = goals.setdefault('items', [])
+            if any(i.get('text') == data['text'] for i in items):
+                counts['skipped'] += 1
+                continue
+            items.append(data)
+        elif kind in ('pomodoro', 'preset'):
+            pomo = config.get('pomodoroConfig')
+            if not isinstance(pomo, dict):
+                pomo = config['pomodoroConfig'] = {"work": 25, "rest": 5, "presets": []}
+            if kind == 'pomodoro':
+                pomo.update({k: v for k, v in data.items() if k != 'presets'})
+            else:
+                presets = pomo.setdefault('presets', [])
+                for i, p in enumerate(presets):
+                    if p.get('name') == data['name']:
+                        presets[i] = data
+                        break
+                else:
+                    presets.append(data)
+        counts['applied'] += 1
+
+    if batch.changed:
+        config['memos'] = batch.memos()
+    return counts
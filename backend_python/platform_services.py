@@ -0,0 +1,507 @@
+"""
+平台服务层：开机自启动、媒体键、通知、窗口枚举、媒体会话（SMTC）、文件选择。
+
+    services = platform_services.create('auto')   # Windows 上用系统实现，其他系统用内存实现
+    services.start(scheduler)                     # 注册需要后台轮询的服务（SMTC）
+
+每种服务的基类同时也是内存实现：不调用任何系统 API，状态保存在内存里，
+用于 --platform memory、非 Windows 系统和基准测试。Windows 实现在第一次使用时
+才导入 winreg / psutil / winsdk（winsdk 在 SMTC 后台线程里导入，不阻塞启动），
+导入本模块和 create() 本身都没有副作用。
+文件选择依赖 Qt，由 gui_manager.QtFilePicker 在 GUI 启动后替换进来。
+"""
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+MEDIA_ACTIONS = ('play', 'next', 'prev')
+
+SMTC_POLL_SECONDS = metrics.histogram('smtc_poll_duration_seconds', 'Duration of one SMTC poll')
+SMTC_POLL_ERRORS = metrics.counter('smtc_poll_errors_total', 'SMTC polls that returned an error')
+
+
+# ── 开机自启动 ─────────────────────────────────────────
+class Autostart:
+    def __init__(self):
+        self.enabled = False
+
+    def set_enabled(self, enable: bool) -> None:
+        self.enabled = bool(enable)
+
+
+class WindowsAutostart(Autostart):
+    KEY_PATH = r"Software\Microsoft\Windows\CurrentVersion\Run"
+    APP_NAME = "LiquidWallpaperBackend"
+
+    def set_enabled(self, enable: bool) -> None:
+        import winreg
+        exe_path = sys.executable
+
+        try:
+            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.KEY_PATH, 0, winreg.KEY_ALL_ACCESS)
+            if enable:
+                winreg.SetValueEx(key, self.APP_NAME, 0, winreg.REG_SZ, exe_path)
+                print("Auto-start enabled")
+            else:
+                try:
+                    winreg.DeleteValue(key, self.APP_NAME)
+                    print("Auto-start disabled")
+                except FileNotFoundError:
+                    pass
+            winreg.CloseKey(key)
+            self.enabled = bool(enable)
+        except Exception as e:
+            print(f"Registry error: {e}")
+
+
+# ── 媒体键 ─────────────────────────────────────────────
+class MediaKeys:
+    def __init__(self):
+        self.sent = deque(maxlen=100)
+
+    def send(self, action: str) -> bool:
+        if action not in MEDIA_ACTIONS:
+            return False
+        self.sent.append(action)
+        return True
+
+
+class WindowsMediaKeys(MediaKeys):
+    """用 keybd_event 发送媒体键（简单可靠）"""
+    _VK = {'play': 0xB3, 'next': 0xB0, 'prev': 0xB1}
+    KEYEVENTF_EXTENDEDKEY = 0x0001
+    KEYEVENTF_KEYUP = 0x0002
+
+    def __init__(self):
+        super().__init__()
+        import ctypes
+        self._user32 = ctypes.windll.user32
+
+    def send(self, action: str) -> bool:
+        vk = self._VK.get(action)
+        if vk is None:
+            return False
+        try:
+            # Press
+            self._user32.keybd_event(vk, 0, self.KEYEVENTF_EXTENDEDKEY, 0)
+            # Release
+            self._user32.keybd_event(vk, 0, self.KEYEVENTF_EXTENDEDKEY | self.KEYEVENTF_KEYUP, 0)
+            print(f'[MEDIA] keybd_event vk=0x{vk:02X} action={action}')
+            return True
+        except Exception as e:
+            print(f"[MEDIA] keybd_event 失败: {e}")
+            return False
+
+
+# ── 通知 ──────────────────────────────────────────────
+# 通知里的推迟选项（分钟）；支持输入的实现（gui_manager.QtNotifier）另外提供自定义时长
+SNOOZE_PRESETS = (5, 60)
+
+
+def snooze_label(minutes: int) -> str:
+    return f"{minutes // 60} h" if minutes % 60 == 0 else f"{minutes} min"
+
+
+class Notifier:
+    """内存实现：记录通知；snooze_responses 里预设的分钟数依次作为用户的推迟选择"""
+
+    def __init__(self):
+        self.history = deque(maxlen=100)
+        self.snooze_responses: deque = deque()
+
+    def notify(self, title: str, text: str, on_snooze: Optional[Callable[[int], None]] = None) -> None:
+        """
+        弹出通知。on_snooze 不为空时提供推迟选项，用户选择后以分钟数调用
+        （可能在其他线程上调用，也可能在 notify 返回之后）。
+        """
+        self.history.append((title, text))
+        print(f"[NOTIFY] {title}: {text}")
+        if on_snooze is not None and self.snooze_responses:
+            on_snooze(self.snooze_responses.popleft())
+
+
+class WindowsNotifier(Notifier):
+    """MessageBox，会阻塞调用线程直到用户关闭；推迟只有 SNOOZE_PRESETS 两个选项（是 / 否）"""
+
+    MB_OKCANCEL, MB_YESNOCANCEL, MB_ICONINFORMATION, MB_TOPMOST = 0x1, 0x3, 0x40, 0x40000
+    IDYES, IDNO = 6, 7
+
+    def notify(self, title: str, text: str, on_snooze: Optional[Callable[[int], None]] = None) -> None:
+        import ctypes
+        if on_snooze is None:
+            ctypes.windll.user32.MessageBoxW(0, text, title, self.MB_ICONINFORMATION | self.MB_OKCANCEL)
+            return
+        short, long = SNOOZE_PRESETS
+        text += f"\n\nYes: snooze {snooze_label(short)}    No: snooze {snooze_label(long)}    Cancel: dismiss"
+        choice = ctypes.windll.user32.MessageBoxW(
+            0, text, title, self.MB_ICONINFORMATION | self.MB_YESNOCANCEL | self.MB_TOPMOST)
+        if choice == self.IDYES:
+            on_snooze(short)
+        elif choice == self.IDNO:
+            on_snooze(long)
+
+
+# ── 窗口枚举 ───────────────────────────────────────────
+class WindowEnumerator:
+    """可见且有标题的窗口 [(标题, 进程名)]；内存实现返回 windows 属性的内容"""
+
+    def __init__(self):
+        self.windows: List[Tuple[str, str]] = []
+
+    def visible_windows(self) -> List[Tuple[str, str]]:
+        return list(self.windows)
+
+
+class WindowsWindowEnumerator(WindowEnumerator):
+    def visible_windows(self) -> List[Tuple[str, str]]:
+        import ctypes as _ct
+        try:
+            import psutil
+        except ImportError:
+            return []
+        user32 = _ct.windll.user32
+        results = []
+        names: Dict[int, Optional[str]] = {}
+
+        @_ct.WINFUNCTYPE(_ct.c_bool, _ct.c_void_p, _ct.c_long)
+        def callback(hwnd, _):
+            if not user32.IsWindowVisible(hwnd):
+                return True
+            length = user32.GetWindowTextLengthW(hwnd)
+            if length == 0:
+                return True
+            buf = _ct.create_unicode_buffer(length + 1)
+            user32.GetWindowTextW(hwnd, buf, length + 1)
+            title = buf.value.strip()
+            if not title:
+                return True
+
+            # 获取 PID → 进程名（同一次枚举中按 PID 缓存）
+            pid = _ct.c_ulong()
+            user32.GetWindowThreadProcessId(hwnd, _ct.byref(pid))
+            if pid.value not in names:
+                try:
+                    names[pid.value] = psutil.Process(pid.value).name().lower().replace('.exe', '')
+                except Exception:
+                    names[pid.value] = None
+            if names[pid.value]:
+                results.append((title, names[pid.value]))
+            return True
+
+        user32.EnumWindows(callback, 0)
+        return results
+
+
+# ── 媒体会话 ───────────────────────────────────────────
+# 快照里的进度字段：position 是 sampledAt（服务端 time.monotonic() 秒）时的进度，
+# playbackRate 是进度每秒前进的秒数（暂停时为 0），客户端按
+#     position + playbackRate * (服务端现在 - sampledAt)
+# 自行外推。采样与外推结果相差不超过 SEEK_TOLERANCE 时沿用旧快照（版本号不变），
+# 所以正常播放时快照只在换曲、暂停 / 继续、拖动进度时变化。
+SEEK_TOLERANCE = 1.5
+_TIMELINE_KEYS = ('position', 'playbackRate', 'sampledAt')
+
+
+def _static_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in data.items() if k not in _TIMELINE_KEYS}
+
+
+def _stamp(prev: Optional[Dict[str, Any]], data: Dict[str, Any], now: float) -> Dict[str, Any]:
+    """给一次采样加上时间轴字段；与 prev 的外推一致时直接返回 prev"""
+    if 'error' in data:
+        return dict(data)
+    playing = data.get('state') == 'playing'
+    rate = float(data.get('playbackRate') or 1.0) if playing else 0.0
+    position = float(data.get('position') or 0.0)
+    if prev is not None and 'error' not in prev and prev['playbackRate'] == rate \
+            and _static_fields(prev) == _static_fields(data):
+        expected = prev['position'] + rate * (now - prev['sampledAt'])
+        duration = data.get('duration') or 0.0
+        if duration > 0:
+            expected = min(expected, duration)
+        if abs(expected - position) <= SEEK_TOLERANCE:
+            return prev
+    return {**data, 'position': round(position, 2), 'playbackRate': rate, 'sampledAt': round(now, 3)}
+
+
+class WindowTitleTracker:
+    """
+    窗口标题回退的进度推算：标题里只有曲名和歌手，进度按采样时间累计。
+    曲名 / 歌手变化视为换曲，进度从 0 开始；标题显示为暂停（info["paused"]）时进度停住，
+    继续播放同一首时从停住的位置接着算。暂时找不到播放器窗口时保留状态，
+    同一首重新出现时按上次的状态补上中间的时间。
+    """
+
+    def __init__(self):
+        self._track: Optional[Tuple[str, str]] = None
+        self._position = 0.0
+        self._at = 0.0
+        self._playing = False
+
+    def update(self, info: Optional[Dict[str, Any]], now: float) -> Optional[Dict[str, Any]]:
+        if info is None:
+            return None
+        track = (info.get('title', ''), info.get('artist', ''))
+        playing = not info.get('paused')
+        if track != self._track:
+            self._track, self._position = track, 0.0
+        elif self._playing:
+            self._position += now - self._at
+        self._at, self._playing = now, playing
+        result = {k: v for k, v in info.items() if k != 'paused'}
+        result.update({
+            'source':    info.get('source', 'window_title'),
+            'state':     'playing' if playing else 'paused',
+            'stateCode': 4 if playing else 5,
+            'thumbnail': None,
+            'position':  self._position,
+            'duration':  0.0,       # 窗口标题无法得知总时长
+        })
+        return result
+
+
+class MediaSessions:
+    """
+    当前媒体快照，内容变化时版本号递增（用作 /media/status 的 ETag），wait() 可以等到下一次变化。
+    数据来源：
+        publish(data)           媒体会话（内存实现由调用方写入，Windows 由 SMTC 轮询写入）
+        publish_fallback(info)  媒体会话不可用时的窗口标题解析结果，由 WindowTitleTracker 推算进度
+    快照优先取媒体会话，其次窗口标题，都没有时是 {'error': reason}。
+    多个客户端共用同一份快照，采样频率与客户端数量和轮询间隔无关。
+    """
+    source = 'memory'
+
+    def __init__(self, unavailable_reason: str = 'no media session source'):
+        self._changed = threading.Condition(threading.Lock())
+        self._session: Dict[str, Any] = {'error': unavailable_reason}
+        self._fallback: Optional[Dict[str, Any]] = None
+        self._tracker = WindowTitleTracker()
+        self._snapshot: Dict[str, Any] = dict(self._session)
+        self._version = 0
+        self._closed = False
+
+    def start(self, scheduler) -> None:
+        pass
+
+    def publish(self, data: Dict[str, Any], now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        with self._changed:
+            self._session = _stamp(self._session, data, now)
+            self._refresh()
+
+    def publish_fallback(self, info: Optional[Dict[str, Any]], now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        with self._changed:
+            sample = self._tracker.update(info, now)
+            self._fallback = None if sample is None else _stamp(self._fallback, sample, now)
+            self._refresh()
+
+    def needs_fallback(self) -> bool:
+        """媒体会话不可用，需要扫描窗口标题"""
+        with self._changed:
+            return 'error' in self._session
+
+    def _refresh(self) -> None:
+        if 'error' not in self._session:
+            snapshot = {**self._session, 'source': self.source}
+        elif self._fallback is not None:
+            snapshot = self._fallback
+        else:
+            snapshot = {'error': f"no media found ({self.source}: {self._session['error']}, window: no match)"}
+        if snapshot != self._snapshot:
+            self._snapshot = snapshot
+            self._version += 1
+            self._changed.notify_all()
+
+    def snapshot(self) -> Tuple[int, Dict[str, Any]]:
+        with self._changed:
+            return self._version, dict(self._snapshot)
+
+    def wait(self, version: int, timeout: Optional[float] = None) -> bool:
+        """等到版本号不再是 version（或 close()），返回是否有变化"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self._closed or self._version != version,
+                                          timeout) and not self._closed
+
+    def close(self) -> None:
+        """唤醒所有等待中的 wait()（退出时让长轮询立即返回）"""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+
+class SmtcMediaSessions(MediaSessions):
+    """
+    Windows SMTC (System Media Transport Controls)。
+    WinRT 要求运行在 STA（单线程公寓）线程上，不能直接在 Flask 路由里
+    new_event_loop()，必须在专用线程里初始化 COM 后再跑 asyncio。
+    轮询作为调度器的周期任务运行：setup / teardown 在任务线程上初始化 COM 和事件循环，
+    轮询抛出异常时由调度器退避重试，不会让媒体信息永久停止更新。
+    """
+    source = 'smtc'
+    INTERVAL = 2
+
+    def __init__(self):
+        super().__init__('initializing')
+        self._loop = None
+
+    def start(self, scheduler) -> None:
+        scheduler.every('smtc-poll', self.INTERVAL, self._poll, jitter=0.0,
+                        setup=self._setup, teardown=self._teardown)
+        print('[SMTC] 后台轮询任务已启动')
+
+    @staticmethod
+    async def poll_once() -> Dict[str, Any]:
+        """单次拉取 SMTC 数据，在专用 STA 线程中调用"""
+        from winsdk.windows.media.control import \
+            GlobalSystemMediaTransportControlsSessionManager as MediaManager
+        from winsdk.windows.storage.streams import DataReader, Buffer, InputStreamOptions
+        import base64
+        from datetime import datetime, timezone
+        try:
+            mgr = await MediaManager.request_async()
+            cur = mgr.get_current_session()
+            if not cur:
+                return {'error': 'no active media session'}
+
+            props    = await cur.try_get_media_properties_async()
+            playback = cur.get_playback_info()
+            timeline = cur.get_timeline_properties()
+
+            # 封面
+            thumb = None
+            try:
+                if props.thumbnail:
+                    stream = await props.thumbnail.open_read_async()
+                    sz  = stream.size
+                    buf = Buffer(sz)
+                    await stream.read_async(buf, sz, InputStreamOptions.READ_AHEAD)
+                    reader = DataReader.from_buffer(buf)
+                    raw    = bytearray(sz)
+                    reader.read_bytes(raw)
+                    thumb  = 'data:image/jpeg;base64,' + base64.b64encode(bytes(raw)).decode()
+            except Exception as te:
+                print(f'[SMTC] thumb: {te}')
+
+            try:
+                state_code = int(playback.playback_status)
+            except Exception:
+                state_code = 0
+            state_str = {0:'closed',1:'opened',2:'changing',
+                         3:'stopped',4:'playing',5:'paused'}.get(state_code, 'unknown')
+
+            rate = 1.0
+            try:
+                rate = float(playback.playback_rate or 1.0)
+            except Exception:
+                pass
+
+            # 播放器只在换曲、拖动等时刻更新 timeline，position 是 last_updated_time 时的进度，
+            # 播放中要补上之后经过的时间
+            pos, dur = 0.0, 0.0
+            try:
+                pos = timeline.position.total_seconds()
+                dur = timeline.max_seek_time.total_seconds()
+                if state_code == 4:
+                    elapsed = (datetime.now(timezone.utc) - timeline.last_updated_time).total_seconds()
+                    pos += max(0.0, elapsed) * rate
+                    if dur > 0:
+                        pos = min(pos, dur)
+            except Exception:
+                pass
+
+            return {
+                'title':      props.title      or '',
+                'artist':     props.artist     or '',
+                'albumTitle': props.album_title or '',
+                'thumbnail':  thumb,
+                'state':      state_str,
+                'stateCode':  state_code,
+                'position':   round(pos, 2),
+                'duration':   round(dur, 2),
+                'playbackRate': rate,
+            }
+        except Exception as e:
+            return {'error': str(e)}
+
+    def _setup(self) -> None:
+        """在任务线程上：用 ctypes 初始化 COM STA，创建此线程的 asyncio 事件循环"""
+        import asyncio
+        import ctypes
+        from scheduler import Cancelled
+        try:
+            import winsdk.windows.media.control  # noqa: F401
+        except ImportError:
+            print('[WARN] winsdk not installed; run: pip install winsdk')
+            self.publish({'error': 'winsdk not installed'})
+            raise Cancelled()
+
+        # 初始化 COM STA（COINIT_APARTMENTTHREADED = 0x2）
+        COINIT_APARTMENTTHREADED = 0x2
+        hr = ctypes.windll.ole32.CoInitializeEx(None, COINIT_APARTMENTTHREADED)
+        if hr not in (0, 1):   # S_OK or S_FALSE(already init)
+            print(f'[SMTC] CoInitializeEx failed: hr=0x{hr:08x}')
+
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+    def _poll(self) -> None:
+        with SMTC_POLL_SECONDS.time():
+            result = self._loop.run_until_complete(self.poll_once())
+        if 'error' in result:
+            SMTC_POLL_ERRORS.inc(kind='no_session' if result['error'] == 'no active media session' else 'exception')
+        self.publish(result)
+
+    def _teardown(self) -> None:
+        import ctypes
+        self._loop.close()
+        ctypes.windll.ole32.CoUninitialize()
+
+
+# ── 文件选择 ───────────────────────────────────────────
+class FilePicker:
+    """没有界面时不可用，pick_file() 返回 None"""
+    available = False
+
+    def pick_file(self) -> Optional[str]:
+        return None
+
+
+# ── 组合 ──────────────────────────────────────────────
+class PlatformServices:
+    def __init__(self, name: str, autostart: Autostart, media_keys: MediaKeys, notifier: Notifier,
+                 windows: WindowEnumerator, media: MediaSessions, file_picker: FilePicker):
+        self.name = name
+        self.autostart = autostart
+        self.media_keys = media_keys
+        self.notifier = notifier
+        self.windows = windows
+        self.media = media
+        self.file_picker = file_picker
+
+    def start(self, scheduler) -> None:
+        self.media.start(scheduler)
+
+
+PLATFORMS = ('auto', 'windows', 'memory')
+
+
+def in_memory() -> PlatformServices:
+    return PlatformServices('memory', Autostart(), MediaKeys(), Notifier(),
+                            WindowEnumerator(), MediaSessions(), FilePicker())
+
+
+def windows() -> PlatformServices:
+    return PlatformServices('windows', WindowsAutostart(), WindowsMediaKeys(), WindowsNotifier(),
+                            WindowsWindowEnumerator(), SmtcMediaSessions(), FilePicker())
+
+
+def create(kind: str = 'auto') -> PlatformServices:
+    """kind: auto（Windows 上用系统实现）/ windows / memory"""
+    if kind == 'windows' or (kind == 'auto' and sys.platform == 'win32'):
+        return windows()
+    return in_memory()
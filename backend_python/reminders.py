@@ -0,0 +1,381 @@
+"""
+提醒调度：按到期时间排序的最小堆，以及重复提醒的规则。
+
+    queue = ReminderQueue()
+    queue.rebuild(memos)                  # 加载配置时
+    queue.update(changed_memos, deleted)  # 备忘录变化时只重新挂上变化的条目，O(k log n)
+    queue.wait(1.0)                       # 提醒任务：睡到最早的到期时间（或有更早的条目挂上）
+    for memo_id, due, memo in queue.pop_due(time.time()):
+        ...                               # 每条 O(log n)，与备忘录总数无关
+
+堆里的旧条目不立即删除：_armed 记录每条备忘录当前的到期时间，弹出时对不上的
+条目直接丢弃；旧条目过多时整体重建。
+
+重复规则（memo["recurrence"]，保存时由 normalize_rule 校验）：
+
+    {"freq": "hourly" | "daily" | "weekly" | "monthly", "interval": N,
+     "weekdays": [0-6]（weekly，周一为 0）, "day": 1-31（monthly，默认取截止日期的日）,
+     "until": "2026-12-31T23:59"（可选）, "count": N（可选，总次数）}
+
+dueDate 始终是当前这一次的时间，memo["occurrence"] 是它在序列中的序号（从 1 开始）。
+提醒触发后用 next_occurrence 只算下一次（错过的次数直接跳过，按算术一步到位，
+不展开整个序列），写回 dueDate 并重新挂进堆里；超过 until / count 时不再重复。
+
+推迟（snooze）和催办（memo["escalate"]：提醒后按 first, first*factor, ... 直到 max 的间隔
+反复提醒，直到备忘录完成）的状态保存在 SnoozeStore（分区目录下的 reminders.log，
+只追加一行），不改写备忘录分区。每条备忘录在堆里只有一个条目，
+触发时间为 fire_timestamp：截止时间（未提醒时）和推迟到的时间中较早的一个。
+"""
+import calendar
+import heapq
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from due_dates import due_epoch, to_epoch
+
+FREQUENCIES = ('hourly', 'daily', 'weekly', 'monthly')
+
+# 催办间隔（秒）：第 n 次为 min(first * factor ** n, max)；settings 的 "escalation" 键可覆盖
+ESCALATION_DEFAULTS = {
+    "first": 300,
+    "factor": 2,
+    "max": 3600,
+}
+
+
+def _parse(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def normalize_rule(rule: Any, due_date: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    校验并补全重复规则，返回新的 dict；rule 为空时返回 None，不合法时抛出 ValueError。
+    due_date 用来补全 weekly 的 weekdays 和 monthly 的 day。
+    """
+    if not rule:
+        return None
+    if not isinstance(rule, dict):
+        raise ValueError('recurrence must be an object')
+    freq = rule.get('freq')
+    if freq not in FREQUENCIES:
+        raise ValueError(f'recurrence.freq must be one of {list(FREQUENCIES)}')
+    interval = rule.get('interval', 1)
+    if not isinstance(interval, int) or isinstance(interval, bool) or not 1 <= interval <= 1000:
+        raise ValueError('recurrence.interval must be an integer between 1 and 1000')
+    due = None
+    if due_date:
+        try:
+            due = _parse(due_date)
+        except ValueError:
+            pass
+    out = {"freq": freq, "interval": interval}
+    if freq == 'weekly':
+        weekdays = rule.get('weekdays') or ([due.weekday()] if due else None)
+        if not isinstance(weekdays, list) or not weekdays or \
+                not all(isinstance(d, int) and not isinstance(d, bool) and 0 <= d <= 6 for d in weekdays):
+            raise ValueError('recurrence.weekdays must be a non-empty list of 0-6 (Monday is 0)')
+        out["weekdays"] = sorted(set(weekdays))
+    if freq == 'monthly':
+        day = rule.get('day') or (due.day if due else None)
+        if not isinstance(day, int) or isinstance(day, bool) or not 1 <= day <= 31:
+            raise ValueError('recurrence.day must be between 1 and 31')
+        out["day"] = day
+    if rule.get('until'):
+        try:
+            _parse(rule['until'])
+        except (TypeError, ValueError):
+            raise ValueError('recurrence.until must be an ISO date-time')
+        out["until"] = rule['until']
+    if rule.get('count') is not None:
+        count = rule['count']
+        if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+            raise ValueError('recurrence.count must be a positive integer')
+        out["count"] = count
+    return out
+
+
+def _month_date(month_index: int, day: int, at: datetime) -> datetime:
+    year, month = divmod(month_index, 12)
+    month += 1
+    return at.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+
+
+def _steps_after(current: datetime, after: datetime, step: timedelta) -> int:
+    """current + k*step > after 的最小正整数 k"""
+    if after < current:
+        return 1
+    return (after - current) // step + 1
+
+
+def next_occurrence(rule: Dict[str, Any], current: datetime, after: datetime) -> Optional[Tuple[datetime, int]]:
+    """
+    序列中 current 之后、晚于 after 的第一次：(时间, 前进的次数)。
+    前进的次数包含被跳过（错过）的次数，用于 count 限制。每次调用的计算量是常数。
+    """
+    freq, n = rule['freq'], rule['interval']
+    if freq in ('hourly', 'daily'):
+        step = timedelta(hours=n) if freq == 'hourly' else timedelta(days=n)
+        k = _steps_after(current, after, step)
+        return current + k * step, k
+    if freq == 'monthly':
+        m0 = current.year * 12 + current.month - 1
+        months = after.year * 12 + after.month - 1 - m0
+        k = n * max(1, months // n)
+        candidate = _month_date(m0 + k, rule['day'], current)
+        while candidate <= after or candidate <= current:
+            k += n
+            candidate = _month_date(m0 + k, rule['day'], current)
+        return candidate, k // n
+    # weekly：按周一对齐的周序号，每 n 周中的 weekdays
+    weekdays = rule['weekdays']
+    week0 = current - timedelta(days=current.weekday())
+    pos0 = bisect_left(weekdays, current.weekday()) - (0 if current.weekday() in weekdays else 1)
+    w = 0
+    if after > current:
+        w = ((after - week0).days // 7) // n * n
+    while True:
+        for pos, day in enumerate(weekdays):
+            candidate = week0 + timedelta(weeks=w, days=day)
+            if candidate > after and candidate > current:
+                return candidate, (w // n) * len(weekdays) + pos - pos0
+        w += n
+
+
+def advance(memo: Dict[str, Any], now: float) -> Optional[Dict[str, Any]]:
+    """
+    重复提醒触发后的下一次：返回要合并进备忘录的字段（dueDate / dueAt / dueZone / occurrence /
+    reminderShown），序列已结束（或没有重复规则）时返回 None。
+    序列在 dueDate 的墙上时间上推进（dueZone 中的 9:00 跨过夏令时仍是 9:00），now 为 epoch 秒。
+    """
+    rule = memo.get('recurrence')
+    if not rule or not memo.get('dueDate'):
+        return None
+    try:
+        current = _parse(memo['dueDate'])
+        # now 换算成与 dueDate 同一时区的墙上时间
+        after = current + timedelta(seconds=now - due_epoch(memo))
+        found = next_occurrence(rule, current, after)
+        if found is None:
+            return None
+        due, steps = found
+        occurrence = int(memo.get('occurrence') or 1) + steps
+        if rule.get('count') and occurrence > rule['count']:
+            return None
+        if rule.get('until') and due.replace(tzinfo=None) > _parse(rule['until']).replace(tzinfo=None):
+            return None
+        due_date = due.isoformat(timespec='seconds')
+        due_at, zone = to_epoch(due_date, memo.get('dueZone'))
+    except (KeyError, TypeError, ValueError):
+        return None
+    fields = {"dueDate": due_date, "dueAt": due_at, "occurrence": occurrence, "reminderShown": False}
+    if zone:
+        fields["dueZone"] = zone
+    return fields
+
+
+def due_timestamp(memo: Dict[str, Any]) -> Optional[int]:
+    """需要提醒时返回触发时间（dueAt，epoch 秒），否则 None"""
+    if not isinstance(memo, dict) or not memo.get('enableReminder') or memo.get('done') \
+            or memo.get('reminderShown'):
+        return None
+    return due_epoch(memo)
+
+
+def fire_timestamp(memo: Dict[str, Any], snooze: Optional[Tuple[float, int]]) -> Optional[float]:
+    """备忘录下一次提醒的时间：截止时间（未提醒时）和推迟到的时间中较早的一个；已完成时为 None"""
+    due = due_timestamp(memo)
+    if snooze is None or not isinstance(memo, dict) or memo.get('done'):
+        return due
+    return snooze[0] if due is None else min(due, snooze[0])
+
+
+def escalation_options(options: Any) -> Dict[str, float]:
+    """合并 settings 中的 "escalation" 选项，无效的值忽略"""
+    merged = dict(ESCALATION_DEFAULTS)
+    for key, value in (options.items() if isinstance(options, dict) else ()):
+        if key in ESCALATION_DEFAULTS and isinstance(value, (int, float)) and not isinstance(value, bool) \
+                and value > 0:
+            merged[key] = value
+    return merged
+
+
+def escalation_delay(level: int, options: Dict[str, float]) -> float:
+    """第 level 次（从 0 开始）催办距离上一次提醒的秒数"""
+    return min(options['first'] * options['factor'] ** min(level, 64), options['max'])
+
+
+class SnoozeStore:
+    """
+    推迟 / 催办状态：memo id -> (提醒时间 epoch, 催办次数)。
+    每次修改向日志追加一行 {"id", "until", "level"}（until 为 null 表示清除），
+    启动时重放；失效的行超过一定比例时整体重写。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._state: Dict[Any, Tuple[float, int]] = {}
+        self._lines = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            print(f"Error loading reminder state {self.path}: {e}")
+            return
+        for line in lines:
+            try:
+                record = json.loads(line)
+                if record.get('until') is None:
+                    self._state.pop(record['id'], None)
+                else:
+                    self._state[record['id']] = (float(record['until']), int(record.get('level', 0)))
+            except (ValueError, TypeError, KeyError, AttributeError):
+                continue                    # 写到一半的最后一行
+            self._lines += 1
+
+    def __contains__(self, memo_id) -> bool:
+        return memo_id in self._state
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def get(self, memo_id) -> Optional[Tuple[float, int]]:
+        return self._state.get(memo_id)
+
+    def set(self, memo_id, until: float, level: int = 0) -> None:
+        with self._lock:
+            self._state[memo_id] = (until, level)
+            self._append({"id": memo_id, "until": round(until, 3), "level": level})
+
+    def discard(self, *memo_ids) -> None:
+        with self._lock:
+            for memo_id in memo_ids:
+                if self._state.pop(memo_id, None) is not None:
+                    self._append({"id": memo_id, "until": None})
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        if self._lines > 64 and self._lines > 4 * len(self._state):
+            self._rewrite()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._lines += 1
+
+    def _rewrite(self) -> None:
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for memo_id, (until, level) in self._state.items():
+                f.write(json.dumps({"id": memo_id, "until": round(until, 3), "level": level}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._lines = len(self._state)
+
+
+class ReminderQueue:
+    def __init__(self, snoozes: Optional[SnoozeStore] = None):
+        self.snoozes = snoozes
+        self._heap: List[Tuple[float, int, Any]] = []       # (到期时间, 序号, memo id)
+        self._armed: Dict[Any, Tuple[float, Dict[str, Any]]] = {}   # id -> (到期时间, memo)
+        self._seq = 0
+        self._changed = threading.Condition(threading.Lock())
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self._armed)
+
+    def _arm(self, memo: Dict[str, Any]) -> bool:
+        """挂上（或摘下）一条备忘录，返回是否成为新的最早条目"""
+        memo_id = memo.get('id') if isinstance(memo, dict) else None
+        if memo_id is None:
+            return False
+        due = fire_timestamp(memo, self.snoozes.get(memo_id) if self.snoozes is not None else None)
+        current = self._armed.get(memo_id)
+        if due is None:
+            self._armed.pop(memo_id, None)
+            return False
+        self._armed[memo_id] = (due, memo)
+        if current is not None and current[0] == due:
+            return False
+        self._seq += 1
+        earliest = not self._heap or due < self._heap[0][0]
+        heapq.heappush(self._heap, (due, self._seq, memo_id))
+        return earliest
+
+    def _compact(self) -> None:
+        if len(self._heap) > 2 * len(self._armed) + 64:
+            self._heap = [(due, i, memo_id) for i, (memo_id, (due, _)) in enumerate(self._armed.items())]
+            heapq.heapify(self._heap)
+
+    def rebuild(self, memos: Iterable[Dict[str, Any]]) -> None:
+        with self._changed:
+            self._heap, self._armed = [], {}
+            for memo in memos:
+                self._arm(memo)
+            self._changed.notify_all()
+
+    def update(self, memos: Iterable[Dict[str, Any]], deleted: Iterable[Any] = ()) -> None:
+        """变化的备忘录重新挂上，删除的摘下"""
+        with self._changed:
+            wake = False
+            for memo in memos:
+                wake = self._arm(memo) or wake
+            for memo_id in deleted:
+                self._armed.pop(memo_id, None)
+            self._compact()
+            if wake:
+                self._changed.notify_all()
+
+    def next_due(self) -> Optional[float]:
+        with self._changed:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def _drop_stale(self) -> None:
+        heap, armed = self._heap, self._armed
+        while heap:
+            due, _, memo_id = heap[0]
+            current = armed.get(memo_id)
+            if current is not None and current[0] == due:
+                return
+            heapq.heappop(heap)
+
+    def pop_due(self, now: float) -> List[Tuple[Any, float, Dict[str, Any]]]:
+        """取出全部 now 之前到期的条目：[(memo id, 到期时间, memo)]，按到期时间排序"""
+        due_items = []
+        with self._changed:
+            while True:
+                self._drop_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    return due_items
+                due, _, memo_id = heapq.heappop(self._heap)
+                _, memo = self._armed.pop(memo_id)
+                due_items.append((memo_id, due, memo))
+
+    def wait(self, timeout: float) -> None:
+        """睡到最早的条目到期（最多 timeout 秒）；有更早的条目挂上或 close() 时提前返回"""
+        with self._changed:
+            if self._closed:
+                return
+            self._drop_stale()
+            if self._heap:
+                timeout = min(timeout, max(0.0, self._heap[0][0] - time.time()))
+            if timeout > 0:
+                self._changed.wait(timeout)
+
+    def close(self) -> None:
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
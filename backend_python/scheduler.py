@@ -0,0 +1,228 @@
+"""
+后台任务调度：周期任务和一次性任务统一注册、监督和查看。
+
+    scheduler = Scheduler()
+    scheduler.every('reminder', 5, scan_reminders)                 # 每 5 秒（±10% 抖动）
+    scheduler.every('smtc-poll', 2, poll, setup=init_com, teardown=uninit_com)
+    scheduler.once('stats-warmup', 1.0, sample_stats)              # 1 秒后执行一次
+    scheduler.tasks()                                               # /api/system/tasks 的数据
+    scheduler.stop(timeout=2.0)                                     # 取消全部任务并等待退出
+
+每个任务在自己的守护线程上运行（SMTC 需要固定的 COM STA 线程，通知会阻塞
+调用线程，所以不共享工作线程），setup / teardown 在该线程上执行。
+任务函数抛出异常时不会让线程退出：周期任务按 interval * 2^连续失败次数 退避
+（上限 max_backoff）后重试，一次性任务最多重试 retries 次。
+
+取消是协作式的：cancel() 只设置标志并唤醒等待中的任务，正在执行的函数可以
+通过 current_task().cancelled 检查后自行返回；任务函数（或 setup）抛出
+Cancelled 表示正常结束，不计为失败。
+"""
+import random
+import threading
+import time
+import traceback
+from typing import Callable, Dict, List, Optional
+
+import metrics
+
+TASK_RUNS = metrics.counter('scheduler_task_runs_total', 'Background task runs by outcome')
+TASK_SECONDS = metrics.histogram('scheduler_task_duration_seconds', 'Background task run time')
+
+_local = threading.local()
+
+
+class Cancelled(Exception):
+    """任务主动结束（不计为失败，也不重试）"""
+
+
+def current_task() -> Optional['Task']:
+    """在任务线程里返回当前任务，其他线程返回 None"""
+    return getattr(_local, 'task', None)
+
+
+def _wall(mono: Optional[float]) -> Optional[float]:
+    if mono is None:
+        return None
+    return round(time.time() + (mono - time.monotonic()), 3)
+
+
+class Task:
+    def __init__(self, name: str, fn: Callable[[], None], interval: Optional[float], delay: float,
+                 jitter: float, retries: int, max_backoff: float,
+                 setup: Optional[Callable[[], None]], teardown: Optional[Callable[[], None]]):
+        self.name = name
+        self.fn = fn
+        self.interval = interval          # None 表示一次性任务
+        self.jitter = jitter
+        self.retries = retries
+        self.max_backoff = max_backoff
+        self.setup = setup
+        self.teardown = teardown
+
+        self.state = 'scheduled'          # scheduled / running / backoff / done / failed / cancelled
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_run: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.next_run: Optional[float] = time.monotonic() + delay
+
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._main, daemon=True, name=name)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _next_delay(self, failed: bool) -> Optional[float]:
+        if failed:
+            if self.interval is None:
+                if self.consecutive_failures > self.retries:
+                    return None
+                return min(self.max_backoff, 2.0 ** (self.consecutive_failures - 1))
+            return min(self.max_backoff, self.interval * 2 ** self.consecutive_failures)
+        if self.interval is None:
+            return None
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _run_once(self) -> bool:
+        """执行一次，返回是否失败；Cancelled 向上传递"""
+        self.state = 'running'
+        self.next_run = None
+        t0 = time.perf_counter()
+        self.last_run = time.monotonic()
+        try:
+            self.fn()
+            return False
+        except Cancelled:
+            raise
+        except Exception as e:
+            self.last_error = f'{type(e).__name__}: {e}'
+            print(f"[TASK] {self.name} failed: {self.last_error}")
+            traceback.print_exc()
+            return True
+        finally:
+            self.last_duration = time.perf_counter() - t0
+            TASK_SECONDS.observe(self.last_duration, task=self.name)
+
+    def _main(self) -> None:
+        _local.task = self
+        set_up = False
+        try:
+            while not self._cancel.wait(max(0.0, self.next_run - time.monotonic())):
+                failed = False
+                if not set_up and self.setup is not None:
+                    try:
+                        self.setup()
+                        set_up = True
+                    except Cancelled:
+                        raise
+                    except Exception as e:
+                        self.last_error = f'setup: {type(e).__name__}: {e}'
+                        print(f"[TASK] {self.name} setup failed: {e}")
+                        failed = True
+                if not failed:
+                    failed = self._run_once()
+                self.runs += 1
+                TASK_RUNS.inc(task=self.name, outcome='error' if failed else 'ok')
+                if failed:
+                    self.failures += 1
+                    self.consecutive_failures += 1
+                else:
+                    self.consecutive_failures = 0
+
+                delay = self._next_delay(failed)
+                if delay is None or self.cancelled:
+                    self.state = 'failed' if failed else 'cancelled' if self.cancelled else 'done'
+                    self.next_run = None
+                    return
+                self.state = 'backoff' if failed else 'scheduled'
+                self.next_run = time.monotonic() + delay
+            self.state = 'cancelled'
+        except Cancelled:
+            self.state = 'cancelled'
+        finally:
+            if self.state == 'cancelled':
+                self.next_run = None
+            if set_up and self.teardown is not None:
+                try:
+                    self.teardown()
+                except Exception as e:
+                    print(f"[TASK] {self.name} teardown failed: {e}")
+
+    def info(self) -> dict:
+        return {
+            "name": self.name,
+            "kind": "once" if self.interval is None else "periodic",
+            "interval": self.interval,
+            "state": self.state,
+            "runs": self.runs,
+            "failures": self.failures,
+            "consecutiveFailures": self.consecutive_failures,
+            "lastRun": _wall(self.last_run),
+            "lastDuration": round(self.last_duration, 6) if self.last_duration is not None else None,
+            "nextRun": _wall(self.next_run),
+            "lastError": self.last_error,
+        }
+
+
+class Scheduler:
+    def __init__(self):
+        self._tasks: Dict[str, Task] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, task: Task) -> Task:
+        with self._lock:
+            old = self._tasks.get(task.name)
+            if old is not None and old._thread.is_alive():
+                raise ValueError(f"task {task.name!r} is already running")
+            self._tasks[task.name] = task
+        task._thread.start()
+        return task
+
+    def every(self, name: str, interval: float, fn: Callable[[], None], *, delay: float = 0.0,
+              jitter: float = 0.1, max_backoff: float = 60.0,
+              setup: Optional[Callable[[], None]] = None,
+              teardown: Optional[Callable[[], None]] = None) -> Task:
+        """每 interval 秒执行一次（实际间隔在 ±jitter 比例内随机），delay 秒后第一次执行"""
+        return self._add(Task(name, fn, interval, delay, jitter, 0, max_backoff, setup, teardown))
+
+    def once(self, name: str, delay: float, fn: Callable[[], None], *, retries: int = 0,
+             max_backoff: float = 60.0) -> Task:
+        """delay 秒后执行一次；失败时按 1, 2, 4... 秒退避，最多重试 retries 次"""
+        return self._add(Task(name, fn, None, delay, 0.0, retries, max_backoff, None, None))
+
+    def get(self, name: str) -> Optional[Task]:
+        with self._lock:
+            return self._tasks.get(name)
+
+    def cancel(self, name: str) -> bool:
+        task = self.get(name)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    def tasks(self) -> List[dict]:
+        with self._lock:
+            tasks = list(self._tasks.values())
+        return [t.info() for t in tasks]
+
+    def stop(self, timeout: float = 2.0, exclude: tuple = ()) -> List[str]:
+        """取消全部任务并等待退出，返回超时仍未结束的任务名"""
+        with self._lock:
+            tasks = [t for name, t in self._tasks.items() if name not in exclude]
+        for t in tasks:
+            t.cancel()
+        deadline = time.monotonic() + timeout
+        me = threading.current_thread()
+        return [t.name for t in tasks
+                if t._thread is not me and not t.join(max(0.0, deadline - time.monotonic()))]
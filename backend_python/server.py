@@ -1,120 +1,26 @@
 import os
 import sys
 import json
-import ctypes
-import subprocess
-import winreg
-import asyncio
-import base64
+import argparse
+import hashlib
 import threading
 import time
-from flask import Flask, request, jsonify, send_file
+from urllib.parse import urlencode
+from flask import Flask, Response, g, request, jsonify, send_file
 from flask_cors import CORS
 import mimetypes
+import metrics
+import platform_services
+import config_watcher
+from scheduler import Scheduler
 
-# ── Windows SMTC (System Media Transport Controls) ──────────────────────────
-# WinRT 要求运行在 STA（单线程公寓）线程上，不能直接在 Flask 路由里
-# new_event_loop()，必须在专用线程里初始化 COM 后再跑 asyncio。
-try:
-    from winsdk.windows.media.control import \
-        GlobalSystemMediaTransportControlsSessionManager as MediaManager
-    from winsdk.windows.storage.streams import DataReader, Buffer, InputStreamOptions
-    WINSDK_OK = True
-except ImportError:
-    WINSDK_OK = False
-    print('[WARN] winsdk not installed; run: pip install winsdk')
-
-# 全局缓存，后台线程写，Flask 路由读
-_smtc_cache: dict = {'error': 'initializing'}
-_smtc_lock  = threading.Lock()
-
-async def _smtc_poll_once():
-    """单次拉取 SMTC 数据，在专用 STA 线程中调用"""
-    try:
-        mgr = await MediaManager.request_async()
-        cur = mgr.get_current_session()
-        if not cur:
-            return {'error': 'no active media session'}
-
-        props    = await cur.try_get_media_properties_async()
-        playback = cur.get_playback_info()
-        timeline = cur.get_timeline_properties()
-
-        # 封面
-        thumb = None
-        try:
-            if props.thumbnail:
-                stream = await props.thumbnail.open_read_async()
-                sz  = stream.size
-                buf = Buffer(sz)
-                await stream.read_async(buf, sz, InputStreamOptions.READ_AHEAD)
-                reader = DataReader.from_buffer(buf)
-                raw    = bytearray(sz)
-                reader.read_bytes(raw)
-                thumb  = 'data:image/jpeg;base64,' + base64.b64encode(bytes(raw)).decode()
-        except Exception as te:
-            print(f'[SMTC] thumb: {te}')
+# 平台服务（自启动 / 媒体键 / 通知 / 窗口枚举 / 媒体会话 / 文件选择）。
+# 导入时使用内存实现，没有任何副作用；__main__ 中按 --platform 替换为系统实现。
+services = platform_services.in_memory()
 
-        try:
-            state_code = int(playback.playback_status)
-        except Exception:
-            state_code = 0
-        state_str = {0:'closed',1:'opened',2:'changing',
-                     3:'stopped',4:'playing',5:'paused'}.get(state_code, 'unknown')
-
-        pos, dur = 0.0, 0.0
-        try:
-            pos = timeline.position.total_seconds()
-            dur = timeline.max_seek_time.total_seconds()
-        except Exception:
-            pass
-
-        return {
-            'title':      props.title      or '',
-            'artist':     props.artist     or '',
-            'albumTitle': props.album_title or '',
-            'thumbnail':  thumb,
-            'state':      state_str,
-            'stateCode':  state_code,
-            'position':   round(pos, 2),
-            'duration':   round(dur, 2),
-        }
-    except Exception as e:
-        return {'error': str(e)}
-
-
-def _smtc_background_thread():
-    """
-    专用 STA 线程：用 ctypes 初始化 COM STA，
-    然后在此线程的 asyncio 事件循环中每 2 秒轮询 SMTC。
-    """
-    global _smtc_cache
-    # 初始化 COM STA（COINIT_APARTMENTTHREADED = 0x2）
-    COINIT_APARTMENTTHREADED = 0x2
-    hr = ctypes.windll.ole32.CoInitializeEx(None, COINIT_APARTMENTTHREADED)
-    if hr not in (0, 1):   # S_OK or S_FALSE(already init)
-        print(f'[SMTC] CoInitializeEx failed: hr=0x{hr:08x}')
-
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
-    async def run():
-        global _smtc_cache
-        while True:
-            result = await _smtc_poll_once()
-            with _smtc_lock:
-                _smtc_cache = result
-            await asyncio.sleep(2)
-
-    try:
-        loop.run_until_complete(run())
-    finally:
-        ctypes.windll.ole32.CoUninitialize()
-
-if WINSDK_OK:
-    _t = threading.Thread(target=_smtc_background_thread, daemon=True, name='smtc-poll')
-    _t.start()
-    print('[SMTC] 后台轮询线程已启动')
+# 所有后台任务（SMTC 轮询、提醒扫描、HTTP 服务线程等）都由调度器启动和监督，
+# 状态见 /api/system/tasks。导入时没有任务，__main__ 中注册。
+scheduler = Scheduler()
 
 # ── 窗口标题回退：解析常见播放器的窗口标题 ──────────────────────────────────
 # 当 SMTC 不可用时（老版本播放器未注册 SMTC），通过枚举窗口标题提取曲目信息
@@ -122,12 +28,12 @@ if WINSDK_OK:
 import re as _re
 
 # 播放器进程名 → 解析规则
-# 格式: (regex, source_tag)
+# 格式: (regex, source_tag)；regex 中的 paused 分组匹配到内容时表示暂停
 # cloudmusic 标题两种格式：
 #   "曲名 - 歌手 - 网易云音乐"（暂停时）
 #   "曲名 - 歌手"              （播放时）
 _PLAYER_RULES = {
-    'cloudmusic': (_re.compile(r'^(.+?)\s*-\s*(.+?)(?:\s*-\s*网易云音乐)?$'), 'netease'),
+    'cloudmusic': (_re.compile(r'^(.+?)\s*-\s*(.+?)(?:\s*-\s*(?P<paused>网易云音乐))?$'), 'netease'),
     'wmsxwd':     (_re.compile(r'^(.+?)\s*[-–]\s*(.+)'),                       'wmsxwd'),
     'qqmusic':    (_re.compile(r'^(.+?)\s*-\s*(.+?)(?:\s*-\s*QQ音乐)?$'),      'qqmusic'),
     'kugou':      (_re.compile(r'^(.+?)\s*-\s*(.+?)(?:\s*-\s*酷狗.*)?$'),      'kugou'),
@@ -138,71 +44,39 @@ _PLAYER_RULES = {
 _TITLE_BLACKLIST = {'网易云音乐', 'QQ音乐', '酷狗音乐', '桌面歌词', 'wmsxwd', ''}
 
 def _get_info_from_window_title():
-    """枚举所有窗口，匹配已知播放器进程，解析标题"""
-    import ctypes as _ct
-    EnumWindows      = _ct.windll.user32.EnumWindows
-    GetWindowText    = _ct.windll.user32.GetWindowTextW
-    GetWindowTextLen = _ct.windll.user32.GetWindowTextLengthW
-    IsWindowVisible  = _ct.windll.user32.IsWindowVisible
-    GetWindowThreadProcessId = _ct.windll.user32.GetWindowThreadProcessId
-
-    results = []
-
-    @_ct.WINFUNCTYPE(_ct.c_bool, _ct.c_void_p, _ct.c_long)
-    def callback(hwnd, _):
-        if not IsWindowVisible(hwnd):
-            return True
-        length = GetWindowTextLen(hwnd)
-        if length == 0:
-            return True
-        buf = _ct.create_unicode_buffer(length + 1)
-        GetWindowText(hwnd, buf, length + 1)
-        title = buf.value.strip()
-        if not title:
-            return True
-
-        # 获取 PID → 进程名
-        pid = _ct.c_ulong()
-        GetWindowThreadProcessId(hwnd, _ct.byref(pid))
-        try:
-            proc = psutil.Process(pid.value)
-            pname = proc.name().lower().replace('.exe', '')
-        except Exception:
-            return True
-
+    """在可见窗口中匹配已知播放器进程，解析标题"""
+    for title, pname in services.windows.visible_windows():
         for key, (pat, src) in _PLAYER_RULES.items():
             if key in pname:
                 if title in _TITLE_BLACKLIST:
-                    return True
+                    break
                 m = pat.match(title)
                 if m:
-                    results.append({
+                    # 找到一个就停止，避免 generic 规则重复匹配
+                    return {
                         'title':  m.group(1).strip(),
                         'artist': m.group(2).strip(),
                         'source': src,
                         'raw':    title,
-                    })
-                    return True   # 找到一个就停止，避免 generic 规则重复匹配
-        return True
+                        'paused': bool(m.groupdict().get('paused')),
+                    }
+    return None
 
-    EnumWindows(callback, 0)
-    return results[0] if results else None
 
-
-try:
-    import psutil
-except ImportError:
-    print("Installing psutil...")
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "psutil"])
-    import psutil
 from datetime import datetime
 
-# PyQt Imports for Integrated GUI Support
-from PyQt6.QtWidgets import QApplication, QFileDialog
-from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
-from memo_gui import MemoWindow
-from goals_gui import GoalsWindow
-from pomo_gui import PomodoroSettingsWindow
+from memo_index import MemoIndex, SORT_FIELDS, STATUS_VALUES, encode_cursor, decode_cursor
+from change_log import ChangeLog
+from memo_ops import MemoBatch, MemoNotFound
+from due_dates import normalize_memos, parse_bound
+from reminders import (ReminderQueue, SnoozeStore, advance, due_timestamp, escalation_delay,
+                       escalation_options, fire_timestamp)
+from ndjson_io import iter_export_lines, parse_record, apply_records
+from merge_patch import merge_patch, changed_keys
+from http_cache import conditional, matching_etag, version_tag
+import compression
+from wsgi_server import make_server
+from config_store import ConfigStore, MISSING, SECTIONS, SECTION_KEYS, merge_sections, split_sections
 
 # ================= Configuration =================
 PORT = 35678
@@ -224,240 +98,107 @@ DEFAULT_CONFIG = {
 }
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+CORS(app, expose_headers=['ETag', 'X-Media-Clock'], max_age=600)  # Enable CORS for all routes; cache preflights for If-None-Match / If-Match
 
+# 请求耗时按路由 / 方法 / 状态码记录；在压缩钩子之前注册，所以包含压缩时间
+REQUEST_SECONDS = metrics.histogram('http_request_duration_seconds', 'Request handling time by route and status')
 
-# ================= GUI Manager (Bridge) =================
-class GuiManager(QObject):
-    # Signals to Main Thread
-    open_editor_signal = pyqtSignal(dict)
-    pick_file_signal = pyqtSignal()
-    open_goals_signal = pyqtSignal(list)
-    open_pomodoro_signal = pyqtSignal(dict)
-
-    def __init__(self):
-        super().__init__()
-        self.active_window = None
-        self.goals_window = None
-        self.pomodoro_window = None
-        # State tracking: keys 'memo', 'goals', 'pomodoro' -> value: boolean (is_open)
-        self.status = {'memo': False, 'goals': False, 'pomodoro': False}
-        self.file_picker_result = None
-        self.file_picker_event = threading.Event()
-        
-        # Connect signals
-        self.open_editor_signal.connect(self.show_editor_slot)
-        self.pick_file_signal.connect(self.show_file_picker_slot)
-        self.open_goals_signal.connect(self.show_goals_editor_slot)
-        self.open_pomodoro_signal.connect(self.show_pomodoro_slot)
-
-    @pyqtSlot(dict)
-    def show_editor_slot(self, data):
-        self.status['memo'] = True
-        
-        def on_save(memo_data):
-            self.update_memo(memo_data)
-        def on_delete(memo_id):
-            self.delete_memo_internal(memo_id)
-
-        if self.active_window:
-            self.active_window.close()
-            
-        self.active_window = MemoWindow(data, on_save, on_delete)
-        
-        # Detect Close
-        original_close = self.active_window.closeEvent
-        def wrapped_close(event):
-            self.status['memo'] = False # Mark closed
-            if original_close: original_close(event)
-            else: event.accept()
-        self.active_window.closeEvent = wrapped_close
-        
-        self.active_window.show()
-        self.active_window.activateWindow()
-        self.active_window.raise_()
+@app.before_request
+def _start_request_timer():
+    g.request_t0 = time.perf_counter()
 
-    @pyqtSlot(list)
-    def show_goals_editor_slot(self, items):
-        self.status['goals'] = True
-        
-        def on_save(new_items):
-             print(f"Goals Saved: {len(new_items)}")
-             self.update_goals_internal(new_items)
-
-        if self.goals_window:
-            self.goals_window.close()
-            
-        self.goals_window = GoalsWindow(items, on_save)
-        
-        # Monkey patch
-        original_close = self.goals_window.closeEvent
-        def wrapped_close(event):
-            print("Goals Window Closing...")
-            # Auto-save
-            if hasattr(self.goals_window, 'items'):
-                on_save(self.goals_window.items)
-            
-            self.status['goals'] = False # Mark closed
-            
-            if original_close: original_close(event)
-            else: event.accept()
-        self.goals_window.closeEvent = wrapped_close
-        
-        self.goals_window.show()
-        self.goals_window.activateWindow()
-        self.goals_window.raise_()
+@app.after_request
+def _observe_request(resp):
+    t0 = g.get('request_t0')
+    if t0 is not None:
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        REQUEST_SECONDS.observe(time.perf_counter() - t0, route=route, method=request.method, status=resp.status_code)
+    return resp
 
-    @pyqtSlot(dict)
-    def show_pomodoro_slot(self, config_data):
-        self.status['pomodoro'] = True
-        
-        def on_save(new_config):
-            self.update_pomodoro_internal(new_config)
-
-        if self.pomodoro_window:
-            self.pomodoro_window.close()
-            
-        self.pomodoro_window = PomodoroSettingsWindow(config_data, on_save)
-        
-        # Monkey patch close event
-        original_close = self.pomodoro_window.closeEvent
-        def wrapped_close(event):
-            self.status['pomodoro'] = False
-            if original_close: original_close(event)
-            else: event.accept()
-        self.pomodoro_window.closeEvent = wrapped_close
-        
-        self.pomodoro_window.show()
-        self.pomodoro_window.activateWindow()
-        self.pomodoro_window.raise_()
-
-    @pyqtSlot()
-    def show_file_picker_slot(self):
-        filename, _ = QFileDialog.getOpenFileName(None, "Select File", "", "All Files (*)")
-        self.file_picker_result = filename
-        self.file_picker_event.set()
-
-    # --- Logic Helpers ---
-    def update_memo(self, data):
-        config = load_config()
-        memos = config.get("memos", [])
-        
-        if not data.get("id"):
-            new_id = int(time.time() * 1000)
-            data["id"] = new_id
-            memos.append(data)
-        else:
-            found = False
-            for i, m in enumerate(memos):
-                if m.get("id") == data.get("id"):
-                    memos[i] = data
-                    found = True
-                    break
-            if not found:
-                memos.append(data)
-                
-        config["memos"] = memos
-        save_config(config)
-        print(f"Memo saved: {data.get('id')}")
-
-    def delete_memo_internal(self, memo_id):
-        config = load_config()
-        memos = config.get("memos", [])
-        config["memos"] = [m for m in memos if m.get("id") != memo_id]
-        save_config(config)
-        print(f"Memo deleted: {memo_id}")
-
-    def update_goals_internal(self, items):
-        config = load_config()
-        if "dailyGoals" not in config or not isinstance(config["dailyGoals"], dict):
-             # Initialize with today's date to prevent frontend wipe
-             today_str = datetime.now().strftime("%Y-%m-%d")
-             config["dailyGoals"] = {"date": today_str, "items": []}
-        
-        # Ensure we don't save a broken structure that frontend wipes
-        if not config["dailyGoals"].get("date"):
-             config["dailyGoals"]["date"] = datetime.now().strftime("%Y-%m-%d")
-
-        print(f"DEBUG: Saving {len(items)} items to config.")
-        config["dailyGoals"]["items"] = items
-        save_config(config)
-
-    def update_pomodoro_internal(self, new_config):
-        config = load_config()
-        config["pomodoroConfig"] = new_config
-        save_config(config)
-        print("Pomodoro settings saved")
+# gzip / deflate / br 压缩；这些接口的压缩结果按 ETag 缓存
+compression.init_app(app, cached_routes=('/config', '/media/status', '/media/watch'))
 
 
+# ================= GUI Manager (Bridge) =================
+# GuiManager 在 gui_manager.py，只在非 headless 模式下创建
 # Global instance
 gui_manager = None
+http_server = None
 
 
 # ================= System Utilities =================
+# ── 内存状态：备忘录索引 + 变更日志 ─────────────────────────────
+# 配置由 config_store 按分区缓存，每次提交（或外部修改后重新加载）
+# 通过 _on_sections_changed 同步进索引。每次 memos / dailyGoals 变化
+# 都会在 _change_log 中分配一个新版本号，供增量同步使用；
+# 其余分区（apps / pomodoroConfig / 标量设置）的变化同样计入版本号，
+# 因此 _change_log.version 可以作为整个配置的版本。
+# 变化的备忘录同时重新挂进 _reminders（按到期时间排序的提醒队列），
+# 推迟 / 催办状态在分区目录下的 reminders.log（见 reminders.SnoozeStore）。
+_memo_index = MemoIndex()
+_change_log = ChangeLog()
+_reminders = ReminderQueue()
+_escalation = escalation_options(None)
+_section_snapshots = {}
+_state_lock = threading.Lock()
+
+_SECTION_KEYS = ('dailyGoals', 'apps', 'pomodoroConfig')
+
+def _sync_snoozes():
+    """推迟状态跟随配置目录（切换配置文件时换成新目录下的 reminders.log）"""
+    path = os.path.join(config_store.dir, 'reminders.log')
+    if _reminders.snoozes is None or _reminders.snoozes.path != path:
+        _reminders.snoozes = SnoozeStore(path)
+    return _reminders.snoozes
+
+def _on_sections_changed(changed):
+    """把变化的分区同步进索引，并为每个变化的分区记录新版本"""
+    with _state_lock:
+        if 'memos' in changed:
+            memos = changed['memos']
+            upserted, deleted = _memo_index.apply(memos if isinstance(memos, list) else [])
+            if upserted or deleted:
+                _change_log.record('memos', upserted, deleted)
+                changed_memos = [_memo_index.get(memo_id) for memo_id in upserted]
+                snoozes = _sync_snoozes()
+                # 删除或完成的备忘录不再推迟 / 催办
+                snoozes.discard(*[memo_id for memo_id in deleted if memo_id in snoozes],
+                                *[m['id'] for m in changed_memos if m.get('done') and m['id'] in snoozes])
+                _reminders.update(changed_memos, deleted)
+        for section, value in changed.items():
+            if section == 'memos':
+                continue
+            value = None if value is MISSING else value
+            if value != _section_snapshots.get(section, ...):
+                _section_snapshots[section] = json.loads(json.dumps(value))
+                _change_log.record(section)
+    # 直方图指标跟随 debug 开关（包括手改配置文件的情况）
+    if 'settings' in changed:
+        metrics.set_enabled((changed['settings'] or {}).get('debug', False))
+
+# 导入时不打开配置文件（导入 server 的基准测试和工具不应读取或迁移真正的 user_config.json）；
+# __main__ 中按 --config / --storage 打开，harness.load_server 打开临时配置
+config_store = ConfigStore(DEFAULT_CONFIG, listener=_on_sections_changed)
 
 def load_config():
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading config: {e}")
-            return DEFAULT_CONFIG
-    return DEFAULT_CONFIG
+    """合并后的配置。嵌套的值与缓存共享，修改请用 config_store.transaction()"""
+    return config_store.load()
 
-def save_config(data):
-    try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-        return True
-    except Exception as e:
-        print(f"Error saving config: {e}")
-        return False
-
-def set_autostart(enable):
-    key_path = r"Software\Microsoft\Windows\CurrentVersion\Run"
-    app_name = "LiquidWallpaperBackend"
-    exe_path = sys.executable
-    
-    try:
-        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path, 0, winreg.KEY_ALL_ACCESS)
-        if enable:
-            winreg.SetValueEx(key, app_name, 0, winreg.REG_SZ, exe_path)
-            print("Auto-start enabled")
-        else:
-            try:
-                winreg.DeleteValue(key, app_name)
-                print("Auto-start disabled")
-            except FileNotFoundError:
-                pass 
-        winreg.CloseKey(key)
-    except Exception as e:
-        print(f"Registry error: {e}")
-
-# ── 媒体控制：使用 keybd_event API ───────────────────────────────
-VK_MEDIA_PLAY_PAUSE = 0xB3
-VK_MEDIA_NEXT_TRACK = 0xB0
-VK_MEDIA_PREV_TRACK = 0xB1
-KEYEVENTF_EXTENDEDKEY = 0x0001
-KEYEVENTF_KEYUP       = 0x0002
-
-_user32 = ctypes.windll.user32
-
-def send_media_key(vk):
-    """用 keybd_event 发送媒体键（简单可靠）"""
-    try:
-        # Press
-        _user32.keybd_event(vk, 0, KEYEVENTF_EXTENDEDKEY, 0)
-        # Release
-        _user32.keybd_event(vk, 0, KEYEVENTF_EXTENDEDKEY | KEYEVENTF_KEYUP, 0)
-        return True
-    except Exception as e:
-        print(f"[MEDIA] keybd_event 失败: {e}")
-        return False
+def _refresh_state():
+    config_store.refresh()
 
+def get_memo_index():
+    """返回与磁盘一致的备忘录索引"""
+    _refresh_state()
+    return _memo_index
 
+def config_etag():
+    """整个配置的版本标签（epoch.version），用于 ETag / If-Match"""
+    _refresh_state()
+    return f"{_change_log.epoch}.{_change_log.version}"
 
+def set_autostart(enable):
+    services.autostart.set_enabled(enable)
 
 # ================= Routes =================
 
@@ -474,75 +215,151 @@ def proxy_image():
         
     return send_file(path, mimetype=mime_type)
 
+# 只在对应键真正变化时才执行的副作用（例如写注册表）
+_CONFIG_SIDE_EFFECTS = {
+    'autoStart': lambda config: set_autostart(config.get('autoStart', False)),
+}
+
+def _run_config_side_effects(before, after):
+    for key in changed_keys(before, after) & _CONFIG_SIDE_EFFECTS.keys():
+        _CONFIG_SIDE_EFFECTS[key](after)
+
+def _if_match_ok(sections=None):
+    """
+    If-Match 校验：与当前版本一致；或者给了 sections 时，同一 epoch 内这些分区在该版本之后
+    都没有变化（分区版本与全局版本共用一个计数）。只改 dailyGoals 的 PATCH 不会因为
+    期间的备忘录写入（勾选、提醒触发、编辑窗口保存）而 412。
+    """
+    if not request.if_match or matching_etag(request.if_match, config_etag()):
+        return True
+    if sections is None:
+        return False
+    for tag in request.if_match:
+        epoch, _, version = version_tag(tag).rpartition('.')
+        if (epoch == _change_log.epoch and version.isdigit() and int(version) <= _change_log.version
+                and all(_change_log.section_version(s) <= int(version) for s in sections)):
+            return True
+    return False
+
+def _precondition_failed():
+    resp = jsonify({"error": "Config was modified by another client", "version": config_etag()})
+    resp.status_code = 412
+    resp.set_etag(config_etag())
+    return resp
+
 @app.route('/config', methods=['GET'])
 def get_config():
-    return jsonify(load_config())
+    return conditional('/config', config_etag(), lambda: jsonify(load_config()))
 
 @app.route('/config', methods=['POST'])
 def update_config():
     data = request.json
-    save_config(data)
-    # Handle autostart logic
-    set_autostart(data.get('autoStart', False))
-    return jsonify({"success": True})
+    with config_store.transaction(snapshot='POST /config', undo='POST /config') as txn:
+        if not _if_match_ok():
+            txn.abort()
+            return _precondition_failed()
+        if isinstance(data, dict) and 'memos' in data:
+            data = {**data, "memos": normalize_memos(data['memos'])}
+        before, txn.value = txn.value, data
+        _run_config_side_effects(before, data)
+    etag = config_etag()
+    resp = jsonify({"success": True, "version": etag})
+    resp.set_etag(etag)
+    return resp
+
+@app.route('/config', methods=['PATCH'])
+def patch_config():
+    """
+    RFC 7386 merge patch：只提交变化的键，null 表示删除。
+    带 If-Match 时，版本不一致返回 412，避免覆盖其他窗口刚保存的数据。
+    """
+    patch = request.get_json(silent=True)
+    if not isinstance(patch, dict):
+        return jsonify({"error": "Patch body must be a JSON object"}), 400
+
+    # 只改标量设置时只锁 settings 分区，不必等待备忘录等其他分区的写入
+    settings_only = not any(key in SECTION_KEYS for key in patch)
+    with config_store.transaction('settings' if settings_only else None, undo='PATCH /config') as txn:
+        # 只要求补丁涉及的分区没有被别人改过
+        if not _if_match_ok({key if key in SECTION_KEYS else 'settings' for key in patch}):
+            txn.abort()
+            return _precondition_failed()
+        before = txn.value
+        after = merge_patch(before, patch)
+        if isinstance(patch.get('memos'), list):
+            after['memos'] = normalize_memos(after['memos'])
+        changed = changed_keys(before, after)
+        txn.value = after
+        if changed:
+            _run_config_side_effects(before, after)
+    etag = config_etag()
+    resp = jsonify({"success": True, "version": etag, "changed": sorted(changed)})
+    resp.set_etag(etag)
+    return resp
+
+WINDOW_SCAN_SECONDS = metrics.histogram('window_scan_duration_seconds', 'Window title enumeration time')
+
+def sample_window_media():
+    """
+    窗口标题回退（后台任务，每秒一次）：媒体会话不可用时扫描窗口标题，
+    换曲 / 暂停的判断和进度推算在 services.media 里完成，与客户端数量无关。
+    """
+    if not services.media.needs_fallback():
+        return
+    with WINDOW_SCAN_SECONDS.time():
+        info = _get_info_from_window_title()
+    services.media.publish_fallback(info)
+
+def current_media():
+    """当前媒体快照：优先媒体会话（SMTC），回退到窗口标题解析。返回 (version, etag, payload)"""
+    version, payload = services.media.snapshot()
+    return version, f"{_change_log.epoch}.media{version}", payload
+
+def _media_response(etag, payload):
+    resp = conditional(request.path, etag, lambda: jsonify(payload))
+    # 快照里的 sampledAt 与这个时刻同属服务端 time.monotonic()，客户端据此外推进度
+    resp.headers['X-Media-Clock'] = f"{time.monotonic():.3f}"
+    return resp
 
 @app.route('/media/status', methods=['GET'])
 def media_status():
-    """返回当前系统媒体信息：优先 SMTC，回退到窗口标题解析"""
-    # ── 1. 尝试 SMTC（winsdk 后台缓存） ──────────────────
-    if WINSDK_OK:
-        with _smtc_lock:
-            cached = dict(_smtc_cache)
-        if 'error' not in cached:
-            cached['source'] = 'smtc'
-            return jsonify(cached)
-
-    # ── 2. 回退：窗口标题解析 ─────────────────────────────
-    info = _get_info_from_window_title()
-    if info:
-        info['source']    = info.get('source', 'window_title')
-        info['state']     = 'playing'
-        info['stateCode'] = 4
-        info['thumbnail'] = None
-        # 用本地计时器估算进度（曲名变化时服务端重置计时）
-        title_key = info.get('title', '')
-        now = time.time()
-        if not hasattr(media_status, '_wt_title') or media_status._wt_title != title_key:
-            media_status._wt_title   = title_key
-            media_status._wt_start   = now
-        elapsed = now - media_status._wt_start
-        info['position'] = round(elapsed, 2)
-        info['duration'] = 0.0   # 窗口标题无法得知总时长
-        return jsonify(info)
-
-    # ── 3. 均无数据 ────────────────────────────────────────
-    smtc_err = _smtc_cache.get('error', 'smtc not available') if WINSDK_OK else 'winsdk not installed'
-    return jsonify({'error': f'no media found (smtc: {smtc_err}, window: no match)'})
+    """
+    返回当前系统媒体快照：title / artist / state / position / duration / playbackRate /
+    sampledAt 等，快照在换曲、暂停、拖动进度时才变化（ETag 随之变化），其余时间由客户端外推进度
+    """
+    _, etag, payload = current_media()
+    return _media_response(etag, payload)
+
+_MEDIA_WAIT_MAX = 55
+
+@app.route('/media/watch', methods=['GET'])
+def media_watch():
+    """
+    媒体快照长轮询（在 http-long 池中执行）：If-None-Match 是当前版本时阻塞到快照变化
+    或 timeout 秒，之后与 /media/status 相同（没有变化时回 304）
+    """
+    timeout = min(max(request.args.get('timeout', 25, type=float), 0), _MEDIA_WAIT_MAX)
+    version, etag, _ = current_media()
+    if matching_etag(request.if_none_match, etag):
+        services.media.wait(version, timeout)
+    _, etag, payload = current_media()
+    return _media_response(etag, payload)
 
 
 @app.route('/media/debug', methods=['GET'])
 def media_debug():
-    """诊断接口：返回 SMTC 缓存 + 窗口标题扫描结果"""
+    """诊断接口：返回媒体会话缓存 + 窗口标题扫描结果"""
     info = _get_info_from_window_title()
     return jsonify({
-        'smtc_cache':    _smtc_cache if WINSDK_OK else 'winsdk not installed',
+        'platform':      services.name,
+        'smtc_cache':    services.media.snapshot()[1],
         'window_title':  info,
     })
 
 
-_ACTION_VK = {
-    'play':  VK_MEDIA_PLAY_PAUSE,
-    'next':  VK_MEDIA_NEXT_TRACK,
-    'prev':  VK_MEDIA_PREV_TRACK,
-}
-
 @app.route('/media/<action>', methods=['GET'])
 def media_control(action):
-    vk = _ACTION_VK.get(action)
-    if vk:
-        send_media_key(vk)
-        print(f'[MEDIA] keybd_event vk=0x{vk:02X} action={action}')
-    else:
+    if not services.media_keys.send(action):
         print(f'[MEDIA] unknown action: {action}')
     return jsonify({'success': True, 'action': action})
 
@@ -571,140 +388,508 @@ def launch_app():
 
 @app.route('/system/pick-file', methods=['GET'])
 def pick_file():
-    global gui_manager
-    if not gui_manager:
+    if not services.file_picker.available:
         return jsonify({"error": "GUI not initialized"}), 500
-        
-    # Reset event
-    gui_manager.file_picker_event.clear()
-    gui_manager.pick_file_signal.emit() # Signal main thread
-    
-    # Wait for result
-    gui_manager.file_picker_event.wait()
-    
-    path = gui_manager.file_picker_result
+
+    # 阻塞到用户选择完成（长请求，由 wsgi_server 的长连接池处理）
+    path = services.file_picker.pick_file()
     return jsonify({"path": path})
 
 # ================= Stats API =================
+# 同一秒内的请求共用一次采样；采样值变化时 seq 递增，作为 ETag
+_STATS_TTL = 1.0
+_stats_sample = {'seq': 0, 'time': float('-inf'), 'data': {"cpu": 0, "ram": 0}}
+_stats_lock = threading.Lock()
+_psutil = None
+
+def _get_psutil():
+    """第一次采样时才导入 psutil；未安装时返回 None（不再在启动时自动 pip install）"""
+    global _psutil
+    if _psutil is None:
+        try:
+            import psutil
+            _psutil = psutil
+        except ImportError:
+            print("[WARN] psutil not installed; run: pip install psutil")
+            _psutil = False
+    return _psutil or None
+
+def sample_stats():
+    with _stats_lock:
+        now = time.monotonic()
+        if now - _stats_sample['time'] >= _STATS_TTL:
+            psutil = _get_psutil()
+            try:
+                data = {"cpu": psutil.cpu_percent(interval=None), "ram": psutil.virtual_memory().percent}
+            except Exception:
+                data = {"cpu": 0, "ram": 0}
+            if data != _stats_sample['data']:
+                _stats_sample['seq'] += 1
+                _stats_sample['data'] = data
+            _stats_sample['time'] = now
+        return _stats_sample['seq'], _stats_sample['data']
+
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
-    try:
-        cpu = psutil.cpu_percent(interval=None)
-        mem = psutil.virtual_memory().percent
-        return jsonify({"cpu": cpu, "ram": mem})
-    except Exception as e:
-        return jsonify({"cpu": 0, "ram": 0})
+    seq, data = sample_stats()
+    return conditional('/api/stats', f"{_change_log.epoch}.s{seq}", lambda: jsonify(data))
+
+@app.route('/api/system/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify(metrics.snapshot())
+
+@app.route('/api/system/tasks', methods=['GET'])
+def get_tasks():
+    """后台任务：状态、执行次数、上次执行时间和耗时、下次执行时间、失败次数"""
+    return jsonify(scheduler.tasks())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus 文本格式；直方图只在 debug 打开时记录"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+def _thread_counts():
+    # 按线程名前缀分组（http-3 -> http），未命名的线程归为 Thread
+    groups = {}
+    for t in threading.enumerate():
+        name = _re.sub(r'[-_ ]?\d+(?: \(.*\))?$', '', t.name) or 'Thread'
+        groups[name] = groups.get(name, 0) + 1
+    return [({"group": name}, n) for name, n in sorted(groups.items())]
+
+metrics.gauge('process_threads', 'Live threads grouped by name prefix', _thread_counts)
+
+# ================= Bootstrap API =================
+_DEFAULT_POMODORO = {"work": 25, "rest": 5, "presets": []}
+
+@app.route('/api/bootstrap', methods=['GET'])
+def bootstrap():
+    """
+    壁纸启动时一次性获取首屏所需的全部数据，全部来自内存状态：
+    config（不含 memos）、memos 全量快照（可直接作为增量同步起点）、
+    dailyGoals、pomodoroConfig、最新一次 stats 采样、媒体快照，
+    以及各轮询接口的 ETag，前端据此让后续轮询直接命中 304。
+    """
+    _refresh_state()
+    _, media_etag, media = current_media()
+    stats_seq, stats = sample_stats()
+    with _state_lock:
+        config = dict(_section_snapshots.get('settings') or {})
+        for key in _SECTION_KEYS:
+            if _section_snapshots.get(key) is not None:
+                config[key] = _section_snapshots[key]
+        epoch, version = _change_log.epoch, _change_log.version
+        memos = {"full": True, "version": version, "epoch": epoch, "memos": _memo_index.all()}
+        etags = {
+            "config": f'"{epoch}.{version}"',
+            "memos": f'"{epoch}.m{_change_log.section_version("memos")}"',
+            "stats": f'"{epoch}.s{stats_seq}"',
+            "media": f'"{media_etag}"',
+        }
+        return jsonify({
+            "config": config,
+            "memos": memos,
+            "dailyGoals": config.get("dailyGoals") or {"date": "", "items": []},
+            "pomodoroConfig": config.get("pomodoroConfig") or _DEFAULT_POMODORO,
+            "stats": stats,
+            "media": media,
+            "mediaClock": round(time.monotonic(), 3),
+            "etags": etags,
+        })
 
 # ================= Memos API =================
+_MEMO_QUERY_KEYS = ('status', 'due_before', 'sort', 'limit', 'after')
+_MEMO_PAGE_MAX = 500
+
+def memos_etag():
+    _refresh_state()
+    return f"{_change_log.epoch}.m{_change_log.section_version('memos')}"
+
+def _query_tag(args):
+    """查询参数（排序后）的短摘要：同一版本下不同的页 / 筛选是不同的表示，ETag 不能相同"""
+    query = urlencode(sorted(args.items(multi=True)))
+    return hashlib.blake2b(query.encode('utf-8'), digest_size=6).hexdigest()
+
 @app.route('/api/memos', methods=['GET'])
 def get_memos():
-    config = load_config()
-    return jsonify(config.get("memos", []))
+    """
+    ETag：全量和 since 增量只用备忘录版本（客户端带着当前版本的 ETag 说明它已经是最新的，
+    增量为空，回 304）；分页 / 筛选再加上查询参数的摘要，每一页、每种筛选各自验证。
+    """
+    etag = memos_etag()
+    if any(k in request.args for k in _MEMO_QUERY_KEYS) and 'since' not in request.args:
+        etag = f"{etag}.{_query_tag(request.args)}"
+    return conditional('/api/memos', etag, _memos_response)
+
+def _memos_response():
+    """
+    无参数时返回完整数组（兼容旧前端）。
+    带 status / due_before（epoch 秒或本机时区的 ISO 时间）/ sort / limit / after 任一参数时返回分页对象：
+        {"items": [...], "nextCursor": "..." | null}
+    sort 支持 id / dueDate，前缀 '-' 表示倒序。
+    带 since=<version>（可选 epoch）时返回增量，见 _memo_delta。
+    """
+    args = request.args
+    if 'since' in args:
+        return _memo_delta(args)
+    if not any(k in args for k in _MEMO_QUERY_KEYS):
+        return jsonify(get_memo_index().all())
+
+    sort = args.get('sort', 'id')
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    status = args.get('status', 'all')
+    if sort not in SORT_FIELDS or status not in STATUS_VALUES:
+        return jsonify({"error": "invalid sort or status"}), 400
+    try:
+        limit = max(1, min(int(args.get('limit', 50)), _MEMO_PAGE_MAX))
+        after = decode_cursor(args['after'], sort) if args.get('after') else None
+        due_before = parse_bound(args['due_before']) if args.get('due_before') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    index = get_memo_index()
+    with _state_lock:
+        items, next_key = index.query(status=status, sort=sort, descending=descending,
+                                      due_before=due_before,
+                                      limit=limit, after=after)
+        return jsonify({
+            "items": items,
+            "nextCursor": encode_cursor(next_key) if next_key else None,
+        })
+
+def _memo_delta(args):
+    """
+    增量同步：返回 since 之后被修改 / 删除的备忘录。
+    日志无法覆盖（客户端落后太多、服务端已重启、since<0）时回退全量：
+        {"full": true,  "version": v, "epoch": e, "memos": [...]}
+        {"full": false, "version": v, "epoch": e, "upserts": [...], "deletes": [...]}
+    """
+    try:
+        since = int(args.get('since'))
+    except (TypeError, ValueError):
+        return jsonify({"error": "since must be an integer"}), 400
+
+    index = get_memo_index()
+    with _state_lock:
+        head = {"version": _change_log.version, "epoch": _change_log.epoch}
+        delta = _change_log.since(since, 'memos', args.get('epoch')) if since >= 0 else None
+        if delta is None:
+            return jsonify({**head, "full": True, "memos": index.all()})
+        upserted, deleted = delta
+        upserts = []
+        for memo_id in upserted:
+            memo = index.get(memo_id)
+            if memo is None:
+                deleted.add(memo_id)
+            else:
+                upserts.append(memo)
+        return jsonify({**head, "full": False, "upserts": upserts, "deletes": list(deleted)})
+
+@app.route('/api/memos/<int:memo_id>', methods=['GET'])
+def get_memo(memo_id):
+    def build():
+        index = get_memo_index()
+        with _state_lock:
+            memo = index.get(memo_id)
+            if memo is None:
+                return jsonify({"error": "Memo not found"}), 404
+            return jsonify(memo)
+    return conditional('/api/memos/<id>', memos_etag(), build)
+
+@app.route('/api/memos/<int:memo_id>', methods=['PATCH'])
+def patch_memo(memo_id):
+    """单字段修改（例如勾选 done），不必回传整条列表"""
+    changes = request.json or {}
+    if not isinstance(changes, dict):
+        return jsonify({"error": "Patch body must be an object"}), 400
+
+    with config_store.transaction('memos', undo=f'edit memo {memo_id}') as txn:
+        batch = MemoBatch(txn.value or [])
+        try:
+            updated = batch.patch(memo_id, changes)
+        except MemoNotFound:
+            txn.abort()
+            return jsonify({"error": "Memo not found"}), 404
+        except ValueError as e:
+            txn.abort()
+            return jsonify({"error": str(e)}), 400
+        txn.value = batch.memos()
+    return jsonify({"success": True, "memo": updated})
 
 @app.route('/api/memos', methods=['POST'])
 def save_memo():
     data = request.json
+    with config_store.transaction('memos', undo=f'save memo {data.get("id", "")}'.rstrip()) as txn:
+        # If ddl changed or reminder enabled, reset shown flag (see merge_reminder_state)
+        batch = MemoBatch(txn.value or [])
+        try:
+            batch.upsert(data)
+        except ValueError as e:
+            txn.abort()
+            return jsonify({"error": str(e)}), 400
+        txn.value = batch.memos()
+    return jsonify({"success": True, "memos": txn.value})
+
+_MEMO_BATCH_MAX = 10000
+
+@app.route('/api/memos/batch', methods=['POST'])
+def batch_memos():
+    """
+    批量修改：{"ops": [{"op": "upsert"|"patch"|"delete", ...}, ...]}
+    全部操作在同一把锁内应用到内存列表，只读写一次配置文件。
+    单个操作失败不影响其他操作，结果按顺序返回。
+    """
+    ops = (request.json or {}).get("ops")
+    if not isinstance(ops, list):
+        return jsonify({"error": "ops must be a list"}), 400
+    if len(ops) > _MEMO_BATCH_MAX:
+        return jsonify({"error": f"too many ops (max {_MEMO_BATCH_MAX})"}), 413
+
+    with config_store.transaction('memos', undo=f'batch ({len(ops)} ops)') as txn:
+        batch = MemoBatch(txn.value or [])
+        results = [batch.apply(op) for op in ops]
+        if batch.changed:
+            txn.value = batch.memos()
+    return jsonify({
+        "success": all(r["ok"] for r in results),
+        "results": results,
+        "version": _change_log.version,
+    })
+
+# ================= Import / Export (NDJSON) =================
+_IMPORT_BATCH_SIZE = 500
+_IMPORT_MAX_ERRORS = 1000
+
+@app.route('/api/export', methods=['GET'])
+def export_data():
+    """逐行流式导出 memos / goals / 番茄钟预设 / apps，格式见 ndjson_io"""
     config = load_config()
-    memos = config.get("memos", [])
-    
-    # Clean incoming data to ensure flags exist
-    # If ddl changed or reminder enabled, reset shown flag
-    
-    memo_id = data.get("id")
-    current_time_ms = int(time.time() * 1000)
-    
-    if not memo_id:
-        # NEW MEMO
-        memo_id = current_time_ms
-        data['id'] = memo_id
-        # Init reset flag
-        data['reminderShown'] = False
-        memos.append(data)
-    else:
-        # Update existing
-        found = False
-        for i, m in enumerate(memos):
-            if m.get("id") == memo_id:
-                # Check if crucial fields changed to reset reminder
-                old_date = m.get("dueDate")
-                new_date = data.get("dueDate")
-                
-                # Check logic: If user pushes date forward, or re-enables reminder, reset
-                if (new_date != old_date) or (data.get("enableReminder") and not m.get("enableReminder")):
-                    data['reminderShown'] = False
-                else:
-                    # Keep existing state if not provided in payload (though typical logic sends all)
-                    # Use existing state if not explicitly reset above
-                    data['reminderShown'] = m.get('reminderShown', False)
-                
-                memos[i] = data
-                found = True
-                break
-        if not found:
-            data['reminderShown'] = False
-            memos.append(data)
-            
-    config["memos"] = memos
-    save_config(config)
-    return jsonify({"success": True, "memos": memos})
-
-# ================= Background Reminder Thread =================
-def reminder_worker():
-    print("Background Reminder Worker Started")
-    while True:
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return Response(iter_export_lines(config), mimetype='application/x-ndjson', headers={
+        "Content-Disposition": f'attachment; filename="roselia-backup-{stamp}.ndjson"',
+    })
+
+@app.route('/api/import', methods=['POST'])
+def import_data():
+    """
+    逐行读取上传的 NDJSON，校验每条记录，每 _IMPORT_BATCH_SIZE 条提交一次。
+    ?dry_run=1 时只校验并在内存副本上模拟合并，不写文件。
+    返回 {"dryRun", "lines", "applied", "skipped", "commits", "errorCount",
+          "errors": [{"line", "error"}]}（errors 最多保留 _IMPORT_MAX_ERRORS 条）
+    """
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    report = {"dryRun": dry_run, "lines": 0, "applied": 0, "skipped": 0, "commits": 0,
+              "errorCount": 0, "errors": []}
+    pending = []
+    scratch = json.loads(json.dumps(load_config())) if dry_run else None
+
+    def commit():
+        if not pending:
+            return
+        if dry_run:
+            counts = apply_records(scratch, pending)
+        else:
+            with config_store.transaction(snapshot='import') as txn:
+                # apply_records 原地修改 goals / pomodoro 的嵌套结构，先复制一份
+                for key in ('dailyGoals', 'pomodoroConfig'):
+                    if isinstance(txn.value.get(key), dict):
+                        txn.value[key] = json.loads(json.dumps(txn.value[key]))
+                counts = apply_records(txn.value, pending)
+            report["commits"] += 1
+        report["applied"] += counts["applied"]
+        report["skipped"] += counts["skipped"]
+        pending.clear()
+
+    for lineno, raw in enumerate(request.stream, start=1):
+        report["lines"] = lineno
+        line = raw.decode('utf-8-sig' if lineno == 1 else 'utf-8', errors='replace').strip()
+        if not line:
+            continue
         try:
-            config = load_config()
-            memos = config.get("memos", [])
-            updated = False
-            now = datetime.now()
-            
-            for m in memos:
-                # Check conditions: Has Date, Reminder Enabled, Not already shown, AND Not Done
-                if m.get("dueDate") and m.get("enableReminder") and not m.get("reminderShown", False) and not m.get("done", False):
-                    try:
-                        # Parse "2026-01-20T16:45"
-                        # The input type="datetime-local" format is ISO like without Z
-                        ddl_str = m.get("dueDate")
-                        ddl_dt = datetime.fromisoformat(ddl_str)
-                        
-                        # Trigger if NOW >= DDL
-                        if now >= ddl_dt:
-                            # Show Alert
-                            title = m.get("title", "Memo Reminder")
-                            content = m.get("content", m.get("text", "No Content"))
-                            text_content = f"{title}\n\n{content}"
-                            ctypes.windll.user32.MessageBoxW(0, text_content, "Wallpaper Engine Memo", 0x40 | 0x1)
-                            
-                            # Mark as shown
-                            m['reminderShown'] = True
-                            updated = True
-                            
-                    except Exception as e:
-                        print(f"Date parse error: {e}")
-                        
-            if updated:
-                config["memos"] = memos
-                save_config(config)
-                
-        except Exception as e:
-            print(f"Worker Error: {e}")
-            
-        time.sleep(5) # Check every 5 seconds
+            pending.append(parse_record(line))
+        except ValueError as e:
+            report["errorCount"] += 1
+            if len(report["errors"]) < _IMPORT_MAX_ERRORS:
+                report["errors"].append({"line": lineno, "error": str(e)})
+            continue
+        if len(pending) >= _IMPORT_BATCH_SIZE:
+            commit()
+    commit()
+
+    report["success"] = report["errorCount"] == 0
+    return jsonify(report)
+
+# ================= Config Snapshots =================
+@app.route('/api/snapshots', methods=['GET'])
+def list_snapshots():
+    """配置快照列表（新的在前）：[{"id", "time", "reason", "sections": [分区名]}]"""
+    return jsonify([{**m, "sections": sorted(m['sections'])} for m in config_store.snapshots.list()])
+
+@app.route('/api/snapshots/<snapshot_id>/restore', methods=['POST'])
+def restore_snapshot(snapshot_id):
+    """
+    把配置恢复到快照时的状态。body 可选 {"sections": ["memos", ...]} 只恢复部分分区，
+    快照中没有的分区会被删除。恢复前的状态同样保存为快照，可以再撤回。
+    """
+    body = request.get_json(silent=True) or {}
+    names = body.get('sections') or list(SECTIONS)
+    if not isinstance(names, list) or any(name not in SECTIONS for name in names):
+        return jsonify({"error": f"sections must be a subset of {list(SECTIONS)}"}), 400
+    try:
+        values = config_store.snapshots.load(snapshot_id, names)
+    except KeyError:
+        return jsonify({"error": "Snapshot not found"}), 404
+    except (OSError, ValueError) as e:
+        return jsonify({"error": f"Snapshot is damaged: {e}"}), 409
+    with config_store.transaction(snapshot=f'restore {snapshot_id}') as txn:
+        before = txn.value
+        txn.value = merge_sections({**split_sections(before), **values})
+        _run_config_side_effects(before, txn.value)
+    etag = config_etag()
+    resp = jsonify({"success": True, "restored": names, "version": etag})
+    resp.set_etag(etag)
+    return resp
+
+def migrate_due_dates():
+    """给没有 dueAt（或与 dueDate 不一致）的备忘录补上 dueAt / dueZone，返回补上的条数"""
+    with config_store.transaction('memos', snapshot='migrate dueAt') as txn:
+        memos = txn.value
+        fixed = normalize_memos(memos)
+        count = sum(1 for old, new in zip(memos or [], fixed or []) if old is not new)
+        if not count:
+            txn.abort()
+            return 0
+        txn.value = fixed
+    print(f"[CONFIG] added dueAt to {count} memos")
+    return count
+
+def snapshot_tick():
+    config_store.snapshots.step(config_store.sections)
+
+# ================= Background Reminder Task =================
+REMINDER_SCAN_SECONDS = metrics.histogram('reminder_scan_duration_seconds', 'One pass of the reminder scheduler')
+REMINDER_LAG_SECONDS = metrics.histogram('reminder_lag_seconds', 'Delay between a memo deadline and its reminder',
+                                         (0.5, 1, 2.5, 5, 10, 30, 60, 300, 3600))
+
+def scan_reminders():
+    """
+    弹出已到期的提醒：从 _reminders 取出到期的条目（没有到期的条目时不碰配置），
+    到了截止时间的在一次事务内标记为已提醒（重复提醒改为下一次的时间），
+    只是推迟 / 催办到期的只追加推迟状态，不改写备忘录分区。
+    通知可能阻塞（消息框），所以不在 memos 分区锁内弹出。
+    """
+    entries = _reminders.pop_due(time.time())
+    if not entries:
+        return
+    try:
+        due = _mark_reminders({memo_id: due_ts for memo_id, due_ts, _ in entries}, time.time())
+    except Exception:
+        _reminders.update([memo for _, _, memo in entries])    # 写入失败时放回队列，重试时再提醒
+        raise
+
+    for m in due:
+        title = m.get("title", "Memo Reminder")
+        content = m.get("content", m.get("text", "No Content"))
+        services.notifier.notify("Wallpaper Engine Memo", f"{title}\n\n{content}",
+                                 on_snooze=lambda minutes, memo_id=m['id']: snooze_memo(memo_id, minutes * 60))
+
+def _mark_reminders(popped, now_ts):
+    """
+    popped: {memo id: 出队时的提醒时间}。返回实际到期、需要弹出的备忘录（修改前的版本）。
+    只按下标替换触发的几条（其余元素原样保留），写盘、撤销历史和索引都只处理这几条。
+    """
+    due = []
+    snoozes = _sync_snoozes()
+    with config_store.transaction('memos') as txn:
+        memos = txn.value or []
+        changed = False
+        for memo_id, i in sorted(_memo_index.positions(memos, popped).items(), key=lambda p: p[1]):
+            m = memos[i]
+            snooze = snoozes.get(memo_id)
+            # 出队后又被修改（完成、关闭提醒、改了时间）的不再提醒；改了时间的已经重新挂上
+            if fire_timestamp(m, snooze) != popped[memo_id]:
+                continue
+            regular = due_timestamp(m)
+            level = 0
+            if regular is not None and regular <= now_ts:
+                REMINDER_LAG_SECONDS.observe(max(0.0, now_ts - regular))
+                # copy-on-write, the cached dict may be read concurrently
+                memos[i] = {**m, **(advance(m, now_ts) or {'reminderShown': True})}
+                changed = True
+            else:
+                REMINDER_LAG_SECONDS.observe(max(0.0, now_ts - snooze[0]))
+                level = snooze[1] + 1
+            if m.get('escalate'):
+                snoozes.set(memo_id, now_ts + escalation_delay(level, _escalation), level)
+            elif snooze is not None and snooze[0] <= now_ts:
+                snoozes.discard(memo_id)
+            due.append(m)
+        if not changed:
+            txn.abort()
+    # 只改了推迟状态的不经过监听器，在这里重新挂上
+    _reminders.update([memo for memo in map(_memo_index.get, (m['id'] for m in due)) if memo is not None])
+    return due
+
+def snooze_memo(memo_id, seconds=None, until=None):
+    """把备忘录的提醒推迟 seconds 秒（或推迟到 epoch until），催办重新计数。返回推迟到的时间"""
+    memo = get_memo_index().get(memo_id)
+    if memo is None:
+        raise MemoNotFound(memo_id)
+    until = time.time() + seconds if until is None else until
+    _sync_snoozes().set(memo_id, until, 0)
+    _reminders.update([memo])
+    return until
+
+def reminder_tick():
+    """
+    提醒任务的一次执行：睡到最早的提醒到期（最多 0.5 秒，便于及时停止）再弹出。
+    异常由调度器记录并退避重试。
+    """
+    _reminders.wait(0.5)
+    with REMINDER_SCAN_SECONDS.time():
+        scan_reminders()
 
-# Start Thread
-t = threading.Thread(target=reminder_worker, daemon=True)
-t.start()
+_SNOOZE_MAX_MINUTES = 366 * 24 * 60
+
+@app.route('/api/memos/<int:memo_id>/snooze', methods=['POST', 'DELETE'])
+def snooze_memo_route(memo_id):
+    """
+    推迟提醒：{"minutes": 5} 或 {"until": "2026-10-19T18:00"}；DELETE 取消推迟 / 催办。
+    推迟状态不写备忘录分区，重启后仍然有效。
+    """
+    memo = get_memo_index().get(memo_id)
+    if memo is None:
+        return jsonify({"error": "Memo not found"}), 404
+    if request.method == 'DELETE':
+        _sync_snoozes().discard(memo_id)
+        _reminders.update([memo])
+        return jsonify({"success": True, "id": memo_id})
+    if memo.get('done'):
+        return jsonify({"error": "Memo is done"}), 409
+    body = request.get_json(silent=True) or {}
+    minutes, until = body.get('minutes'), body.get('until')
+    try:
+        if until is not None:
+            until = datetime.fromisoformat(until).timestamp()
+        elif not isinstance(minutes, (int, float)) or isinstance(minutes, bool) \
+                or not 0 < minutes <= _SNOOZE_MAX_MINUTES:
+            raise ValueError(f'minutes must be between 0 and {_SNOOZE_MAX_MINUTES}')
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"snooze requires minutes or an ISO until: {e}"}), 400
+    try:
+        until = snooze_memo(memo_id, None if until is not None else minutes * 60, until)
+    except MemoNotFound:
+        return jsonify({"error": "Memo not found"}), 404
+    return jsonify({"success": True, "id": memo_id,
+                    "snoozeUntil": datetime.fromtimestamp(until).strftime('%Y-%m-%dT%H:%M:%S')})
 
 @app.route('/api/memos/delete', methods=['POST'])
 def delete_memo():
     data = request.json
     memo_id = data.get("id")
-    config = load_config()
-    memos = config.get("memos", [])
-    
-    config["memos"] = [m for m in memos if m.get("id") != memo_id]
-    save_config(config)
-    return jsonify({"success": True, "memos": config["memos"]})
+    with config_store.transaction('memos', undo=f'delete memo {memo_id}') as txn:
+        txn.value = [m for m in txn.value or [] if m.get("id") != memo_id]
+    return jsonify({"success": True, "memos": txn.value})
 
 @app.route('/api/memos/open_editor', methods=['POST'])
 def open_editor():
@@ -716,6 +901,22 @@ def open_editor():
     else:
         return jsonify({"error": "GUI Manager not active"}), 500
 
+@app.route('/api/goals', methods=['GET'])
+def get_goals():
+    """
+    返回 dailyGoals。带 since=<version>（可选 epoch）时，
+    如果之后没有变化只返回 {"changed": false, ...}，不传输条目。
+    """
+    _refresh_state()
+    with _state_lock:
+        head = {"version": _change_log.version, "epoch": _change_log.epoch}
+        since = request.args.get('since', type=int)
+        if (since is not None and request.args.get('epoch', _change_log.epoch) == _change_log.epoch
+                and 0 <= since <= _change_log.version
+                and _change_log.section_version('dailyGoals') <= since):
+            return jsonify({**head, "changed": False})
+        return jsonify({**head, "changed": True, "dailyGoals": _section_snapshots.get('dailyGoals') or {"date": "", "items": []}})
+
 @app.route('/api/goals/open_editor', methods=['POST'])
 def open_goals_editor():
     global gui_manager
@@ -761,6 +962,29 @@ def wait_for_close():
         
     return jsonify({"closed": False}) # Timeout, still open
 
+_CHANGES_TIMEOUT_MAX = 55
+
+@app.route('/api/changes', methods=['GET'])
+def wait_for_changes():
+    """
+    配置变化长轮询（在 http-long 池中执行）：阻塞到 since 之后有新版本或超时，
+        {"version": v, "epoch": e, "changed": true, "sections": ["memos", ...]}
+    sections 为 null 表示无法从变更日志还原（落后太多或服务端重启），前端重新加载全部。
+    外部修改配置文件后由 config_watcher 重新加载，同样在这里通知到壁纸。
+    """
+    since = request.args.get('since', type=int)
+    epoch = request.args.get('epoch') or None
+    timeout = min(max(request.args.get('timeout', 25, type=float), 0), _CHANGES_TIMEOUT_MAX)
+    if since is None:
+        since, epoch = _change_log.version, _change_log.epoch
+    _refresh_state()
+    changed = _change_log.wait(since, epoch, timeout)
+    head = {"version": _change_log.version, "epoch": _change_log.epoch, "changed": changed}
+    if not changed:
+        return jsonify({**head, "sections": []})
+    sections = _change_log.sections_since(since, epoch)
+    return jsonify({**head, "sections": sorted(sections) if sections is not None else None})
+
 @app.route('/api/system/editor_status', methods=['GET'])
 def get_editor_status():
     global gui_manager
@@ -773,54 +997,202 @@ def update_goals_items():
     data = request.json
     new_items = data.get("items", [])
     
-    config = load_config()
-    if "dailyGoals" not in config or not isinstance(config["dailyGoals"], dict):
-         config["dailyGoals"] = {"date": "", "items": []}
-         
-    config["dailyGoals"]["items"] = new_items
-    save_config(config)
+    with config_store.transaction('dailyGoals', undo='edit goals') as txn:
+        if not isinstance(txn.value, dict):
+            txn.value = {"date": "", "items": []}
+        txn.value["items"] = new_items
     return jsonify({"success": True})
 
+# ================= Undo / Redo =================
+def _history_step(step, what):
+    body = request.get_json(silent=True) or {}
+    section = body.get('section') or request.args.get('section') or None
+    if section is not None and section not in SECTIONS:
+        return jsonify({"error": f"section must be one of {list(SECTIONS)}"}), 400
+    entry = step(section)
+    if entry is None:
+        return jsonify({"error": f"Nothing to {what}"}), 409
+    return jsonify({"success": True, **entry.info(), "version": config_etag()})
+
+@app.route('/api/undo', methods=['POST'])
+def undo_edit():
+    """
+    撤销 section 分区（body {"section": "memos"}，省略时为所有分区中最近）的最近一次修改。
+    历史只在内存中，记录的是反向操作，按字节预算淘汰最早的记录（settings 的 "history"）。
+    """
+    return _history_step(config_store.undo, 'undo')
+
+@app.route('/api/redo', methods=['POST'])
+def redo_edit():
+    return _history_step(config_store.redo, 'redo')
+
+@app.route('/api/history', methods=['GET'])
+def get_history():
+    return jsonify(config_store.history.info())
+
+# ================= Graceful Shutdown =================
+SHUTDOWN_DEADLINE = 5.0
+_shutdown_started = threading.Event()
+_shutdown_done = threading.Event()
+
+def flush_persistence():
+    """等待进行中的配置事务提交完成，重试失败的写盘；之后不会再有写入（请求已排空，编辑窗口已关闭）"""
+    ok = config_store.flush()
+    config_store.snapshots.run_pending()
+    return ok
+
+def _wake_long_polls():
+    _change_log.close()
+    services.media.close()
+
+def graceful_shutdown(deadline=SHUTDOWN_DEADLINE):
+    """
+    按顺序退出，整体不超过 deadline 秒，返回每个阶段的耗时：
+    停止接受请求 → 排空普通请求 → 编辑窗口走保存路径关闭 → 唤醒 /api/changes 和 /media/watch 长轮询 →
+    排空长请求（wait_for_close / 文件选择在窗口关闭后返回）→ 写盘 → 停止后台任务 → 退出 Qt。
+    某个阶段超时只记录下来，后续阶段照常执行（剩余时间为 0 时立即返回）。
+    """
+    end = time.monotonic() + deadline
+    remaining = lambda: max(0.0, end - time.monotonic())
+    report = []
+    # 兜底：某个阶段卡死（例如 Qt 没有退出）时仍然结束进程
+    scheduler.once('shutdown-watchdog', deadline + 2, lambda: os._exit(1))
+
+    def phase(name, fn):
+        t0 = time.perf_counter()
+        try:
+            ok = fn()
+        except Exception as e:
+            print(f"[SHUTDOWN] {name} failed: {e}")
+            ok = False
+        report.append({"phase": name, "seconds": round(time.perf_counter() - t0, 4), "ok": ok is not False})
+
+    drain = getattr(http_server, 'drain', None)
+    if http_server is not None:
+        phase('stop_accepting', http_server.shutdown)
+    if drain:
+        phase('drain_requests', lambda: drain(remaining(), pools=('http',)))
+    if gui_manager is not None:
+        phase('close_editors', lambda: gui_manager.close_editors(remaining()))
+    phase('wake_long_polls', _wake_long_polls)
+    if drain:
+        phase('drain_long_requests', lambda: drain(remaining(), pools=('http-long',)))
+    phase('flush_persistence', flush_persistence)
+    phase('stop_tasks', lambda: not scheduler.stop(remaining(), exclude=('shutdown', 'shutdown-watchdog')))
+    if http_server is not None:
+        phase('close_server', getattr(http_server, 'close', http_server.server_close))
+    if gui_manager is not None:
+        phase('quit_qt', gui_manager.quit)
+
+    total = deadline - remaining()
+    for p in report:
+        print(f"[SHUTDOWN] {p['phase']:20} {p['seconds'] * 1000:8.1f} ms{'' if p['ok'] else '  (timed out / failed)'}")
+    print(f"[SHUTDOWN] total {total * 1000:.1f} ms (deadline {deadline:.1f}s)")
+    _shutdown_done.set()
+    return report
+
 @app.route('/system/stop', methods=['POST'])
 def stop_server():
     """
     Shuts down the server and the PyQt application.
     Expected to be called from the frontend.
     """
-    try:
-        # Use os._exit(0) to forcefully terminate the process immediately.
-        # This is necessary because app.quit() might just stop the event loop
-        # but the Flask thread or other daemon threads might keep the process "zombie"
-        # or there might be cleanup handlers delaying exit.
-        # For a "kill switch" like this, _exit is appropriate.
-        def kill():
-            time.sleep(1) # Give time for the response to revert to client
-            os._exit(0)
-        
-        # Run in a separate thread so we can return the response first
-        threading.Thread(target=kill).start()
-        
-        return jsonify({"success": True, "message": "Server shutting down..."})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    if _shutdown_started.is_set():
+        return jsonify({"success": True, "message": "Server is already shutting down..."})
+    _shutdown_started.set()
+    # 短暂延迟，让这个响应先发出去；退出流程有总时限，超时的阶段直接跳过
+    scheduler.once('shutdown', 0.2, graceful_shutdown)
+    return jsonify({"success": True, "message": "Server shutting down...", "deadline": SHUTDOWN_DEADLINE})
 
 if __name__ == '__main__':
-    # 1. Initialize Qt Application (Must be in Main Thread)
-    app_qt = QApplication(sys.argv)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--headless', action='store_true',
+                        help='只运行 HTTP 服务，不加载 Qt（编辑窗口和文件选择不可用）')
+    parser.add_argument('--platform', choices=platform_services.PLATFORMS, default='auto',
+                        help='平台服务实现：auto 在 Windows 上使用系统接口，其他系统使用内存实现')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--config', help='配置文件路径（默认 user_config.json）')
+    parser.add_argument('--storage', choices=('sections', 'journal'),
+                        help='配置存储引擎（默认沿用配置清单中的引擎）：sections 每个分区一个文件，'
+                             'journal 快照 + 只追加的变更日志（config_journal.py）')
+    parser.add_argument('--watch', choices=config_watcher.BACKENDS + ('off',), default='auto',
+                        help='监视配置文件的外部修改（config_watcher.py）：auto 按平台选择 inotify / '
+                             'ReadDirectoryChangesW，poll 按 mtime 轮询，off 在每次请求时检查文件')
+    args = parser.parse_args()
+    PORT = args.port
+    if args.config:
+        CONFIG_FILE = os.path.abspath(args.config)
+    config_store.open(CONFIG_FILE, args.storage)
+    # 旧的整份 user_config.json（或 --storage 指定了另一种引擎时）迁移成清单 + 分区文件 / 日志
+    config_store.migrate()
+    # 旧版本保存的备忘录补上 dueAt / dueZone（只有第一次启动会写入）
+    migrate_due_dates()
+
+    # 分阶段启动：壁纸在 /config 返回之前一直显示“后端离线”，
+    # 所以先绑定端口开始服务，再启动平台服务的后台轮询、后台线程和 Qt。
+    # 平台服务要在开始服务之前创建（create 本身没有副作用），否则最早到达的请求
+    # （自启动开关、媒体键）会落到导入时的内存实现上，在 Windows 上悄悄丢失。
+    services = platform_services.create(args.platform)
+
+    # 1. Start HTTP server
+    # 线程池 WSGI 服务器，引擎和参数见 user_config.json 的 "server" 键（wsgi_server.py）
+    startup_config = load_config()
+    metrics.set_enabled(startup_config.get('debug', False))
+    http_server = make_server(app, '127.0.0.1', PORT, startup_config.get('server'))
+    if hasattr(http_server, 'pool_stats'):
+        metrics.gauge('http_pool_threads', 'HTTP worker pool threads by state',
+                      lambda: [({"pool": pool, "state": k}, v)
+                               for pool, st in http_server.pool_stats().items() for k, v in st.items()])
+
+    http_task = scheduler.once('http', 0, http_server.serve_forever, retries=3)
+    print(f"[STARTUP] HTTP listening on port {PORT}")
+
+    # 2. Platform services polling (SMTC polling starts here; winsdk is imported on that task's thread)
+    services.start(scheduler)
+    # 媒体会话不可用时（非 Windows、老版本播放器未注册 SMTC）每秒扫描一次窗口标题
+    scheduler.every('media-window', 1, sample_window_media)
+
+    # 提醒任务睡到最早的提醒到期，新挂上更早的提醒时立即醒来
+    scheduler.every('reminder', 0.05, reminder_tick, jitter=0)
+    # 催办间隔（settings 的 "escalation"，默认值见 reminders.ESCALATION_DEFAULTS）
+    _escalation.update(escalation_options(startup_config.get('escalation')))
+    # journal 存储引擎的日志压缩（sections 引擎什么也不做）
+    scheduler.every('config-maintain', 10, config_store.maintain, delay=10)
+    history_budget = (startup_config.get('history') or {}).get('budget')
+    if isinstance(history_budget, int) and history_budget > 0:
+        config_store.history.budget = history_budget
+    # 配置快照：定时快照和整体替换 / 导入前排队的快照在这里写出（保留策略见 settings 的 "snapshots"）
+    config_store.snapshots.configure(startup_config.get('snapshots'))
+    scheduler.every('config-snapshot', 1, snapshot_tick)
+    # 配置文件被外部修改时在后台重新加载并通知壁纸（/api/changes）
+    if args.watch != 'off':
+        watcher = config_watcher.ConfigWatcher(config_store, args.watch)
+        scheduler.every('config-watch', 0.05, watcher.step, jitter=0.0,
+                        setup=watcher.setup, teardown=watcher.teardown)
+    # 预热 psutil（导入 + 第一次 cpu_percent 作为基准），不占用请求线程
+    scheduler.once('stats-warmup', 0, sample_stats)
+
+    if args.headless:
+        print(f"Backend Service Started on port {PORT} (headless, platform={services.name})...")
+        http_task.join()
+        # serve_forever 返回说明退出流程已经开始，等它执行完（有总时限）
+        _shutdown_done.wait(SHUTDOWN_DEADLINE + 1)
+        sys.exit(0)
+
+    # 3. Initialize Qt Application (Must be in Main Thread) and GUI Manager
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QTimer
+    from gui_manager import GuiManager, QtFilePicker, QtNotifier
+    # 命令行参数已由 argparse 处理；不能再交给 Qt，否则 --platform 会被当成 Qt 的平台插件
+    app_qt = QApplication(sys.argv[:1])
     app_qt.setQuitOnLastWindowClosed(False) # Keep running when windows close
-    
-    # 2. Init GUI Manager
-    gui_manager = GuiManager()
-    
-    # 3. Start Flask in Background Thread
-    def run_flask():
-        # debug=False, use_reloader=False is crucial for threading
-        app.run(host='127.0.0.1', port=PORT, debug=False, use_reloader=False)
-        
-    flask_thread = threading.Thread(target=run_flask, daemon=True)
-    flask_thread.start()
-    
-    print(f"Backend & GUI Service Started on port {PORT}...")
+    gui_manager = GuiManager(config_store)
+    services.file_picker = QtFilePicker(gui_manager)
+    services.notifier = QtNotifier(gui_manager)
+    # 编辑窗口模块在事件循环空闲时导入
+    QTimer.singleShot(0, gui_manager.preload_editors)
+
+    print(f"Backend & GUI Service Started on port {PORT} (platform={services.name})...")
     
     # 4. Start Qt Event Loop (Blocking)
     sys.exit(app_qt.exec())
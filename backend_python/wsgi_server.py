@@ -0,0 +1,337 @@
+"""
+线程池 WSGI 服务器，替代 Werkzeug 开发服务器（每个请求新开线程、不支持 keep-alive）。
+
+    server = make_server(app, '127.0.0.1', PORT, load_config().get('server'))
+    server.serve_forever()     # 在后台线程中运行，不影响 Qt 主循环
+
+两个固定大小的线程池：
+    http       普通请求（2s 轮询等），所有连接都在这里读取并解析请求
+    http-long  LONG_LIVED_PATHS 中会长时间阻塞的接口（wait_for_close、
+               /api/changes 和 /media/watch 长轮询、文件选择对话框）。请求头解析完后整个请求移交到这里，
+               不占用 http 池的线程，响应后关闭连接
+池和等待队列都满时直接回 503，不会无限制地创建线程。
+
+优雅退出：shutdown() 停止接受新连接并关掉空闲的 keep-alive 连接，之后的响应
+都带 Connection: close；drain(timeout) 等待已接受的请求执行完；最后 close()。
+
+options（user_config.json 的 "server" 键，缺省值见 DEFAULT_OPTIONS）：
+    engine          "pool"（默认）或 "werkzeug"（原开发服务器，排查问题用）
+    workers         http 池线程数
+    longWorkers     http-long 池线程数
+    queueSize       每个池的等待队列长度
+    backlog         listen() 的连接积压数
+    keepAlive       keep-alive 空闲超时（秒），0 表示每个请求后关闭连接
+    requestTimeout  读取请求（请求行、请求头、请求体）的超时（秒）
+"""
+import contextlib
+import queue
+import socket
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Iterable
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from werkzeug.serving import make_server as make_dev_server
+from werkzeug.wsgi import LimitedStream
+
+LONG_LIVED_PATHS = ('/api/system/wait_for_close', '/api/changes', '/media/watch', '/system/pick-file')
+
+ENGINES = ('pool', 'werkzeug')
+
+DEFAULT_OPTIONS = {
+    "engine": "pool",
+    "workers": 16,
+    "longWorkers": 8,
+    "queueSize": 32,
+    "backlog": 64,
+    "keepAlive": 5,
+    "requestTimeout": 10,
+}
+
+_COUNT_OPTIONS = ('workers', 'longWorkers', 'queueSize', 'backlog')
+
+_REJECT = b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+def resolve_options(raw: Any) -> Dict[str, Any]:
+    """用户配置与默认值合并，类型或取值不对的项使用默认值"""
+    options = dict(DEFAULT_OPTIONS)
+    if not isinstance(raw, dict):
+        return options
+    for key in DEFAULT_OPTIONS:
+        value = raw.get(key)
+        if key == 'engine':
+            if value in ENGINES:
+                options[key] = value
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0:
+            options[key] = max(1, int(value)) if key in _COUNT_OPTIONS else value
+    return options
+
+
+class WorkerPool:
+    """固定数量的线程 + 有界队列；队列满时 submit 返回 False 而不是阻塞"""
+
+    def __init__(self, name: str, workers: int, queue_size: int):
+        self.name = name
+        self._queue: queue.Queue = queue.Queue(queue_size)
+        self._busy = 0
+        self._pending = 0   # 已提交但未执行完（排队 + 执行中）
+        self._idle = threading.Condition()
+        self._threads = [threading.Thread(target=self._run, name=f'{name}-{i}', daemon=True)
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, fn: Callable, *args) -> bool:
+        with self._idle:
+            self._pending += 1
+        try:
+            self._queue.put_nowait((fn, args))
+        except queue.Full:
+            self._done()
+            return False
+        return True
+
+    def _done(self) -> None:
+        with self._idle:
+            self._pending -= 1
+            if not self._pending:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: float) -> bool:
+        """等待排队和执行中的任务全部完成，超时返回 False"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            fn, args = item
+            with self._idle:
+                self._busy += 1
+            try:
+                fn(*args)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                with self._idle:
+                    self._busy -= 1
+                self._done()
+
+    def stats(self) -> Dict[str, int]:
+        return {"workers": len(self._threads), "busy": self._busy, "queued": self._queue.qsize()}
+
+    def close(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+
+
+class _DrainSink:
+    """
+    Werkzeug 的 run_wsgi 在响应后会把 socket 上剩余的数据读掉，没有数据时再等 10ms
+    （它假定连接随后关闭）。keep-alive 时剩余数据就是下一个请求，所以应用执行
+    期间把 handler 的 connection / rfile 换成这个对象：永远可读、读出来是空，
+    那段清理立即结束。请求体由 wsgi.input 持有真实的 rfile，不受影响。
+    """
+
+    def __init__(self):
+        self._r, self._w = socket.socketpair()
+        self._w.send(b'\0')
+
+    def fileno(self) -> int:
+        return self._r.fileno()
+
+    @staticmethod
+    def read(size: int = -1) -> bytes:
+        return b''
+
+    def close(self) -> None:
+        self._r.close()
+        self._w.close()
+
+
+class _PooledRequestHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    in_long_pool = False
+    delegated = False
+
+    def setup(self):
+        self.timeout = self.server.options['requestTimeout'] or None
+        super().setup()
+        self._served = False
+        self._in_wsgi = False
+        self._body = None
+        self._real_io = None
+
+    def handle_one_request(self):
+        # 同一连接上的后续请求按 keep-alive 超时等待，空闲连接静默关闭
+        if self._served:
+            self.connection.settimeout(self.server.options['keepAlive'])
+            try:
+                with self.server.idle_connections(self.connection) as accepting:
+                    if not accepting or not self.rfile.peek(1):
+                        self.close_connection = True
+                        return
+            except OSError:
+                self.close_connection = True
+                return
+            self.connection.settimeout(self.timeout)
+        self._served = True
+        super().handle_one_request()
+
+    def make_environ(self):
+        environ = super().make_environ()
+        if environ.get('wsgi.input_terminated'):
+            # chunked 请求体无法确定是否读完，响应后关闭连接
+            self._body = None
+        else:
+            length = environ.get('CONTENT_LENGTH') or ''
+            self._body = LimitedStream(self.rfile, int(length) if length.isdigit() else 0)
+            environ['wsgi.input'] = self._body
+        self._real_io = (self.connection, self.rfile)
+        self.connection = self.rfile = self.server.drain_sink
+        return environ
+
+    def run_wsgi(self):
+        path = self.path.split('?', 1)[0]
+        if not self.in_long_pool and path.startswith(LONG_LIVED_PATHS):
+            self.close_connection = True
+            if self.server.long_pool.submit(self._run_delegated):
+                self.delegated = True
+            else:
+                self.send_error(503, 'Too many long-lived requests')
+            return
+
+        self._in_wsgi = True
+        try:
+            super().run_wsgi()
+        finally:
+            self._in_wsgi = False
+            if self._real_io:
+                self.connection, self.rfile = self._real_io
+                self._real_io = None
+        # 读完应用没读的请求体，连接上的下一个请求才能正确解析
+        if self._body is None or self.server.draining:
+            self.close_connection = True
+        elif not self.close_connection:
+            try:
+                self._body.exhaust()
+            except Exception:
+                self.close_connection = True
+
+    def send_header(self, keyword, value):
+        # Werkzeug 总是发送 Connection: close；请求体能读完时改为保持连接
+        if (self._in_wsgi and keyword.lower() == 'connection' and value == 'close'
+                and self.server.options['keepAlive'] > 0 and not self.server.draining
+                and not self.close_connection and self._body is not None):
+            value = 'keep-alive'
+        super().send_header(keyword, value)
+
+    def _run_delegated(self):
+        self.in_long_pool = True
+        try:
+            self.run_wsgi()
+            self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            self.finish()
+            self.server.shutdown_request(self.request)
+
+    def finish(self):
+        # 已移交给 http-long 池的请求由那边负责收尾
+        if self.delegated and not self.in_long_pool:
+            return
+        super().finish()
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    multithread = True
+
+    def __init__(self, host: str, port: int, app, options: Dict[str, Any]):
+        self.options = options
+        self.request_queue_size = options['backlog']
+        self.drain_sink = _DrainSink()
+        self.draining = False
+        self._idle_conns = set()
+        self._idle_lock = threading.Lock()
+        super().__init__(host, port, app, handler=_PooledRequestHandler)
+        self.short_pool = WorkerPool('http', options['workers'], options['queueSize'])
+        self.long_pool = WorkerPool('http-long', options['longWorkers'], options['queueSize'])
+
+    def process_request(self, request, client_address):
+        if not self.short_pool.submit(self._serve_connection, request, client_address):
+            try:
+                request.sendall(_REJECT)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+
+    def _serve_connection(self, request, client_address):
+        handler = None
+        try:
+            handler = self.RequestHandlerClass(request, client_address, self)
+        except Exception:
+            self.handle_error(request, client_address)
+        if handler is None or not handler.delegated:
+            self.shutdown_request(request)
+
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        return {pool.name: pool.stats() for pool in (self.short_pool, self.long_pool)}
+
+    @contextlib.contextmanager
+    def idle_connections(self, conn: socket.socket):
+        """在 keep-alive 空闲等待期间登记连接，shutdown() 时可以直接关掉；退出中返回 False"""
+        with self._idle_lock:
+            if self.draining:
+                yield False
+                return
+            self._idle_conns.add(conn)
+        try:
+            yield True
+        finally:
+            with self._idle_lock:
+                self._idle_conns.discard(conn)
+
+    def shutdown(self):
+        """停止接受新连接；已接受的请求继续执行，空闲的 keep-alive 连接立即关闭"""
+        with self._idle_lock:
+            self.draining = True
+            idle = list(self._idle_conns)
+        super().shutdown()
+        for conn in idle:
+            try:
+                conn.shutdown(socket.SHUT_RD)   # 正在 peek 的线程读到 EOF 后关闭连接
+            except OSError:
+                pass
+
+    def drain(self, timeout: float, pools: Iterable[str] = ('http', 'http-long')) -> bool:
+        """等待指定池中的请求执行完，超时返回 False"""
+        deadline = time.monotonic() + timeout
+        ok = True
+        for pool in (self.short_pool, self.long_pool):
+            if pool.name in pools:
+                ok = pool.wait_idle(max(0.0, deadline - time.monotonic())) and ok
+        return ok
+
+    def close(self):
+        """
+        释放线程池和 drain sink，在 drain() 之后调用。
+        （server_close() 只关闭监听 socket：Werkzeug 的 serve_forever 返回时就会调用它，
+        那时已接受的请求还在执行。）
+        """
+        self.server_close()
+        self.short_pool.close()
+        self.long_pool.close()
+        self.drain_sink.close()
+
+
+def make_server(app, host: str, port: int, options: Any = None) -> BaseWSGIServer:
+    """按 options['engine'] 创建服务器，调用方负责 serve_forever()"""
+    options = resolve_options(options)
+    if options['engine'] == 'werkzeug':
+        return make_dev_server(host, port, app, threaded=True)
+    return PooledWSGIServer(host, port, app, options)
@@ -1,23 +1,96 @@
 import { BACKEND_URL } from './config.js';
 import { showToast } from './utils.js';
 
+// 条件请求缓存: path -> { etag, data }
+// 带 If-None-Match 请求，后端返回 304 时直接复用上次的数据
+const conditionalCache = new Map();
+
+// 媒体快照长轮询，bootstrap 的媒体 ETag 同时预填到这里
+const MEDIA_WATCH_PATH = '/media/watch?timeout=25';
+
+// 返回 { data, etag, notModified, headers }。data 是缓存的副本，调用方可以随意修改
+export async function fetchConditional(path, options = {}) {
+    const cached = conditionalCache.get(path);
+    const headers = { ...(options.headers || {}) };
+    if (cached && cached.etag) headers['If-None-Match'] = cached.etag;
+
+    const res = await fetch(`${BACKEND_URL}${path}`, { ...options, headers, cache: 'no-store' });
+    if (res.status === 304 && cached) {
+        return { data: structuredClone(cached.data), etag: cached.etag, notModified: true, headers: res.headers };
+    }
+    if (!res.ok) {
+        const err = new Error(`HTTP error! status: ${res.status}`);
+        err.status = res.status;
+        throw err;
+    }
+    const data = await res.json();
+    const etag = res.headers.get('ETag');
+    if (etag) conditionalCache.set(path, { etag, data: structuredClone(data) });
+    return { data, etag, notModified: false, headers: res.headers };
+}
+
+// 用已有数据预填条件请求缓存 (例如 bootstrap 返回的 ETag)
+export function seedConditional(path, etag, data) {
+    if (etag) conditionalCache.set(path, { etag, data: structuredClone(data) });
+}
+
+// 启动时一次性获取首屏数据 (config / memos / goals / pomodoro / stats / media)
+// 并预填各轮询接口的 ETag，后续轮询在数据未变时直接得到 304
+export async function fetchBootstrap() {
+    const res = await fetch(`${BACKEND_URL}/api/bootstrap`, { signal: AbortSignal.timeout(3000) });
+    if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
+    const boot = await res.json();
+    // GET /config 的表示包含 memos，缓存时补回，保证与该 ETag 对应的内容一致
+    seedConditional('/config', boot.etags.config, { ...boot.config, memos: boot.memos.memos });
+    seedConditional('/api/stats', boot.etags.stats, boot.stats);
+    seedConditional('/media/status', boot.etags.media, boot.media);
+    seedConditional(MEDIA_WATCH_PATH, boot.etags.media, boot.media);
+    return boot;
+}
+
 // 获取配置
 export function fetchConfig() {
-    const ts = Date.now();
-    return fetch(`${BACKEND_URL}/config?t=${ts}`)
-        .then(res => {
-             if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
-             return res.json();
-        });
+    return fetchConditional('/config').then(r => r.data);
 }
 
-// 保存配置
-export async function saveConfigToBackend(config) {
-    return fetch(`${BACKEND_URL}/config`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(config)
+// 压缩后的响应 ETag 带编码后缀（"<版本>-gzip"），作为版本比较时去掉
+export function versionTag(etag) {
+    return etag ? etag.replace(/-(?:br|gzip|deflate)"$/, '"') : etag;
+}
+
+// 获取配置及其版本 (ETag)，用于之后 PATCH 的 If-Match
+export function fetchConfigVersioned() {
+    return fetchConditional('/config').then(r => ({ ...r, etag: versionTag(r.etag) }));
+}
+
+// 只提交变化的键 (JSON Merge Patch)。
+// 传入 etag 时，如果配置已被其他窗口修改，抛出 err.conflict = true 的错误，
+// err.etag 为服务端当前版本。成功时返回新的 ETag。
+export async function patchConfigOnBackend(patch, etag) {
+    const headers = { 'Content-Type': 'application/merge-patch+json' };
+    if (etag) headers['If-Match'] = etag;
+    const res = await fetch(`${BACKEND_URL}/config`, {
+        method: 'PATCH',
+        headers,
+        body: JSON.stringify(patch)
     });
+    if (res.status === 412) {
+        const err = new Error('Config changed on the backend');
+        err.conflict = true;
+        err.etag = res.headers.get('ETag');
+        throw err;
+    }
+    if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
+    return res.headers.get('ETag');
+}
+
+// dailyGoals 在配置版本 etag（"epoch.version"）之后是否变化过；无法判断时按变化过处理
+export async function goalsChangedSince(etag) {
+    const m = /^(?:W\/)?"?([^".]*)\.(\d+)"?$/.exec(etag || '');
+    if (!m) return true;
+    const res = await fetch(`${BACKEND_URL}/api/goals?since=${m[2]}&epoch=${encodeURIComponent(m[1])}`);
+    if (!res.ok) return true;
+    return (await res.json()).changed !== false;
 }
 
 // 启动应用
@@ -36,6 +109,53 @@ export async function systemPickFile(filter) {
     return await res.json();
 }
 
+// 配置变化长轮询（/api/changes）：后端有新版本（包括外部修改配置文件）时调用
+// onChange(sections, etag)，sections 为 null 表示需要重新加载全部，etag 是变化后的配置版本。
+// start: { version, epoch }，通常来自 /api/bootstrap 的 memos。后端不支持（404）时停止。
+export function watchConfigChanges(onChange, start = {}) {
+    let { version, epoch } = start;
+    const loop = async () => {
+        while (true) {
+            try {
+                const params = new URLSearchParams({ timeout: 25 });
+                if (version !== undefined) params.set('since', version);
+                if (epoch) params.set('epoch', epoch);
+                const res = await fetch(`${BACKEND_URL}/api/changes?${params}`, { signal: AbortSignal.timeout(35000) });
+                if (res.status === 404) return;
+                if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
+                const body = await res.json();
+                const first = version === undefined;
+                version = body.version;
+                epoch = body.epoch;
+                if (body.changed && !first) onChange(body.sections, `"${epoch}.${version}"`);
+            } catch (e) {
+                // 后端离线或重启：稍后重试（epoch 不同会得到 sections: null）
+                await new Promise(r => setTimeout(r, 5000));
+            }
+        }
+    };
+    loop();
+}
+
+// 撤销 / 重做最近一次修改（section 省略时为所有分区中最近的一次）
+// 返回 { success, section, label } 或 { error }（没有可撤销的修改时为 409）
+export async function undoOnBackend(section) {
+    return historyStep('undo', section);
+}
+
+export async function redoOnBackend(section) {
+    return historyStep('redo', section);
+}
+
+async function historyStep(action, section) {
+    const res = await fetch(`${BACKEND_URL}/api/${action}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(section ? { section } : {}),
+    });
+    return await res.json();
+}
+
 // 系统：停止服务器
 export async function systemStopServer() {
     return fetch(`${BACKEND_URL}/system/stop`, { method: 'POST' });
@@ -67,12 +187,40 @@ export function controlMedia(action) {
         });
 }
 
-// 读取当前系统媒体信息（SMTC via Python winsdk）
-// 返回 { title, artist, albumTitle, thumbnail, state, stateCode, position, duration }
-export function fetchMediaStatus() {
-    return fetch(`${BACKEND_URL}/media/status`, { signal: AbortSignal.timeout(2000) })
-        .then(r => r.json())
-        .catch(() => null);
+// 媒体快照：{ title, artist, albumTitle, thumbnail, state, stateCode, position, duration, playbackRate, sampledAt }
+// 快照采样至今的秒数：position 是 sampledAt 时的进度，两者都是服务端的单调时钟
+export function mediaAge(data, clock) {
+    clock = parseFloat(clock);
+    if (!data || !isFinite(clock) || !isFinite(data.sampledAt)) return 0;
+    return Math.max(0, clock - data.sampledAt);
+}
+
+// 媒体快照长轮询 (/media/watch)：换曲 / 暂停 / 拖动进度时立即返回，否则 25s 后回 304。
+// 正常播放时快照不变，进度由调用方按 onMedia(data, age) 外推。
+// 后端离线时 onMedia(null) 并在 5s 后重试；旧版后端没有 /media/watch（404）时退回每 5s 轮询 /media/status。
+export function watchMedia(onMedia) {
+    let path = MEDIA_WATCH_PATH;
+    const loop = async () => {
+        while (true) {
+            const started = Date.now();
+            try {
+                const long = path === MEDIA_WATCH_PATH;
+                const r = await fetchConditional(path, { signal: AbortSignal.timeout(long ? 35000 : 2000) });
+                onMedia(r.data, mediaAge(r.data, r.headers.get('X-Media-Clock')));
+                // 后端退出时长轮询会立即返回，避免在这段时间里空转
+                if (!long || Date.now() - started < 1000) await sleep(long ? 1000 : 5000);
+            } catch (e) {
+                if (e.status === 404 && path === MEDIA_WATCH_PATH) { path = '/media/status'; continue; }
+                onMedia(null, 0);
+                await sleep(5000);
+            }
+        }
+    };
+    loop();
+}
+
+function sleep(ms) {
+    return new Promise(r => setTimeout(r, ms));
 }
 
 // 状态检查
@@ -82,7 +230,8 @@ export async function checkBackendStatus() {
     const orb = document.getElementById('main-orb'); 
     if (!orb) return;
     try {
-        await fetch(`${BACKEND_URL}/config`, { signal: AbortSignal.timeout(2000) });
+        // 配置没变时后端只回 304，存活检查几乎不传输数据
+        await fetchConditional('/config', { signal: AbortSignal.timeout(2000) });
         orb.classList.add('online');
         // 如果后端从离线变为在线，且是第一次，则刷新页面
         if (backendWasOffline && !sessionStorage.getItem('refreshedOnBackendOnline')) {
@@ -10,6 +10,7 @@ export const state = {
         autoStart: false, 
         debug: false 
     },
+    configETag: null, // 最近一次读取 / 保存的配置版本
     isDockOpen: false,
     isSettingsOpen: false,
     editingIndex: -1 // -1 表示添加新项
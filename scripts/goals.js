@@ -1,5 +1,5 @@
 import { BACKEND_URL, state } from './config.js';
-import { saveConfigToBackend } from './backend.js';
+import { patchConfigOnBackend, goalsChangedSince } from './backend.js';
 import { waitForEditorClose, showToast } from './utils.js';
 
 // ==========================================
@@ -107,7 +107,29 @@ export function deleteGoal(index) {
     renderGoals();
 }
 
-// 保存配置的帮助函数
+// 保存配置的帮助函数：只提交 dailyGoals。
+// 串行发送，保证连续点击时每次都带上一次保存返回的 ETag
+let goalsSaveChain = Promise.resolve();
+
+async function patchGoals() {
+    const patch = { dailyGoals: state.currentConfig.dailyGoals };
+    try {
+        return await patchConfigOnBackend(patch, state.configETag);
+    } catch (e) {
+        // 只有其他分区变了（例如旧版后端按整个配置比较版本）：按新版本重试一次
+        if (!e.conflict || await goalsChangedSince(state.configETag)) throw e;
+        return await patchConfigOnBackend(patch, e.etag);
+    }
+}
+
 function saveGoalsConfig() {
-    saveConfigToBackend(state.currentConfig);
+    goalsSaveChain = goalsSaveChain
+        .then(patchGoals)
+        .then(etag => { state.configETag = etag; })
+        .catch(e => {
+            if (!e.conflict) return console.error("Failed to save goals", e);
+            // 目标编辑器刚保存过，放弃本地修改并重新加载
+            showToast("Goals changed elsewhere. Reloading...", "info");
+            if (window.loadConfigToUI) window.loadConfigToUI();
+        });
 }
@@ -3,11 +3,11 @@ import { logDebug, showToast } from './utils.js';
 import { initClock } from './clock.js';
 import { toggleDock, renderDock, toggleSettingsModal, launchApp, launchMusicApp } from './dock.js';
 import { renderSettingsList, addNewAppSlot, removeAppSlot, openEditor, closeEditor, saveEditor, pickFile } from './apps.js';
-import { fetchConfig, saveConfigToBackend, checkBackendStatus, systemStopServer, controlMedia, fetchMediaStatus } from './backend.js';
+import { fetchBootstrap, fetchConfigVersioned, patchConfigOnBackend, checkBackendStatus, systemStopServer, controlMedia, watchMedia, mediaAge, watchConfigChanges, undoOnBackend, redoOnBackend } from './backend.js';
 import { initAnimation, updateSakuraCount } from './animation.js';
 import { initAudio } from './audio.js';
 import { initStats } from './stats.js';
-import { initMemos, addNewMemo as addNewMemoAction, openMemoEditor, toggleMemoStatus, requestDeleteMemo, cancelDeleteMemo, confirmDeleteMemo, loadMemos } from './memos.js';
+import { initMemos, addNewMemo as addNewMemoAction, openMemoEditor, toggleMemoStatus, requestDeleteMemo, cancelDeleteMemo, confirmDeleteMemo, loadMemos, hydrateMemos } from './memos.js';
 import { initGoals, addGoal, toggleGoal, deleteGoal } from './goals.js';
 import { togglePomodoro, initPomodoro } from './pomodoro.js';
 import { initScrollFix } from './scroll_fix.js';
@@ -27,6 +27,10 @@ const bindGlobal = (name, fn) => {
     }
 };
 
+// 模块加载时立即发出启动请求，首屏所需数据一次取回；
+// index.html 中的诊断脚本也复用这个 Promise，不再单独请求
+window.__bootstrapPromise = fetchBootstrap();
+
 console.log('[main.js] 开始绑定全局函数...');
 
 bindGlobal('toggleDock', toggleDock);
@@ -78,10 +82,15 @@ console.log('  - toggleDock:', typeof window.toggleDock, window.toggleDock?.__pl
 // 主逻辑
 // ==========================================
 
-async function loadConfigToUI() {
+// boot: 启动时传入 /api/bootstrap 的结果，直接用其中的数据渲染；
+// 不传时（刷新按钮等）走 /config 条件请求
+async function loadConfigToUI(boot) {
     logDebug("Starting Config Reload from Main...");
     try {
-        const data = await fetchConfig();
+        const { data, etag } = boot
+            ? { data: boot.config, etag: boot.etags.config }
+            : await fetchConfigVersioned();
+        state.configETag = etag;
         
         logDebug("Config Fetched Successfully.");
 
@@ -108,7 +117,10 @@ async function loadConfigToUI() {
         if (elAuto) elAuto.checked = !!state.currentConfig.autoStart;
 
         // 确保 Memos 和 Goals 被渲染
-        try { loadMemos(); } catch(e) { console.error("Memo Render fail", e); }
+        try {
+            if (boot) hydrateMemos(boot.memos, boot.etags.memos);
+            else loadMemos();
+        } catch(e) { console.error("Memo Render fail", e); }
         
         logDebug(`Reloading Goals. Items: ${state.currentConfig.dailyGoals?.items?.length || 0}`);
         try { initGoals(); } catch(e) { console.error("Goals Render fail", e); }
@@ -129,8 +141,21 @@ async function saveConfig() {
     state.currentConfig.musicPath = musicPath;
     state.currentConfig.autoStart = autoStart;
 
+    // 只提交设置面板负责的键，不会覆盖 memos / goals
+    const patch = {
+        apps: state.currentConfig.apps,
+        musicPath,
+        autoStart
+    };
+
     try {
-        await saveConfigToBackend(state.currentConfig);
+        try {
+            state.configETag = await patchConfigOnBackend(patch, state.configETag);
+        } catch (e) {
+            if (!e.conflict) throw e;
+            // 其他窗口修改过配置：这些键是用户刚刚明确编辑的，按新版本重试一次
+            state.configETag = await patchConfigOnBackend(patch, e.etag);
+        }
         renderDock(); 
         showToast(`Saved! Music: ${state.currentConfig.musicPath ? 'Set' : 'Empty'}`, "success");
         toggleSettingsModal();
@@ -221,10 +246,12 @@ window.wallpaperPropertyListener = {
 };
 
 // ==========================================
-// 媒体信息轮询（通过 Python 后端读取 Windows SMTC）
-// 每 2s 调用 /media/status，无需 WE 媒体集成权限
+// 媒体信息（通过 Python 后端读取 Windows SMTC，无需 WE 媒体集成权限）
+// 长轮询 /media/watch：快照只在换曲 / 暂停 / 拖动进度时变化，进度在本地按
+// position + playbackRate * 经过时间 外推，不需要频繁请求
+// initial / clock: bootstrap 中的媒体快照和服务端时钟，有则直接渲染，省去首次请求
 // ==========================================
-(function initMediaPolling() {
+function initMediaPolling(initial, clock) {
     const dbgEl = document.getElementById('media-dbg');
     function log(tag, msg) {
         const ts = new Date().toISOString().substr(11, 8);
@@ -239,22 +266,39 @@ window.wallpaperPropertyListener = {
         return `${Math.floor(sec/60)}:${String(Math.floor(sec%60)).padStart(2,'0')}`;
     }
 
-    // 播放状态（进度条已移除，只保留 playing 旗标供图标/唱片动画使用）
+    // 播放状态（playing 旗标供图标/唱片动画使用）
     let _playing = false;
     let _lastTitle = '', _lastThumb = '';
     let _trackInitialized = false; // 首次拿到曲名不触发换曲动画
 
-    // 进度条已移除，此处保留空函数避免下方 applyMedia 报错
-    function applyProgress() {}
+    // 进度时间轴：at 是快照采样时刻对应的 performance.now()（秒）
+    let _timeline = null;
+    function currentPosition() {
+        if (!_timeline) return 0;
+        const pos = _timeline.position + _timeline.rate * (performance.now() / 1000 - _timeline.at);
+        return _timeline.duration > 0 ? Math.min(pos, _timeline.duration) : pos;
+    }
+
+    // 装饰线兼作进度条：只有知道总时长时（SMTC）显示进度
+    function applyProgress() {
+        const line = el('lm-progress');
+        if (!line) return;
+        const show = !!_timeline && _timeline.duration > 0;
+        line.classList.toggle('has-progress', show);
+        if (!show) return;
+        const pos = currentPosition();
+        line.style.setProperty('--progress', (pos / _timeline.duration).toFixed(4));
+        line.title = `${fmtTime(pos)} / ${fmtTime(_timeline.duration)}`;
+    }
 
     // ── 模拟按钮（debug 用） ──────────────────────────────
     window._dbgSimMedia = function() {
         log('SIM', '手动模拟...');
         applyMedia({ title:'Test Song', artist:'Roselia', state:'playing', stateCode:4,
-                     position:0, duration:0, thumbnail: null });
+                     position:0, duration:0, playbackRate:1, thumbnail: null });
     };
 
-    function applyMedia(d) {
+    function applyMedia(d, age = 0) {
         // 曲名 / 艺术家
         if (d.title && d.title !== _lastTitle) {
             const isRealSwitch = _trackInitialized; // 非首次才触发换曲动画
@@ -290,24 +334,28 @@ window.wallpaperPropertyListener = {
                 window.lmMusicEvent(playing ? 'play' : 'pause');
             log('STATE', d.state);
         }
+
+        // 进度：旧版后端没有 playbackRate 时按播放状态推断
+        const rate = isFinite(d.playbackRate) ? d.playbackRate : (playing ? 1 : 0);
+        _timeline = { position: d.position || 0, duration: d.duration || 0, rate,
+                      at: performance.now() / 1000 - age };
+        applyProgress();
     }
 
-    // ── 2s 轮询 ──────────────────────────────────────────
-    async function poll() {
-        try {
-            const data = await fetchMediaStatus();
-            if (!data)              { log('POLL', '后端无响应（后端未启动？）'); return; }
-            if (data.error)         { log('POLL', `后端错误: ${data.error}`); return; }
-            applyMedia(data);
-        } catch(e) {
-            log('POLL', `fetch 失败: ${e.message}`);
-        }
+    function onMedia(data, age) {
+        if (!data)      { log('POLL', '后端无响应（后端未启动？）'); return; }
+        if (data.error) { log('POLL', `后端错误: ${data.error}`); return; }
+        applyMedia(data, age);
     }
 
-    log('POLL', '媒体轮询已启动 (2s 间隔)，通过后端读取 Windows SMTC...');
-    poll();
-    setInterval(poll, 2000);
-})();
+    log('POLL', '媒体长轮询已启动，通过后端读取 Windows SMTC...');
+    if (initial && !initial.error) applyMedia(initial, mediaAge(initial, clock));
+    watchMedia(onMedia);
+    // 本地外推进度，只在播放中且知道总时长时刷新
+    setInterval(() => {
+        if (_timeline && _timeline.rate > 0 && _timeline.duration > 0) applyProgress();
+    }, 500);
+}
 
 // Close Backend Modal
 function closeBackendModal() {
@@ -424,10 +472,30 @@ document.addEventListener('DOMContentLoaded', () => {
     initClock();
     initAnimation();
     initAudio();
-    initStats();
     initScrollFix();
-    initPomodoro();
-    loadConfigToUI();
+
+    // 首屏数据来自一次 /api/bootstrap；失败时（旧版后端 / 未启动）回退到各模块分别请求
+    window.__bootstrapPromise
+        .catch(e => {
+            logDebug("Bootstrap failed, falling back: " + e.message);
+            return null;
+        })
+        .then(boot => {
+            initStats(boot?.stats);
+            initPomodoro(boot?.pomodoroConfig);
+            loadConfigToUI(boot || undefined);
+            initMediaPolling(boot?.media, boot?.mediaClock);
+            // 其他地方（编辑窗口、手改配置文件）改了配置时立即刷新，只有 memos 变化时只拉增量
+            watchConfigChanges((sections, etag) => {
+                if (etag === state.configETag) return;   // 自己刚保存的版本
+                logDebug(`Config changed: ${sections ? sections.join(', ') : 'all'}`);
+                if (sections && sections.every(s => s === 'memos')) {
+                    // 其他分区没变，本地的目标 / 设置仍是这个版本的
+                    state.configETag = etag;
+                    loadMemos();
+                } else loadConfigToUI();
+            }, boot ? { version: boot.memos.version, epoch: boot.memos.epoch } : {});
+        });
     
     // 状态检查
     setInterval(checkBackendStatus, 5000);
@@ -440,6 +508,23 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    const SECTION_NAMES = { memos: '备忘录', dailyGoals: '每日目标', pomodoroConfig: '番茄钟', apps: '快捷方式', settings: '设置' };
+    // Ctrl+Z / Ctrl+Y（Ctrl+Shift+Z）：撤销 / 重做最近一次备忘录或目标的修改（输入框内保留浏览器自己的撤销）
+    document.addEventListener('keydown', async (e) => {
+        if (!(e.ctrlKey || e.metaKey) || e.target.closest('input, textarea, [contenteditable="true"]')) return;
+        const key = e.key.toLowerCase();
+        const redo = key === 'y' || (key === 'z' && e.shiftKey);
+        if (key !== 'z' && !redo) return;
+        e.preventDefault();
+        try {
+            const result = redo ? await redoOnBackend() : await undoOnBackend();
+            if (result.success) showToast(`${redo ? '已重做' : '已撤销'}${SECTION_NAMES[result.section] || ''}的修改`, 'success');
+            else showToast(redo ? '没有可重做的修改' : '没有可撤销的修改', 'info');
+        } catch (err) {
+            showToast("无法连接后端服务器。", "error");
+        }
+    });
+
     // Debug Click
     document.addEventListener('click', (e) => {
         // logDebug(`CLICK: ${e.target.tagName} .${e.target.className}`);
@@ -1,23 +1,44 @@
 import { BACKEND_URL } from './config.js';
 import { waitForEditorClose } from './utils.js';
 
-let lastMemoDataHash = "";
+// 本地备忘录缓存 (id -> memo)，由 /api/memos?since= 的增量维护
+const memoCache = new Map();
+let memoVersion = -1;   // -1 表示尚未同步，请求全量快照
+let memoEpoch = "";
+let memoETag = null;    // 备忘录分区的 ETag，未变化时后端回 304
+
+// 获取单条备忘录 (优先本地缓存)
+function fetchMemo(id) {
+    if (memoCache.has(id)) return Promise.resolve(memoCache.get(id));
+    return fetch(`${BACKEND_URL}/api/memos/${id}`)
+        .then(r => r.ok ? r.json() : null);
+}
+
+// 把增量 / 全量响应应用到本地缓存，返回是否有变化
+function applyMemoDelta(delta) {
+    memoVersion = delta.version;
+    memoEpoch = delta.epoch;
+    if (delta.full) {
+        memoCache.clear();
+        delta.memos.forEach(m => memoCache.set(m.id, m));
+        return true;
+    }
+    delta.deletes.forEach(id => memoCache.delete(id));
+    delta.upserts.forEach(m => memoCache.set(m.id, m));
+    return delta.deletes.length > 0 || delta.upserts.length > 0;
+}
 
 // 切换备忘录状态 (完成/未完成)
 export function toggleMemoStatus(id, event) {
     if(event) event.stopPropagation();
-    
-    fetch(`${BACKEND_URL}/api/memos`)
-    .then(r => r.json())
-    .then(list => {
-        const item = list.find(m => m.id === id);
+
+    fetchMemo(id).then(item => {
         if(item) {
-            item.done = !item.done;
-            // 保存回传
-            fetch(`${BACKEND_URL}/api/memos`, {
-                method: 'POST',
+            // 只回传变化的字段
+            fetch(`${BACKEND_URL}/api/memos/${id}`, {
+                method: 'PATCH',
                 headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify(item)
+                body: JSON.stringify({ done: !item.done })
             }).then(() => loadMemos()); // 重新加载列表
         }
     });
@@ -25,10 +46,9 @@ export function toggleMemoStatus(id, event) {
 
 // 通过后端窗口打开编辑器
 export function openMemoEditor(id) {
-    fetch(`${BACKEND_URL}/api/memos`)
-    .then(r => r.json())
-    .then(list => {
-        const item = list.find(m => m.id === id);
+    fetch(`${BACKEND_URL}/api/memos/${id}`)
+    .then(r => r.ok ? r.json() : null)
+    .then(item => {
         if(item) {
             fetch(`${BACKEND_URL}/api/memos/open_editor`, {
                 method: 'POST',
@@ -81,38 +101,22 @@ export function confirmDeleteMemo(id) {
 
 // 加载备忘录
 export function loadMemos() {
-    fetch(`${BACKEND_URL}/api/memos`)
-        .then(res => res.json())
-        .then(memos => {
-            // 简单校验和以避免不必要的 DOM 刷新
-            const currentHash = JSON.stringify(memos);
-            if (currentHash === lastMemoDataHash) return;
-            lastMemoDataHash = currentHash;
-
-            const container = document.getElementById('memo-list-container');
-            if(!container) return;
-            
-            // 保存滚动位置
-            const scrollPos = container.scrollTop;
-            
-            container.innerHTML = '';
-            // 排序: 未完成在前，然后按 ID (最新)
-            memos.sort((a, b) => {
-                if (a.done === b.done) {
-                    return b.id - a.id; 
-                }
-                return a.done ? 1 : -1;
-            });
-            
-            memos.forEach(m => renderMemoCard(m));
-            
-            // 恢复滚动
-            requestAnimationFrame(() => {
-                container.scrollTop = scrollPos;
-            });
+    const qs = new URLSearchParams({ since: memoVersion, epoch: memoEpoch });
+    const headers = (memoETag && memoVersion >= 0) ? { 'If-None-Match': memoETag } : {};
+    fetch(`${BACKEND_URL}/api/memos?${qs}`, { headers, cache: 'no-store' })
+        .then(res => {
+            if (res.status === 304) return null;
+            memoETag = res.headers.get('ETag');
+            return res.json();
+        })
+        .then(delta => {
+            if (!delta) return;
+            // 没有变化时不刷新 DOM
+            if (applyMemoDelta(delta)) renderMemoList();
         })
         .catch(e => {
             console.error(e);
+            memoVersion = -1; // 重连后重新拉取全量
             const container = document.getElementById('memo-list-container');
             if(container) {
                 container.innerHTML = `<div style="padding:20px; text-align:center; color:#ff7675; font-size:12px;">
@@ -124,6 +128,40 @@ export function loadMemos() {
         });
 }
 
+// 用 bootstrap 返回的全量快照初始化缓存并渲染，省去首次 /api/memos 请求
+export function hydrateMemos(snapshot, etag) {
+    memoETag = etag || null;
+    applyMemoDelta(snapshot);
+    renderMemoList();
+}
+
+function renderMemoList() {
+    // 排序: 未完成在前，然后按 ID (最新)
+    const memos = Array.from(memoCache.values());
+    memos.sort((a, b) => {
+        if (!!a.done === !!b.done) {
+            return b.id - a.id;
+        }
+        return a.done ? 1 : -1;
+    });
+
+    const container = document.getElementById('memo-list-container');
+    if(!container) return;
+    
+    // 保存滚动位置
+    const scrollPos = container.scrollTop;
+    
+    container.innerHTML = '';
+    memos.forEach(m => renderMemoCard(m));
+    
+    // 恢复滚动
+    requestAnimationFrame(() => {
+        container.scrollTop = scrollPos;
+    });
+}
+
+const REPEAT_LABELS = {hourly: 'hourly', daily: 'daily', weekly: 'weekly', monthly: 'monthly'};
+
 function renderMemoCard(memo) {
     const container = document.getElementById('memo-list-container');
     const div = document.createElement('div');
@@ -133,8 +171,9 @@ function renderMemoCard(memo) {
     // 检查截止日期状态
     let statusClass = '';
     const now = new Date();
-    if (memo.dueDate && !memo.done) {
-        const due = new Date(memo.dueDate);
+    // dueAt（UTC epoch 秒）由后端在保存时算好，换了时区也指向同一时刻；旧数据回退到 dueDate
+    const due = memo.dueAt != null ? new Date(memo.dueAt * 1000) : (memo.dueDate ? new Date(memo.dueDate) : null);
+    if (due && !memo.done) {
         const timeDiff = due - now;
         if (timeDiff < 0) statusClass = 'overdue';
         else if (timeDiff < 3600000) statusClass = 'urgent'; // 1 hour
@@ -146,7 +185,9 @@ function renderMemoCard(memo) {
         div.classList.add(statusClass);
     }
     
-    const displayDate = memo.dueDate ? new Date(memo.dueDate).toLocaleString() : 'No Deadline';
+    const displayDate = due ? due.toLocaleString() : 'No Deadline';
+    // 重复提醒：dueDate 是下一次的时间，后端在每次提醒后推进
+    const repeat = memo.recurrence ? ` ↻ ${REPEAT_LABELS[memo.recurrence.freq] || ''}` : '';
     const hasReminder = memo.enableReminder ? '🔔 ON' : '🔕 OFF';
     const title = memo.title || '(No Title)';
 
@@ -162,7 +203,7 @@ function renderMemoCard(memo) {
             </div>
             
             <div class="memo-meta">
-                <div class="ddl-chip">${displayDate}</div>
+                <div class="ddl-chip">${displayDate}${repeat}</div>
                 <div class="reminder-chip ${memo.enableReminder?'active':''}">${hasReminder}</div>
             </div>
 
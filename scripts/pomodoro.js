@@ -14,15 +14,16 @@ let REST_MINS = 5;
 const RING_CIRCUMFERENCE = 301.6;
 
 // Init function to be called from main.js
-export async function initPomodoro() {
+// pomoConfig: optional pomodoroConfig from the bootstrap payload (skips the fetch)
+export async function initPomodoro(pomoConfig) {
     console.log("Initializing Pomodoro...");
     
     // Load config
     try {
-        const config = await fetchConfig();
-        if (config.pomodoroConfig) {
-            WORK_MINS = config.pomodoroConfig.work || 25;
-            REST_MINS = config.pomodoroConfig.rest || 5;
+        if (!pomoConfig) pomoConfig = (await fetchConfig()).pomodoroConfig;
+        if (pomoConfig) {
+            WORK_MINS = pomoConfig.work || 25;
+            REST_MINS = pomoConfig.rest || 5;
         }
     } catch (e) {
         console.error("Failed to load pomo config", e);
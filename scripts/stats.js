@@ -1,30 +1,36 @@
-import { BACKEND_URL } from './config.js';
+import { fetchConditional } from './backend.js';
 
 // --- 系统统计 ---
 export function updateSystemStats() {
-    fetch(`${BACKEND_URL}/api/stats`)
-        .then(res => res.json())
-        .then(data => {
-            const cpu = data.cpu || 0;
-            const ram = data.ram || 0;
-
-            document.getElementById('cpu-text').innerText = Math.round(cpu) + '%';
-            document.getElementById('ram-text').innerText = Math.round(ram) + '%';
-            
-            const cpuRing = document.getElementById('cpu-ring');
-            // 逻辑: 100 指的是相对于 SVG viewBox 大小的周长
-            if(cpuRing) cpuRing.setAttribute('stroke-dasharray', `${cpu}, 100`);
-
-            const ramRing = document.getElementById('ram-ring');
-            if(ramRing) ramRing.setAttribute('stroke-dasharray', `${ram}, 100`);
+    fetchConditional('/api/stats')
+        .then(({ data, notModified }) => {
+            if (notModified) return; // 采样未变化
+            renderStats(data);
         })
         .catch(err => { 
             // 静默失败
         });
 }
 
-export function initStats() {
+export function renderStats(data) {
+    const cpu = data.cpu || 0;
+    const ram = data.ram || 0;
+
+    document.getElementById('cpu-text').innerText = Math.round(cpu) + '%';
+    document.getElementById('ram-text').innerText = Math.round(ram) + '%';
+    
+    const cpuRing = document.getElementById('cpu-ring');
+    // 逻辑: 100 指的是相对于 SVG viewBox 大小的周长
+    if(cpuRing) cpuRing.setAttribute('stroke-dasharray', `${cpu}, 100`);
+
+    const ramRing = document.getElementById('ram-ring');
+    if(ramRing) ramRing.setAttribute('stroke-dasharray', `${ram}, 100`);
+}
+
+// initial: bootstrap 中的首个采样，有则直接渲染，省去首次请求
+export function initStats(initial) {
     // 每 2 秒轮询一次
     setInterval(updateSystemStats, 2000);
-    updateSystemStats();
+    if (initial) renderStats(initial);
+    else updateSystemStats();
 }